@@ -109,6 +109,115 @@ VIDEO_CRF = 18
 # slow = 较慢但质量更好 (推荐)
 VIDEO_PRESET = "slow"
 
+# 是否将视频帧通过管道直接送入ffmpeg编码(同时合并原音频)
+# 关闭后先使用OpenCV写入mp4v临时文件，再使用ffmpeg二次编码并合并音频
+USE_FFMPEG_PIPE_WRITER = True
+
+# 是否开启智能渲染(需要开启USE_FFMPEG_PIPE_WRITER和USE_H264，且原视频为H264编码)
+# 开启后只重新编码包含字幕的GOP，其余部分直接复制原视频码流，字幕稀疏的视频可以大幅减少编码耗时
+# 仅对需要字幕检测的模式生效(LAMA、PROPAINTER、不跳过检测的STTN)
+SMART_RENDER = False
+
+# 视频解码后端，解码在后台线程中提前进行，与模型推理重叠
+# 可选: opencv, pyav, ffmpeg
+FRAME_SOURCE_BACKEND = "opencv"
+# 预解码队列长度，设置越大占用内存越多
+FRAME_SOURCE_QUEUE_SIZE = 32
+
+# 分段并行处理的进程数，大于1时开启
+# 开启后在关键帧(或场景切换)位置将视频切分为多个片段，多个进程同时处理，最后无损拼接并合并原音频
+# 每个进程都会加载一份模型，请根据显存/内存大小设置
+CHUNK_PARALLEL_WORKERS = 0
+# 切分的片段数量，0表示进程数的2倍
+CHUNK_COUNT = 0
+# 切分位置，可选: keyframe(关键帧，默认)、scene(场景切换，需要额外解码一遍视频)
+CHUNK_SPLIT_MODE = "keyframe"
+# 每个片段最少帧数
+CHUNK_MIN_FRAMES = 100
+
+# 是否开启可续跑任务
+# 开启后按片段处理视频，已完成的片段与进度(manifest.json)保存在输出目录的"视频名_no_sub_job"文件夹中
+# 程序崩溃或中断后重新运行同一视频，会从最后完成的片段继续处理；输入文件或配置变化时重新处理
+RESUMABLE_JOB = False
+# 可续跑任务每个片段的时长(秒)
+RESUMABLE_CHUNK_SECONDS = 120
+
+# 字幕检测批大小，多帧拼成一个批次送入检测模型推理
+# 设置为0时根据可用显存(内存)自动调整，显存不足时自动减半
+DET_BATCH_SIZE = 0
+# 自动调整时的最大批大小
+DET_MAX_BATCH_SIZE = 16
+
+# 是否使用INT8量化的onnx检测模型(CPU推理时速度约为原模型的2倍)
+# 首次运行时从视频中抽取校准帧量化模型，并与原模型对比检测结果，召回率或平均交并比低于阈值时继续使用原模型
+# 对比结果保存在检测模型目录的model.int8.json中，删除该文件或修改量化方式、阈值后重新量化
+DET_INT8_QUANTIZE = False
+# 量化方式：static(静态量化，需要校准帧，速度更快)或dynamic(动态量化，只量化权重)
+DET_INT8_QUANTIZE_MODE = 'static'
+# 校准帧数量
+DET_INT8_CALIBRATION_FRAMES = 32
+# 量化模型相对原模型的最低文本框召回率
+DET_INT8_MIN_RECALL = 0.95
+# 量化模型相对原模型的最低平均交并比
+DET_INT8_MIN_IOU = 0.85
+# 校准帧中原模型检出的文本框少于该数量时无法判断量化模型的精度，使用原模型且不保存对比结果
+DET_INT8_MIN_REFERENCE_BOXES = 20
+
+# 进程内共享的字幕检测会话数量，设置为0时每个检测任务单独加载检测模型
+# 大于0时，同一进程中的多个任务(如web服务同时处理多个视频)共享已加载的检测会话，并合并各任务的帧批量推理
+# 单个视频处理(命令行、GUI)没有可合并的请求，默认不开启
+DET_POOL_SIZE = 0
+# web服务使用的检测会话数量，web服务启动时开启会话池，显存充足且并发任务较多时可以增大
+WEB_DET_POOL_SIZE = 1
+# 检测会话合并请求时的最长等待时间(秒)
+DET_POOL_BATCH_TIMEOUT = 0.01
+# 每个检测会话使用的CPU线程数，设置为0时按CPU核数平均分配
+DET_POOL_CPU_THREADS = 0
+
+# 指定了字幕区域时，是否只裁剪字幕区域送入检测模型(坐标自动转换回整帧)
+DET_ROI_CROP = True
+# 裁剪字幕区域时向外扩展的像素，避免贴边的文字检测不完整
+DET_ROI_PADDING = 20
+
+# 是否根据检测模型输出的概率图生成贴合文字的掩码，代替整个文本框(向外扩展SUBTITLE_AREA_DEVIATION_PIXEL)的矩形掩码
+# 掩码面积更小，重绘更快，但文字描边、阴影较宽时可能去除不干净，可以增大DET_GLYPH_MASK_DILATE
+DET_GLYPH_MASK = False
+# 文字区域向外膨胀的像素
+DET_GLYPH_MASK_DILATE = 8
+
+# 是否使用两级检测：先将帧(或字幕区域)缩小后筛选是否有文字，只有筛选出有文字的帧才按原尺寸检测精确的文本框
+# 筛选分辨率根据帧尺寸自动选择，适合4K等高分辨率视频，帧尺寸较小时自动跳过筛选
+DET_CASCADE = False
+# 筛选时缩小后字幕文字的最小高度(像素)
+DET_CASCADE_MIN_TEXT_HEIGHT = 12
+# 估算字幕文字高度时，文字高度占帧高度的比例
+DET_CASCADE_TEXT_HEIGHT_RATIO = 0.04
+# 筛选缩放比例超过检测缩放比例的该倍数时，跳过筛选直接检测
+DET_CASCADE_MAX_SCREEN_RATIO = 0.75
+
+# 字幕检测采样间隔，每隔N帧检测一次，1表示逐帧检测
+# 大于1时，相邻两次检测结果不同或字幕区域画面发生变化时，二分补充检测中间帧，其余帧沿用相邻帧的检测结果
+# 可调用SubtitleDetect.evaluate_sample_recall对比逐帧检测的召回率
+DET_SAMPLE_INTERVAL = 1
+# 字幕区域画面变化判断：缩略图像素灰度差超过该值视为变化像素
+DET_CHANGE_PIXEL_THRESHOLD = 25
+# 变化像素比例超过该值时，认为字幕区域发生了变化
+DET_CHANGE_RATIO = 0.005
+
+# 是否保存视频分析结果(逐帧文本框、场景切换、字幕区域哈希)，同一视频再次处理时跳过字幕检测
+# 以文件指纹与检测配置为键，更换去字幕算法(MODE)不影响已保存的结果
+USE_ANALYSIS_SIDECAR = True
+
+# 是否根据字幕区域哈希复用检测结果：字幕区域与最近检测过的帧一致时，直接沿用其文本框，不再调用检测模型
+# 只在指定了字幕区域(sub_area)时生效，整帧的哈希对字幕变化不敏感；沿用空结果前还会对比缩略图确认字幕区域未变化
+DET_BAND_HASH_REUSE = False
+# 字幕区域差值哈希尺寸(宽, 高)，即哈希比特数为宽x高
+DET_BAND_HASH_SIZE = (64, 8)
+# 哈希距离(不同的比特数)不超过该值时认为字幕区域一致
+DET_BAND_HASH_TOLERANCE = 6
+# 缓存最近检测过的帧数
+DET_BAND_HASH_CACHE_SIZE = 8
+
 # ×××××××××× 通用设置 start ××××××××××
 """
 MODE可选算法类型
@@ -128,6 +237,13 @@ THRESHOLD_HEIGHT_DIFFERENCE = 20
 # 用于判断两个字幕文本的矩形框是否相似，如果X轴和Y轴偏差都在指定阈值内，则认为时同一个文本框
 PIXEL_TOLERANCE_Y = 20  # 允许检测框纵向偏差的像素点数
 PIXEL_TOLERANCE_X = 20  # 允许检测框横向偏差的像素点数
+# 相邻帧的文本框按交并比关联为同一轨迹，交并比不低于该值(或位置偏差在上述容差内)认为是同一个文本框
+BOX_TRACK_IOU_THRESHOLD = 0.5
+# 文本框轨迹最多间隔多少帧没有出现仍可以继续关联
+BOX_TRACK_MAX_GAP = 50
+# 缓存最近使用的多少组文本框的掩码，同一组文本框的掩码与STTN去除区域只计算一次
+# 只用于STTN时只保存掩码所在的行范围，LAMA、ProPainter等需要整帧掩码时同时缓存整帧掩码
+MASK_CACHE_SIZE = 64
 # ×××××××××× 通用设置 end ××××××××××
 
 # ×××××××××× InpaintMode.STTN算法设置 start ××××××××××
@@ -166,10 +282,16 @@ if STTN_MAX_LOAD_NUM < STTN_REFERENCE_LENGTH * STTN_NEIGHBOR_STRIDE:
 # 1280x720p视频设置80需要25G显存，设置50需要19G显存
 # 720x480p视频设置80需要8G显存，设置50需要7G显存
 PROPAINTER_MAX_LOAD_NUM = 70
+# 相邻处理窗口重叠的帧数，重叠帧只作为时序上下文，不重复输出
+# 字幕区间按窗口流式读取，内存占用不随区间长度增加
+PROPAINTER_WINDOW_OVERLAP = 10
 # ×××××××××× InpaintMode.PROPAINTER算法设置 end ××××××××××
 
 # ×××××××××× InpaintMode.LAMA算法设置 start ××××××××××
 # 是否开启极速模式，开启后不保证inpaint效果，仅仅对包含文本的区域文本进行去除
 LAMA_SUPER_FAST = False
+# LaMa推理进程数，大于1时视频帧通过共享内存交给多个子进程并行去除字幕(每个进程各加载一份模型)，
+# 适合CPU推理或显存充足的情况，开启DET_GLYPH_MASK时不生效
+LAMA_PARALLEL_WORKERS = 0
 # ×××××××××× InpaintMode.LAMA算法设置 end ××××××××××
 # ×××××××××××××××××××× [可以改] end ××××××××××××××××××××
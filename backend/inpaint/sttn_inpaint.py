@@ -1,4 +1,3 @@
-import copy
 import time
 
 import cv2
@@ -13,6 +12,8 @@ sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspa
 from backend import config
 from backend.inpaint.sttn.auto_sttn import InpaintGenerator
 from backend.inpaint.utils.sttn_utils import Stack, ToTorchFormatTensor
+from backend.tools.frame_source import open_frame_source
+from backend.tools.mask_geometry import MaskGeometry, get_inpaint_area
 
 # 定义图像预处理方式
 _to_tensors = transforms.Compose([
@@ -36,59 +37,60 @@ class STTNInpaint:
         self.neighbor_stride = config.STTN_NEIGHBOR_STRIDE
         self.ref_length = config.STTN_REFERENCE_LENGTH
 
-    def __call__(self, input_frames: List[np.ndarray], input_mask: np.ndarray):
+    def __call__(self, input_frames: List[np.ndarray], input_mask: np.ndarray = None, mask_geometry: MaskGeometry = None):
         """
-        :param input_frames: 原视频帧
-        :param mask: 字幕区域mask
+        只裁剪、处理去字幕区域，处理结果原地写回输入帧，不复制整帧
+        :param input_frames: 原视频帧，处理后直接被修改
+        :param input_mask: 字幕区域mask
+        :param mask_geometry: 字幕区域的掩码几何信息(MaskGeometry.get)，传入时不需要input_mask，去除区域只计算一次
+        :return: 去除字幕后的视频帧(即input_frames)
         """
-        _, mask = cv2.threshold(input_mask, 127, 1, cv2.THRESH_BINARY)
-        mask = mask[:, :, None]
-        H_ori, W_ori = mask.shape[:2]
-        H_ori = int(H_ori + 0.5)
-        W_ori = int(W_ori + 0.5)
+        if mask_geometry is None:
+            mask_geometry = MaskGeometry.from_mask(input_mask)
+        H_ori, W_ori = mask_geometry.size[:2]
         # 确定去字幕的垂直高度部分
         split_h = int(W_ori * 3 / 16)
-        inpaint_area = self.get_inpaint_area_by_mask(H_ori, split_h, mask)
-        # 初始化帧存储变量
-        # 高分辨率帧存储列表
-        frames_hr = copy.deepcopy(input_frames)
-        frames_scaled = {}  # 存放缩放后帧的字典
-        comps = {}  # 存放补全后帧的字典
-        # 存储最终的视频帧
-        inpainted_frames = []
-        for k in range(len(inpaint_area)):
-            frames_scaled[k] = []  # 为每个去除部分初始化一个列表
+        inpaint_area, band_masks = mask_geometry.get_inpaint_area(split_h)
+        # 没有需要去除的部分，直接返回原视频帧
+        if not inpaint_area:
+            return input_frames
+        # 每个去除部分缩放后的帧
+        frames_scaled = [[] for _ in inpaint_area]
+        for frame in input_frames:
+            for k, image_resize in enumerate(self.scale_bands(frame, inpaint_area)):
+                frames_scaled[k].append(image_resize)
+        # 处理每一个去除部分
+        comps = [self.inpaint(frames) for frames in frames_scaled]
+        # 将补全后的区域写回原始帧
+        for j, frame in enumerate(input_frames):
+            self.paste_bands(frame, [comp[j] for comp in comps], inpaint_area, band_masks)
+            print(f'processing frame, {len(input_frames) - j} left')
+        return input_frames
 
-        # 读取并缩放帧
-        for j in range(len(frames_hr)):
-            image = frames_hr[j]
-            # 对每个去除部分进行切割和缩放
-            for k in range(len(inpaint_area)):
-                image_crop = image[inpaint_area[k][0]:inpaint_area[k][1], :, :]  # 切割
-                image_resize = cv2.resize(image_crop, (self.model_input_width, self.model_input_height))  # 缩放
-                frames_scaled[k].append(image_resize)  # 将缩放后的帧添加到对应列表
+    def scale_bands(self, frame, inpaint_area):
+        """
+        裁剪帧中的去字幕区域(视图，不复制)并缩放到模型输入尺寸
+        """
+        return [cv2.resize(frame[from_H:to_H, :, :], (self.model_input_width, self.model_input_height))
+                for from_H, to_H in inpaint_area]
 
-        # 处理每一个去除部分
-        for k in range(len(inpaint_area)):
-            # 调用inpaint函数进行处理
-            comps[k] = self.inpaint(frames_scaled[k])
+    @staticmethod
+    def get_band_masks(mask, inpaint_area):
+        """
+        获取每个去除部分的布尔遮罩，同一批次的帧共用
+        """
+        return [mask[from_H:to_H, :].astype(bool) for from_H, to_H in inpaint_area]
 
-        # 如果存在去除部分
-        if inpaint_area:
-            for j in range(len(frames_hr)):
-                frame = frames_hr[j]  # 取出原始帧
-                # 对于模式中的每一个段落
-                for k in range(len(inpaint_area)):
-                    comp = cv2.resize(comps[k][j], (W_ori, split_h))  # 将补全帧缩放回原大小
-                    comp = cv2.cvtColor(np.array(comp).astype(np.uint8), cv2.COLOR_BGR2RGB)  # 转换颜色空间
-                    # 获取遮罩区域并进行图像合成
-                    mask_area = mask[inpaint_area[k][0]:inpaint_area[k][1], :]  # 取出遮罩区域
-                    # 实现遮罩区域内的图像融合
-                    frame[inpaint_area[k][0]:inpaint_area[k][1], :, :] = mask_area * comp + (1 - mask_area) * frame[inpaint_area[k][0]:inpaint_area[k][1], :, :]
-                # 将最终帧添加到列表
-                inpainted_frames.append(frame)
-                print(f'processing frame, {len(frames_hr) - j} left')
-        return inpainted_frames
+    @staticmethod
+    def paste_bands(frame, comps, inpaint_area, band_masks):
+        """
+        将补全后的区域缩放回原尺寸，只把遮罩内的像素原地写回帧
+        """
+        width = frame.shape[1]
+        for comp, (from_H, to_H), band_mask in zip(comps, inpaint_area, band_masks):
+            comp = cv2.resize(comp, (width, to_H - from_H))  # 将补全帧缩放回原大小
+            comp = cv2.cvtColor(np.array(comp).astype(np.uint8), cv2.COLOR_BGR2RGB)  # 转换颜色空间
+            np.copyto(frame[from_H:to_H, :, :], comp, where=band_mask)
 
     @staticmethod
     def read_mask(path):
@@ -168,38 +170,9 @@ class STTNInpaint:
         """
         获取字幕去除区域，根据mask来确定需要填补的区域和高度
         """
-        # 存储绘画区域的列表
-        inpaint_area = []
-        # 从视频底部的字幕位置开始，假设字幕通常位于底部
-        to_H = from_H = H
-        # 从底部向上遍历遮罩
-        while from_H != 0:
-            if to_H - h < 0:
-                # 如果下一段会超出顶端，则从顶端开始
-                from_H = 0
-                to_H = h
-            else:
-                # 确定段的上边界
-                from_H = to_H - h
-            # 检查当前段落是否包含遮罩像素
-            if not np.all(mask[from_H:to_H, :] == 0) and np.sum(mask[from_H:to_H, :]) > 10:
-                # 如果不是第一个段落，向下移动以确保没遗漏遮罩区域
-                if to_H != H:
-                    move = 0
-                    while to_H + move < H and not np.all(mask[to_H + move, :] == 0):
-                        move += 1
-                    # 确保没有越过底部
-                    if to_H + move < H and move < h:
-                        to_H += move
-                        from_H += move
-                # 将该段落添加到列表中
-                if (from_H, to_H) not in inpaint_area:
-                    inpaint_area.append((from_H, to_H))
-                else:
-                    break
-            # 移动到下一个段落
-            to_H -= h
-        return inpaint_area  # 返回绘画区域列表
+        # 每一行的遮罩像素数，按行统计后分段判断
+        row_counts = np.count_nonzero(np.asarray(mask).reshape(mask.shape[0], -1), axis=1)
+        return get_inpaint_area(H, h, row_counts)  # 返回绘画区域列表
 
     @staticmethod
     def get_inpaint_area_by_selection(input_sub_area, mask):
@@ -223,24 +196,26 @@ class STTNInpaint:
 class STTNVideoInpaint:
 
     def read_frame_info_from_video(self):
-        # 使用opencv读取视频
-        reader = cv2.VideoCapture(self.video_path)
+        # 创建视频帧读取对象，在后台线程中提前解码
+        reader = open_frame_source(self.video_path, frame_range=self.frame_range)
         # 获取视频的宽度, 高度, 帧率和帧数信息并存储在frame_info字典中
         frame_info = {
-            'W_ori': int(reader.get(cv2.CAP_PROP_FRAME_WIDTH) + 0.5),  # 视频的原始宽度
-            'H_ori': int(reader.get(cv2.CAP_PROP_FRAME_HEIGHT) + 0.5),  # 视频的原始高度
-            'fps': reader.get(cv2.CAP_PROP_FPS),  # 视频的帧率
-            'len': int(reader.get(cv2.CAP_PROP_FRAME_COUNT) + 0.5)  # 视频的总帧数
+            'W_ori': reader.width,  # 视频的原始宽度
+            'H_ori': reader.height,  # 视频的原始高度
+            'fps': reader.fps,  # 视频的帧率
+            'len': reader.frame_count  # 视频的总帧数
         }
         # 返回视频读取对象、帧信息和视频写入对象
         return reader, frame_info
 
-    def __init__(self, video_path, mask_path=None, clip_gap=None):
+    def __init__(self, video_path, mask_path=None, clip_gap=None, frame_range=None):
         # STTNInpaint视频修复实例初始化
         self.sttn_inpaint = STTNInpaint()
         # 视频和掩码路径
         self.video_path = video_path
         self.mask_path = mask_path
+        # 只处理视频的部分帧(start, end)，帧号从0开始，左闭右开
+        self.frame_range = frame_range
         # 设置输出视频文件的路径
         self.video_out_path = os.path.join(
             os.path.dirname(os.path.abspath(self.video_path)),
@@ -278,6 +253,7 @@ class STTNVideoInpaint:
                 
             # 得到修复区域位置
             inpaint_area = self.sttn_inpaint.get_inpaint_area_by_mask(frame_info['H_ori'], split_h, mask)
+            band_masks = self.sttn_inpaint.get_band_masks(mask, inpaint_area)
             
             # 遍历每一次的迭代次数
             for i in range(rec_time):
@@ -286,13 +262,9 @@ class STTNVideoInpaint:
                 print('Processing:', start_f + 1, '-', end_f, ' / Total:', frame_info['len'])
                 
                 frames_hr = []  # 高分辨率帧列表
-                frames = {}  # 帧字典，用于存储裁剪后的图像
+                frames = [[] for _ in inpaint_area]  # 每个修复区域裁剪缩放后的图像
                 comps = {}  # 组合字典，用于存储修复后的图像
                 
-                # 初始化帧字典
-                for k in range(len(inpaint_area)):
-                    frames[k] = []
-                    
                 # 读取和修复高分辨率帧
                 valid_frames_count = 0
                 for j in range(start_f, end_f):
@@ -304,10 +276,8 @@ class STTNVideoInpaint:
                     frames_hr.append(image)
                     valid_frames_count += 1
                     
-                    for k in range(len(inpaint_area)):
-                        # 裁剪、缩放并添加到帧字典
-                        image_crop = image[inpaint_area[k][0]:inpaint_area[k][1], :, :]
-                        image_resize = cv2.resize(image_crop, (self.sttn_inpaint.model_input_width, self.sttn_inpaint.model_input_height))
+                    # 裁剪、缩放并添加到帧列表
+                    for k, image_resize in enumerate(self.sttn_inpaint.scale_bands(image, inpaint_area)):
                         frames[k].append(image_resize)
                 
                 # 如果没有读取到有效帧，则跳过当前迭代
@@ -326,19 +296,15 @@ class STTNVideoInpaint:
                 if inpaint_area and valid_frames_count > 0:
                     for j in range(valid_frames_count):
                         if input_sub_remover is not None and input_sub_remover.gui_mode:
-                            original_frame = copy.deepcopy(frames_hr[j])
+                            # 只有预览时才保留原始帧
+                            original_frame = frames_hr[j].copy()
                         else:
                             original_frame = None
                             
                         frame = frames_hr[j]
-                        
-                        for k in range(len(inpaint_area)):
-                            if j < len(comps[k]):  # 确保索引有效
-                                # 将修复的图像重新扩展到原始分辨率，并融合到原始帧
-                                comp = cv2.resize(comps[k][j], (frame_info['W_ori'], split_h))
-                                comp = cv2.cvtColor(np.array(comp).astype(np.uint8), cv2.COLOR_BGR2RGB)
-                                mask_area = mask[inpaint_area[k][0]:inpaint_area[k][1], :]
-                                frame[inpaint_area[k][0]:inpaint_area[k][1], :, :] = mask_area * comp + (1 - mask_area) * frame[inpaint_area[k][0]:inpaint_area[k][1], :, :]
+                        # 将修复的图像重新扩展到原始分辨率，原地融合到原始帧
+                        self.sttn_inpaint.paste_bands(frame, [comps[k][j] for k in range(len(inpaint_area))],
+                                                      inpaint_area, band_masks)
                         
                         writer.write(frame)
                         
@@ -351,6 +317,8 @@ class STTNVideoInpaint:
             print(f"Error during video processing: {str(e)}")
             # 不抛出异常，允许程序继续执行
         finally:
+            if reader:
+                reader.release()
             if writer:
                 writer.release()
 
@@ -5,6 +5,7 @@ import os
 from pathlib import Path
 import threading
 import cv2
+import numpy as np
 import sys
 from functools import cached_property
 
@@ -14,15 +15,34 @@ import config
 from backend.tools.common_tools import is_video_or_image, is_image_file
 from backend.scenedetect import scene_detect
 from backend.scenedetect.detectors import ContentDetector
+from backend.scenedetect.scene_manager import compute_downscale_factor
 from backend.inpaint.sttn_inpaint import STTNInpaint, STTNVideoInpaint
 from backend.inpaint.lama_inpaint import LamaInpaint
 from backend.inpaint.video_inpaint import VideoInpaint
-from backend.tools.inpaint_tools import create_mask, batch_generator
+from backend.tools.inpaint_tools import create_mask, batch_generator, sliding_window_batches, parallel_inference
+from backend.tools.frame_source import open_frame_source
+from backend.tools.video_writer import FFmpegVideoWriter, get_video_codec_args, concat_video_segments
+from backend.tools.chunk_runner import split_frame_range, process_chunk
+from backend.tools.job_manifest import JobManifest, get_job_config
+from backend.tools.smart_render import SmartRenderWriter
+from backend.tools.media_probe import MediaProbe
+from backend.tools.batch_text_detector import BatchTextDetector, detect_region
+from backend.tools.detector_pool import create_text_detector, get_detector_pool, get_pool_size
+from backend.tools.det_quantization import get_quantized_model
+from backend.tools.analysis_sidecar import AnalysisSidecar, get_analysis_fingerprint
+from backend.tools import text_boxes
+from backend.tools.glyph_mask import GlyphMaskStore
+from backend.tools.interval_plan import IntervalPlan
+from backend.tools.box_tracker import track_regions
+from backend.tools.mask_geometry import MaskGeometry
+from backend.tools import interval_algebra
+from backend.tools.band_signal import get_band_thumbnail, get_band_change_ratio, get_band_hash, get_hash_distance, \
+    BandHashCache, confirm_empty
 import importlib
 import platform
 import tempfile
 import multiprocessing
-from shapely.geometry import Polygon
+import math
 import time
 from tqdm import tqdm
 
@@ -32,84 +52,161 @@ class SubtitleDetect:
     文本框检测类，用于检测视频帧中是否存在文本框
     """
 
-    def __init__(self, video_path, sub_area=None):
+    def __init__(self, video_path, sub_area=None, frame_range=None):
         self.video_path = video_path
         self.sub_area = sub_area
+        # 只处理视频的部分帧(start, end)，帧号从0开始，左闭右开
+        self.frame_range = frame_range
+        # 字幕区域哈希缓存及命中统计，每次检测视频时重置
+        self.band_hash_cache = None
+        self.band_hash_lookups = 0
+        self.band_hash_hits = 0
+        self.band_hash_hit_rate = 0.0
+        # 检测过的帧的字幕区域哈希{帧号: 哈希}，与分析结果一同保存
+        self.band_hashes = {}
+        self._window_hashes = {}
+        # 检测模型输出的逐帧文字区域图，用于生成贴合文字的掩码，未开启DET_GLYPH_MASK时为None
+        self.glyph_masks = None
+        self._window_glyphs = {}
 
     @cached_property
-    def text_detector(self):
-        import paddle
-        paddle.disable_signal_handler()
-        from paddleocr.tools.infer import utility
-        from paddleocr.tools.infer.predict_det import TextDetector
-        # 获取参数对象
+    def det_model(self):
+        """
+        检测模型路径与onnx推理后端
+        """
         importlib.reload(config)
-        args = utility.parse_args()
-        args.det_algorithm = 'DB'
-        args.det_model_dir = self.convertToOnnxModelIfNeeded(config.DET_MODEL_PATH)
-        args.use_onnx=len(config.ONNX_PROVIDERS) > 0
-        args.onnx_providers=config.ONNX_PROVIDERS
-        return TextDetector(args)
+        if config.DET_INT8_QUANTIZE:
+            onnx_model_path = self.convertToOnnxModelIfNeeded(config.DET_MODEL_PATH, force=True)
+            if onnx_model_path.endswith('.onnx'):
+                # 没有可用的GPU推理后端时，量化模型使用CPU推理
+                onnx_providers = config.ONNX_PROVIDERS or ['CPUExecutionProvider']
+                int8_model_path = get_quantized_model(onnx_model_path, self.video_path, onnx_providers)
+                if int8_model_path is not None:
+                    return int8_model_path, onnx_providers
+        return self.convertToOnnxModelIfNeeded(config.DET_MODEL_PATH), config.ONNX_PROVIDERS
+
+    @cached_property
+    def text_detector(self):
+        return create_text_detector(*self.det_model)
+
+    @cached_property
+    def batch_text_detector(self):
+        if get_pool_size() > 0:
+            # 使用进程内共享的检测会话池，多个任务同时检测时合并批次
+            return get_detector_pool(*self.det_model)
+        return BatchTextDetector(self.text_detector)
 
     def detect_subtitle(self, img):
+        if get_pool_size() > 0:
+            dt_boxes_list, elapse = self.batch_text_detector([img])
+            return dt_boxes_list[0], elapse
         dt_boxes, elapse = self.text_detector(img)
         return dt_boxes, elapse
 
+    def detect_subtitle_batch(self, imgs, return_maps=False):
+        """
+        多帧拼成一个批次检测文本框，指定了字幕区域时只检测字幕区域
+        :param return_maps: 是否同时返回文字区域图
+        :return: (每帧的文本框列表, 耗时)，return_maps为True时为(文本框列表, 耗时, 文字区域图列表)
+        """
+        region = self.sub_area if self.sub_area is not None and config.DET_ROI_CROP else None
+        if config.DET_CASCADE:
+            screen_scale = self.get_screen_scale(imgs[0].shape)
+            if screen_scale is not None:
+                return self.detect_cascade(imgs, region, screen_scale, return_maps)
+        return self.detect_full(imgs, region, return_maps)
+
+    def detect_full(self, imgs, region=None, return_maps=False):
+        """
+        按检测模型的输入尺寸检测文本框
+        :param region: 只检测的区域(ymin, ymax, xmin, xmax)，为None时检测整帧
+        """
+        if region is not None:
+            return self.batch_text_detector.detect_region(imgs, region, return_maps=return_maps)
+        return self.batch_text_detector(imgs, return_maps=return_maps)
+
+    def get_screen_scale(self, img_shape):
+        """
+        级联检测中低分辨率筛选的缩放比例，根据帧尺寸自动选择
+        按字幕文字高度约占帧高度的DET_CASCADE_TEXT_HEIGHT_RATIO估算，缩放后文字高度不低于DET_CASCADE_MIN_TEXT_HEIGHT
+        :return: 缩放比例，与检测模型输入的缩放比例接近(筛选节省不了多少计算量)时返回None
+        """
+        detect_scale = self.batch_text_detector.get_detect_scale(img_shape)
+        screen_scale = config.DET_CASCADE_MIN_TEXT_HEIGHT / (img_shape[0] * config.DET_CASCADE_TEXT_HEIGHT_RATIO)
+        if screen_scale > detect_scale * config.DET_CASCADE_MAX_SCREEN_RATIO:
+            return None
+        return screen_scale
+
+    def detect_cascade(self, imgs, region, screen_scale, return_maps=False):
+        """
+        两级检测：先在低分辨率下筛选有文字的帧，只有筛选出的帧才按检测模型的输入尺寸检测精确的文本框
+        低分辨率检测的文本框坐标已换算回原图坐标，但只用于判断是否有文字
+        """
+        height, width = imgs[0].shape[:2]
+        screen_region = region if region is not None else (0, height, 0, width)
+        screened, elapse = detect_region(self.batch_text_detector, imgs, screen_region, scale=screen_scale)
+        positives = [i for i, dt_boxes in enumerate(screened) if len(dt_boxes) > 0]
+        dt_boxes_list = [np.zeros((0, 4, 2), dtype=np.float32) for _ in imgs]
+        text_maps = [None] * len(imgs)
+        if positives:
+            result = self.detect_full([imgs[i] for i in positives], region, return_maps)
+            for k, i in enumerate(positives):
+                dt_boxes_list[i] = result[0][k]
+                if return_maps:
+                    text_maps[i] = result[2][k]
+            elapse += result[1]
+        if return_maps:
+            return dt_boxes_list, elapse, text_maps
+        return dt_boxes_list, elapse
+
+    def get_subtitle_boxes(self, dt_boxes):
+        """
+        将检测框转换为坐标，并过滤不在字幕区域内的文本框
+        """
+        boxes = text_boxes.get_boxes(dt_boxes)
+        return text_boxes.to_tuples(boxes[text_boxes.in_area(boxes, self.sub_area)])
+
     @staticmethod
     def get_coordinates(dt_box):
         """
         从返回的检测框中获取坐标
-        :param dt_box 检测框返回结果
+        :param dt_box 检测框返回结果(N, 4, 2)，数组或列表
         :return list 坐标点列表
         """
-        coordinate_list = list()
-        if isinstance(dt_box, list):
-            for i in dt_box:
-                i = list(i)
-                (x1, y1) = int(i[0][0]), int(i[0][1])
-                (x2, y2) = int(i[1][0]), int(i[1][1])
-                (x3, y3) = int(i[2][0]), int(i[2][1])
-                (x4, y4) = int(i[3][0]), int(i[3][1])
-                xmin = max(x1, x4)
-                xmax = min(x2, x3)
-                ymin = max(y1, y2)
-                ymax = min(y3, y4)
-                coordinate_list.append((xmin, xmax, ymin, ymax))
-        return coordinate_list
+        if dt_box is None:
+            return []
+        return text_boxes.to_tuples(text_boxes.get_boxes(dt_box))
 
     def find_subtitle_frame_no(self, sub_remover=None):
-        video_cap = cv2.VideoCapture(self.video_path)
-        frame_count = video_cap.get(cv2.CAP_PROP_FRAME_COUNT)
-        tbar = tqdm(total=int(frame_count), unit='frame', position=0, file=sys.__stdout__, desc='Subtitle Finding')
-        current_frame_no = 0
-        subtitle_frame_no_box_dict = {}
-        print('[Processing] start finding subtitles...')
-        while video_cap.isOpened():
-            ret, frame = video_cap.read()
-            # 如果读取视频帧失败（视频读到最后一帧）
-            if not ret:
-                break
-            # 读取视频帧成功
-            current_frame_no += 1
-            dt_boxes, elapse = self.detect_subtitle(frame)
-            coordinate_list = self.get_coordinates(dt_boxes.tolist())
-            if coordinate_list:
-                temp_list = []
-                for coordinate in coordinate_list:
-                    xmin, xmax, ymin, ymax = coordinate
-                    if self.sub_area is not None:
-                        s_ymin, s_ymax, s_xmin, s_xmax = self.sub_area
-                        if (s_xmin <= xmin and xmax <= s_xmax
-                                and s_ymin <= ymin
-                                and ymax <= s_ymax):
-                            temp_list.append((xmin, xmax, ymin, ymax))
-                    else:
-                        temp_list.append((xmin, xmax, ymin, ymax))
-                if len(temp_list) > 0:
-                    subtitle_frame_no_box_dict[current_frame_no] = temp_list
-            tbar.update(1)
-            if sub_remover:
-                sub_remover.progress_total = (100 * float(current_frame_no) / float(frame_count)) // 2
+        subtitle_frame_no_box_dict, _ = self.analyze_video(sub_remover=sub_remover)
+        return subtitle_frame_no_box_dict
+
+    def find_subtitle_plan(self, sub_remover=None, detect_scene=False):
+        """
+        获取去字幕计划，处理区间为字幕连续出现且文本框不变的帧区间
+        :return: (IntervalPlan, 场景切换帧号列表)
+        """
+        subtitle_frame_no_box_dict, scene_div_frame_no_list = self.analyze_video(sub_remover=sub_remover,
+                                                                                 detect_scene=detect_scene)
+        plan = IntervalPlan.from_frame_box_dict(subtitle_frame_no_box_dict)
+        return plan.with_intervals(plan.get_ranges(same_boxes=True)), scene_div_frame_no_list
+
+    def analyze_video(self, sub_remover=None, detect_scene=False):
+        """
+        单次解码视频，每一帧同时送入字幕检测与场景切换检测
+        :param sub_remover: 用于更新进度的SubtitleRemover对象
+        :param detect_scene: 是否同时检测场景切换
+        :return: (字幕帧号与文本框字典, 场景切换帧号列表)
+        """
+        subtitle_frame_no_box_dict, scene_div_frame_no_list = self.load_analysis(detect_scene)
+        if subtitle_frame_no_box_dict is None:
+            subtitle_frame_no_box_dict, scene_div_frame_no_list = self.detect_video(sub_remover=sub_remover,
+                                                                                    detect_scene=detect_scene)
+            self.save_analysis(subtitle_frame_no_box_dict, scene_div_frame_no_list if detect_scene else None)
+        elif sub_remover:
+            sub_remover.progress_total = 50
+        timings = self.analysis_timings
+        stage_start = time.time()
         subtitle_frame_no_box_dict = self.unify_regions(subtitle_frame_no_box_dict)
         # if config.UNITE_COORDINATES:
         #     subtitle_frame_no_box_dict = self.get_subtitle_frame_no_box_dict_with_united_coordinates(subtitle_frame_no_box_dict)
@@ -127,12 +224,314 @@ class SubtitleDetect:
         for key in subtitle_frame_no_box_dict.keys():
             if len(subtitle_frame_no_box_dict[key]) > 0:
                 new_subtitle_frame_no_box_dict[key] = subtitle_frame_no_box_dict[key]
-        return new_subtitle_frame_no_box_dict
+        timings['post_process'] += time.time() - stage_start
+        print(f'[Analysis] frames: {self.decoded_frame_count}, detected frames: {self.detected_frame_count}, '
+              f'band hash hit rate: {round(self.band_hash_hit_rate * 100, 2)}%, '
+              + ', '.join(f'{k}: {round(v, 2)}s' for k, v in timings.items()))
+        return new_subtitle_frame_no_box_dict, scene_div_frame_no_list
+
+    @property
+    def analysis_fingerprint(self):
+        return get_analysis_fingerprint(config, self.sub_area, self.frame_range)
+
+    def load_analysis(self, detect_scene=False):
+        """
+        读取已保存的分析结果(逐帧文本框与场景切换帧号)，不存在时返回(None, None)
+        """
+        if not config.USE_ANALYSIS_SIDECAR:
+            return None, None
+        sidecar = AnalysisSidecar.load(self.video_path, self.analysis_fingerprint)
+        # 需要场景切换帧号，但保存的结果中没有时重新分析
+        if sidecar is None or (detect_scene and not sidecar.has_scene):
+            return None, None
+        print('[Analysis] use saved analysis result, skip subtitle detection')
+        self.decoded_frame_count = sidecar.decoded_frame_count
+        self.detected_frame_count = 0
+        self.band_hashes = sidecar.band_hashes
+        self.glyph_masks = sidecar.glyph_masks if config.DET_GLYPH_MASK else None
+        self.analysis_timings = {'decode': 0.0, 'detect': 0.0, 'scene': 0.0, 'post_process': 0.0}
+        return sidecar.subtitle_frame_no_box_dict, sidecar.scene_div_frame_no_list or []
+
+    def save_analysis(self, subtitle_frame_no_box_dict, scene_div_frame_no_list=None):
+        """
+        保存分析结果，下次分析同一视频(相同分析配置)时直接读取
+        """
+        if not config.USE_ANALYSIS_SIDECAR:
+            return
+        sidecar = AnalysisSidecar(subtitle_frame_no_box_dict, scene_div_frame_no_list, self.band_hashes,
+                                  MediaProbe.get(self.video_path).to_dict(), self.decoded_frame_count,
+                                  self.glyph_masks)
+        sidecar.save(self.video_path, self.analysis_fingerprint)
+
+    def detect_video(self, sub_remover=None, detect_scene=False, sample_interval=None):
+        """
+        解码视频并检测每一帧的字幕文本框，同时检测场景切换
+        采样间隔大于1时，每隔sample_interval帧检测一次，只在字幕区域发生变化的位置二分补充检测
+        :param sub_remover: 用于更新进度的SubtitleRemover对象
+        :param detect_scene: 是否同时检测场景切换
+        :param sample_interval: 检测采样间隔，为None时使用DET_SAMPLE_INTERVAL
+        :return: (字幕帧号与文本框字典(未合并文本框), 场景切换帧号列表)
+        """
+        if sample_interval is None:
+            sample_interval = config.DET_SAMPLE_INTERVAL
+        sample_interval = max(1, int(sample_interval))
+        video_cap = open_frame_source(self.video_path, frame_range=self.frame_range)
+        frame_count = video_cap.frame_count
+        tbar = tqdm(total=int(frame_count), unit='frame', position=0, file=sys.__stdout__, desc='Subtitle Finding')
+        current_frame_no = 0
+        subtitle_frame_no_box_dict = {}
+        scene_div_frame_no_set = set()
+        scene_detector = ContentDetector() if detect_scene else None
+        # 与scene_detect保持一致，先将视频帧缩小再计算场景得分
+        scene_downscale_factor = compute_downscale_factor(video_cap.width) if detect_scene else 1
+        # 各阶段耗时统计
+        timings = {'decode': 0.0, 'detect': 0.0, 'scene': 0.0, 'post_process': 0.0}
+        # 待检测的帧窗口，凑满一个窗口后批量检测
+        # 稀疏检测时窗口第一帧为上一个窗口的最后一帧(已检测)，保证采样间隔连续
+        window_frames = []
+        window_frame_nos = []
+        # 每一帧与前一帧字幕区域的变化比例
+        change_ratios = []
+        carried_boxes = None
+        prev_thumbnail = None
+        detected_frame_count = 0
+        # 字幕区域哈希缓存，字幕未变化的帧沿用检测结果
+        # 未指定字幕区域时哈希覆盖整帧，字幕出现或变化只改变很少的比特，不复用检测结果
+        self.band_hash_cache = BandHashCache() if config.DET_BAND_HASH_REUSE and self.sub_area is not None else None
+        self.band_hash_lookups = 0
+        self.band_hash_hits = 0
+        self.band_hashes = {}
+        self.glyph_masks = GlyphMaskStore() if config.DET_GLYPH_MASK else None
+        print('[Processing] start finding subtitles...')
+        while video_cap.isOpened():
+            stage_start = time.time()
+            ret, frame = video_cap.read()
+            timings['decode'] += time.time() - stage_start
+            if ret:
+                # 读取视频帧成功
+                current_frame_no += 1
+                window_frames.append(frame)
+                window_frame_nos.append(current_frame_no)
+                if sample_interval > 1:
+                    stage_start = time.time()
+                    thumbnail = get_band_thumbnail(frame, self.sub_area)
+                    change_ratios.append(1.0 if prev_thumbnail is None else get_band_change_ratio(prev_thumbnail, thumbnail))
+                    prev_thumbnail = thumbnail
+                    timings['detect'] += time.time() - stage_start
+                else:
+                    change_ratios.append(0.0)
+                if scene_detector is not None:
+                    stage_start = time.time()
+                    scene_frame = frame
+                    if scene_downscale_factor > 1:
+                        scene_frame = cv2.resize(frame, (round(frame.shape[1] / scene_downscale_factor),
+                                                         round(frame.shape[0] / scene_downscale_factor)),
+                                                 interpolation=cv2.INTER_LINEAR)
+                    # ContentDetector帧号从0开始，场景切换帧号需要转换为从1开始
+                    for cut_frame_num in scene_detector.process_frame(current_frame_no - 1, scene_frame):
+                        if cut_frame_num > 0:
+                            scene_div_frame_no_set.add(cut_frame_num + 1)
+                    timings['scene'] += time.time() - stage_start
+            # 窗口长度为采样间隔的整数倍，逐帧检测时即为检测批大小
+            window_size = sample_interval * max(1, self.batch_text_detector.batch_size // sample_interval)
+            offset = 0 if carried_boxes is None else 1
+            new_frame_count = len(window_frames) - offset
+            # 凑满一个窗口(或视频读到最后一帧)后批量检测
+            if new_frame_count > 0 and (not ret or new_frame_count >= window_size):
+                stage_start = time.time()
+                self._window_hashes = {}
+                self._window_glyphs = {}
+                box_lists, detected = self.detect_window(window_frames, change_ratios, carried_boxes, sample_interval)
+                detected_frame_count += detected
+                for i, band_hash in self._window_hashes.items():
+                    self.band_hashes[window_frame_nos[i]] = band_hash
+                if self.glyph_masks is not None:
+                    for i, text_map in self._window_glyphs.items():
+                        self.glyph_masks.put(window_frame_nos[i], text_map, box_lists[i])
+                    # 没有检测的帧按文本框对应到检测过的帧，窗口第一帧已在上一个窗口中记录
+                    for frame_no, box_list in zip(window_frame_nos[offset:], box_lists[offset:]):
+                        self.glyph_masks.assign(frame_no, box_list)
+                for frame_no, box_list in zip(window_frame_nos[offset:], box_lists[offset:]):
+                    if len(box_list) > 0:
+                        subtitle_frame_no_box_dict[frame_no] = box_list
+                timings['detect'] += time.time() - stage_start
+                tbar.update(new_frame_count)
+                if sub_remover:
+                    sub_remover.progress_total = (100 * float(window_frame_nos[-1]) / float(frame_count)) // 2
+                if sample_interval > 1:
+                    # 最后一帧作为下一个窗口的第一帧
+                    window_frames = window_frames[-1:]
+                    window_frame_nos = window_frame_nos[-1:]
+                    change_ratios = change_ratios[-1:]
+                    carried_boxes = box_lists[-1]
+                else:
+                    window_frames = []
+                    window_frame_nos = []
+                    change_ratios = []
+            # 如果读取视频帧失败（视频读到最后一帧）
+            if not ret:
+                break
+        video_cap.release()
+        # 实际解码得到的帧数
+        self.decoded_frame_count = current_frame_no
+        # 实际送入检测模型的帧数
+        self.detected_frame_count = detected_frame_count
+        # 字幕区域哈希缓存命中率
+        self.band_hash_hit_rate = self.band_hash_hits / self.band_hash_lookups if self.band_hash_lookups else 0.0
+        self.analysis_timings = timings
+        return subtitle_frame_no_box_dict, sorted(scene_div_frame_no_set)
+
+    def detect_window(self, frames, change_ratios, first_boxes=None, sample_interval=1):
+        """
+        检测一个窗口内所有帧的字幕文本框
+        每隔sample_interval帧检测一次，相邻两个检测帧的文本框不同或中间字幕区域发生变化时，检测中间帧(二分)，
+        否则中间帧沿用前一个检测帧的文本框
+        :param frames: 窗口内的帧
+        :param change_ratios: 每一帧与前一帧字幕区域的变化比例
+        :param first_boxes: 窗口第一帧已检测时传入其文本框列表
+        :param sample_interval: 检测采样间隔
+        :return: (每一帧的文本框列表, 检测的帧数)
+        """
+        last = len(frames) - 1
+        box_lists = [None] * len(frames)
+        if first_boxes is not None:
+            box_lists[0] = first_boxes
+        anchors = sorted(set(range(0, last + 1, sample_interval)) | {last})
+        to_detect = [i for i in anchors if box_lists[i] is None]
+        intervals = list(zip(anchors[:-1], anchors[1:]))
+        detected = 0
+        while True:
+            if to_detect:
+                # 同一层的待检测帧拼成一个批次
+                detected += self.detect_frames(frames, to_detect, box_lists)
+            to_detect = []
+            next_intervals = []
+            for start, end in intervals:
+                if end - start <= 1:
+                    continue
+                if self.are_same_boxes(box_lists[start], box_lists[end]) and \
+                        max(change_ratios[start + 1:end + 1]) <= config.DET_CHANGE_RATIO:
+                    for i in range(start + 1, end):
+                        box_lists[i] = list(box_lists[start])
+                    continue
+                mid = (start + end) // 2
+                to_detect.append(mid)
+                next_intervals.extend([(start, mid), (mid, end)])
+            intervals = next_intervals
+            if not to_detect:
+                break
+        return box_lists, detected
 
-    def convertToOnnxModelIfNeeded(self, model_dir, model_filename="inference.pdmodel", params_filename="inference.pdiparams", opset_version=14):
-        """Converts a Paddle model to ONNX if ONNX providers are available and the model does not already exist."""
+    def detect_frames(self, frames, indices, box_lists):
+        """
+        批量检测指定帧的文本框，结果写入box_lists
+        字幕区域哈希与最近检测过的帧(或同一批次中待检测的帧)相近时，直接沿用其文本框，不送入检测模型
+        :return: 实际送入检测模型的帧数
+        """
+        to_detect = []
+        hashes = []
+        thumbnails = {}
+        # 与同一批次中待检测帧相同的帧，检测完成后沿用其结果
+        reuse_map = {}
+        for i in indices:
+            if self.band_hash_cache is None:
+                to_detect.append(i)
+                continue
+            self.band_hash_lookups += 1
+            thumbnails[i] = get_band_thumbnail(frames[i], self.sub_area)
+            band_hash = get_band_hash(frames[i], self.sub_area, thumbnails[i])
+            self._window_hashes[i] = band_hash
+            cached_boxes = self.band_hash_cache.get(band_hash, thumbnails[i])
+            if cached_boxes is not None:
+                box_lists[i] = list(cached_boxes)
+                self.band_hash_hits += 1
+                continue
+            same_index = next((j for j, pending_hash in zip(to_detect, hashes)
+                               if get_hash_distance(pending_hash, band_hash) <= self.band_hash_cache.tolerance), None)
+            if same_index is not None:
+                reuse_map[i] = same_index
+                continue
+            to_detect.append(i)
+            hashes.append(band_hash)
+        detected = self._detect_and_cache(frames, to_detect, hashes, thumbnails, box_lists)
+        # 同一批次中沿用的结果没有文本框时，同样需要确认缩略图未变化，否则单独检测
+        recheck = []
+        for i, same_index in reuse_map.items():
+            if len(box_lists[same_index]) == 0 and not confirm_empty(thumbnails[same_index], thumbnails[i]):
+                recheck.append(i)
+                continue
+            box_lists[i] = list(box_lists[same_index])
+            self.band_hash_hits += 1
+        detected += self._detect_and_cache(frames, recheck, [self._window_hashes[i] for i in recheck],
+                                           thumbnails, box_lists)
+        return detected
+
+    def _detect_and_cache(self, frames, to_detect, hashes, thumbnails, box_lists):
+        """
+        检测指定帧并把结果加入字幕区域哈希缓存
+        :return: 送入检测模型的帧数
+        """
+        if not to_detect:
+            return 0
+        if self.glyph_masks is not None:
+            dt_boxes_list, _, text_maps = self.detect_subtitle_batch([frames[i] for i in to_detect],
+                                                                     return_maps=True)
+            self._window_glyphs.update(zip(to_detect, text_maps))
+        else:
+            dt_boxes_list, _ = self.detect_subtitle_batch([frames[i] for i in to_detect])
+        for k, (i, dt_boxes) in enumerate(zip(to_detect, dt_boxes_list)):
+            box_lists[i] = self.get_subtitle_boxes(dt_boxes)
+            if self.band_hash_cache is not None:
+                self.band_hash_cache.put(hashes[k], box_lists[i], thumbnails.get(i))
+        return len(to_detect)
+
+    def are_same_boxes(self, box_list1, box_list2):
+        """
+        判断两帧的文本框是否一致(数量相同且一一相似)
+        """
+        if len(box_list1) != len(box_list2):
+            return False
+        return all(self.are_similar(box1, box2) for box1, box2 in zip(sorted(box_list1), sorted(box_list2)))
+
+    def evaluate_sample_recall(self, sample_interval=None):
+        """
+        对比稀疏采样检测与逐帧检测的结果，统计召回率与检测耗时
+        :param sample_interval: 稀疏检测采样间隔，为None时使用DET_SAMPLE_INTERVAL
+        :return: 统计结果字典
+        """
+        dense_dict, _ = self.detect_video(sample_interval=1)
+        dense_time = self.analysis_timings['detect']
+        sparse_dict, _ = self.detect_video(sample_interval=sample_interval)
+        sparse_time = self.analysis_timings['detect']
+        # 帧级别：逐帧检测有字幕的帧，稀疏检测同样有字幕的比例
+        dense_frames = set(dense_dict.keys())
+        sparse_frames = set(sparse_dict.keys())
+        hit_frame_count = len(dense_frames & sparse_frames)
+        # 文本框级别：逐帧检测的文本框，在稀疏检测同一帧中有相似文本框的比例
+        box_count = 0
+        hit_box_count = 0
+        for frame_no, box_list in dense_dict.items():
+            sparse_box_list = sparse_dict.get(frame_no, [])
+            for box in box_list:
+                box_count += 1
+                if any(self.are_similar(box, sparse_box) for sparse_box in sparse_box_list):
+                    hit_box_count += 1
+        result = {
+            'frame_recall': hit_frame_count / len(dense_frames) if dense_frames else 1.0,
+            'frame_precision': hit_frame_count / len(sparse_frames) if sparse_frames else 1.0,
+            'box_recall': hit_box_count / box_count if box_count else 1.0,
+            'dense_detect_time': dense_time,
+            'sparse_detect_time': sparse_time,
+            'detected_frames': self.detected_frame_count,
+            'total_frames': self.decoded_frame_count,
+        }
+        print('[Analysis] sample recall: ' + ', '.join(f'{k}: {round(v, 4)}' for k, v in result.items()))
+        return result
+
+    def convertToOnnxModelIfNeeded(self, model_dir, model_filename="inference.pdmodel", params_filename="inference.pdiparams", opset_version=14, force=False):
+        """Converts a Paddle model to ONNX if ONNX providers are available (or force is set) and the model does not already exist."""
         
-        if not config.ONNX_PROVIDERS:
+        if not config.ONNX_PROVIDERS and not force:
             return model_dir
         
         onnx_model_path = os.path.join(model_dir, "model.onnx")
@@ -177,26 +576,11 @@ class SubtitleDetect:
 
     @staticmethod
     def split_range_by_scene(intervals, points):
-        # 确保离散值列表是有序的
-        points.sort()
-        # 用于存储结果区间的列表
-        result_intervals = []
-        # 遍历区间
-        for start, end in intervals:
-            # 在当前区间内的点
-            current_points = [p for p in points if start <= p <= end]
-
-            # 遍历当前区间内的离散点
-            for p in current_points:
-                # 如果当前离散点不是区间的起始点，添加从区间开始到离散点前一个数字的区间
-                if start < p:
-                    result_intervals.append((start, p - 1))
-                # 更新区间开始为当前离散点
-                start = p
-            # 添加从最后一个离散点或区间开始到区间结束的区间
-            result_intervals.append((start, end))
-        # 输出结果
-        return result_intervals
+        """
+        在场景切换帧处切分区间，场景切换帧作为新区间的起始帧
+        """
+        starts, ends = interval_algebra.to_arrays(intervals)
+        return interval_algebra.to_list(*interval_algebra.split_by_points(starts, ends, points))
 
     @staticmethod
     def get_scene_div_frame_no(v_path):
@@ -223,249 +607,103 @@ class SubtitleDetect:
             abs(ymin1 - ymin2) <= config.PIXEL_TOLERANCE_Y and abs(ymax1 - ymax2) <= config.PIXEL_TOLERANCE_Y
 
     def unify_regions(self, raw_regions):
-        """将连续相似的区域统一，保持列表结构。"""
-        if len(raw_regions) > 0:
-            keys = sorted(raw_regions.keys())  # 对键进行排序以确保它们是连续的
-            unified_regions = {}
-
-            # 初始化
-            last_key = keys[0]
-            unify_value_map = {last_key: raw_regions[last_key]}
-
-            for key in keys[1:]:
-                current_regions = raw_regions[key]
-
-                # 新增一个列表来存放匹配过的标准区间
-                new_unify_values = []
-
-                for idx, region in enumerate(current_regions):
-                    last_standard_region = unify_value_map[last_key][idx] if idx < len(unify_value_map[last_key]) else None
-
-                    # 如果当前的区间与前一个键的对应区间相似，我们统一它们
-                    if last_standard_region and self.are_similar(region, last_standard_region):
-                        new_unify_values.append(last_standard_region)
-                    else:
-                        new_unify_values.append(region)
-
-                # 更新unify_value_map为最新的区间值
-                unify_value_map[key] = new_unify_values
-                last_key = key
-
-            # 将最终统一后的结果传递给unified_regions
-            for key in keys:
-                unified_regions[key] = unify_value_map[key]
-            return unified_regions
-        else:
+        """将连续相似的区域统一，保持列表结构。按交并比跟踪文本框，与文本框在列表中的顺序无关"""
+        if len(raw_regions) == 0:
             return raw_regions
+        unified_regions, tracker = track_regions(raw_regions)
+        print(f'[Tracking] tracks: {len(tracker.tracks)}, segments: {tracker.segment_count}')
+        return unified_regions
 
     @staticmethod
     def find_continuous_ranges(subtitle_frame_no_box_dict):
         """
         获取字幕出现的起始帧号与结束帧号
         """
-        numbers = sorted(list(subtitle_frame_no_box_dict.keys()))
-        ranges = []
-        start = numbers[0]  # 初始区间开始值
-
-        for i in range(1, len(numbers)):
-            # 如果当前数字与前一个数字间隔超过1，
-            # 则上一个区间结束，记录当前区间的开始与结束
-            if numbers[i] - numbers[i - 1] != 1:
-                end = numbers[i - 1]  # 则该数字是当前连续区间的终点
-                ranges.append((start, end))
-                start = numbers[i]  # 开始下一个连续区间
-        # 添加最后一个区间
-        ranges.append((start, numbers[-1]))
-        return ranges
+        return interval_algebra.to_list(*interval_algebra.continuous_ranges(list(subtitle_frame_no_box_dict.keys())))
 
     @staticmethod
     def find_continuous_ranges_with_same_mask(subtitle_frame_no_box_dict):
-        numbers = sorted(list(subtitle_frame_no_box_dict.keys()))
-        ranges = []
-        start = numbers[0]  # 初始区间开始值
-        for i in range(1, len(numbers)):
-            # 如果当前帧号与前一个帧号间隔超过1，
-            # 则上一个区间结束，记录当前区间的开始与结束
-            if numbers[i] - numbers[i - 1] != 1:
-                end = numbers[i - 1]  # 则该数字是当前连续区间的终点
-                ranges.append((start, end))
-                start = numbers[i]  # 开始下一个连续区间
-            # 如果当前帧号与前一个帧号间隔为1，且当前帧号对应的坐标点与上一帧号对应的坐标点不一致
-            # 记录当前区间的开始与结束
-            if numbers[i] - numbers[i - 1] == 1:
-                if subtitle_frame_no_box_dict[numbers[i]] != subtitle_frame_no_box_dict[numbers[i - 1]]:
-                    end = numbers[i - 1]  # 则该数字是当前连续区间的终点
-                    ranges.append((start, end))
-                    start = numbers[i]  # 开始下一个连续区间
-        # 添加最后一个区间
-        ranges.append((start, numbers[-1]))
-        return ranges
-
-    @staticmethod
-    def sub_area_to_polygon(sub_area):
         """
-        xmin, xmax, ymin, ymax = sub_area
+        获取字幕连续出现且文本框不变的起始帧号与结束帧号
         """
-        s_xmin = sub_area[0]
-        s_xmax = sub_area[1]
-        s_ymin = sub_area[2]
-        s_ymax = sub_area[3]
-        return Polygon([[s_xmin, s_ymin], [s_xmax, s_ymin], [s_xmax, s_ymax], [s_xmin, s_ymax]])
+        plan = IntervalPlan.from_frame_box_dict(subtitle_frame_no_box_dict)
+        return interval_algebra.to_list(*plan.get_ranges(same_boxes=True))
 
     @staticmethod
     def expand_and_merge_intervals(intervals, expand_size=config.STTN_NEIGHBOR_STRIDE*config.STTN_REFERENCE_LENGTH, max_length=config.STTN_MAX_LOAD_NUM):
-        # 初始化输出区间列表
-        expanded_intervals = []
-
-        # 对每个原始区间进行扩展
-        for interval in intervals:
-            start, end = interval
-
-            # 扩展至至少 'expand_size' 个单位，但不超过 'max_length' 个单位
-            expansion_amount = max(expand_size - (end - start + 1), 0)
-
-            # 在保证包含原区间的前提下尽可能平分前后扩展量
-            expand_start = max(start - expansion_amount // 2, 1)  # 确保起始点不小于1
-            expand_end = end + expansion_amount // 2
-
-            # 如果扩展后的区间超出了最大长度，进行调整
-            if (expand_end - expand_start + 1) > max_length:
-                expand_end = expand_start + max_length - 1
-
-            # 对于单点的处理，需额外保证有至少 'expand_size' 长度
-            if start == end:
-                if expand_end - expand_start + 1 < expand_size:
-                    expand_end = expand_start + expand_size - 1
-
-            # 检查与前一个区间是否有重叠并进行相应的合并
-            if expanded_intervals and expand_start <= expanded_intervals[-1][1]:
-                previous_start, previous_end = expanded_intervals.pop()
-                expand_start = previous_start
-                expand_end = max(expand_end, previous_end)
-
-            # 添加扩展后的区间至结果列表
-            expanded_intervals.append((expand_start, expand_end))
-
-        return expanded_intervals
+        """
+        将区间扩展至至少expand_size帧(不超过max_length帧)，并合并与前一个区间重叠的区间
+        """
+        starts, ends = interval_algebra.to_arrays(intervals)
+        return interval_algebra.to_list(*interval_algebra.expand_and_merge(starts, ends, expand_size, max_length))
 
     @staticmethod
     def filter_and_merge_intervals(intervals, target_length=config.STTN_REFERENCE_LENGTH):
         """
         合并传入的字幕起始区间，确保区间大小最低为STTN_REFERENCE_LENGTH
         """
-        expanded = []
-        # 首先单独处理单点区间以扩展它们
-        for start, end in intervals:
-            if start == end:  # 单点区间
-                # 扩展到接近的目标长度，但保证前后不重叠
-                prev_end = expanded[-1][1] if expanded else float('-inf')
-                next_start = float('inf')
-                # 查找下一个区间的起始点
-                for ns, ne in intervals:
-                    if ns > end:
-                        next_start = ns
-                        break
-                # 确定新的扩展起点和终点
-                new_start = max(start - (target_length - 1) // 2, prev_end + 1)
-                new_end = min(start + (target_length - 1) // 2, next_start - 1)
-                # 如果新的扩展终点在起点前面，说明没有足够空间来进行扩展
-                if new_end < new_start:
-                    new_start, new_end = start, start  # 保持原样
-                expanded.append((new_start, new_end))
-            else:
-                # 非单点区间直接保留，稍后处理任何可能的重叠
-                expanded.append((start, end))
-        # 排序以合并那些因扩展导致重叠的区间
-        expanded.sort(key=lambda x: x[0])
-        # 合并重叠的区间，但仅当它们之间真正重叠且小于目标长度时
-        merged = [expanded[0]]
-        for start, end in expanded[1:]:
-            last_start, last_end = merged[-1]
-            # 检查是否重叠
-            if start <= last_end and (end - last_start + 1 < target_length or last_end - last_start + 1 < target_length):
-                # 需要合并
-                merged[-1] = (last_start, max(last_end, end))  # 合并区间
-            elif start == last_end + 1 and (end - last_start + 1 < target_length or last_end - last_start + 1 < target_length):
-                # 相邻区间也需要合并的场景
-                merged[-1] = (last_start, end)
-            else:
-                # 如果没有重叠且都大于目标长度，则直接保留
-                merged.append((start, end))
-        return merged
-
-    def compute_iou(self, box1, box2):
-        box1_polygon = self.sub_area_to_polygon(box1)
-        box2_polygon = self.sub_area_to_polygon(box2)
-        intersection = box1_polygon.intersection(box2_polygon)
-        if intersection.is_empty:
-            return -1
-        else:
-            union_area = (box1_polygon.area + box2_polygon.area - intersection.area)
-            if union_area > 0:
-                intersection_area_rate = intersection.area / union_area
-            else:
-                intersection_area_rate = 0
-            return intersection_area_rate
+        starts, ends = interval_algebra.to_arrays(intervals)
+        return interval_algebra.to_list(*interval_algebra.merge_short(starts, ends, target_length))
+
+    @staticmethod
+    def compute_iou(box1, box2):
+        """
+        两个文本框的交并比，不相交时返回-1
+        """
+        return text_boxes.compute_iou(box1, box2)
+
+    @staticmethod
+    def _update_area_max_boxes(area_max_boxes, box_list):
+        """
+        用一帧的文本框更新区间最大文本框
+        :param area_max_boxes: (K, 5)数组，每行为(面积, xmin, xmax, ymin, ymax)
+        :return: 更新后的数组
+        """
+        threshold = config.THRESHOLD_HEIGHT_DIFFERENCE
+        for xmin, xmax, ymin, ymax in box_list:
+            # 计算当前文本框坐标面积
+            current_area = abs(xmax - xmin) * abs(ymax - ymin)
+            new_box = np.array([[current_area, xmin, xmax, ymin, ymax]], dtype=np.int64)
+            # 如果区间最大框列表为空，则当前面积为区间最大面积
+            if len(area_max_boxes) == 0:
+                area_max_boxes = new_box
+                continue
+            # 判断当前文本框位置是否与区间最大文本框列表的某个文本框位于同一行且交叉
+            same_row = (area_max_boxes[:, 3] - threshold <= ymin) & (ymax <= area_max_boxes[:, 4] + threshold)
+            _, intersects = text_boxes.get_intersection_matrix(new_box[:, 1:], area_max_boxes[:, 1:])
+            candidates = same_row & intersects[0]
+            # 高度差异小于阈值的第一个最大文本框之后(含)，同一行且交叉的最大文本框中面积更小的更新为当前文本框
+            same_height = candidates & (np.abs(np.abs(area_max_boxes[:, 4] - area_max_boxes[:, 3]) - abs(ymax - ymin)) < threshold)
+            if same_height.any():
+                first = int(np.argmax(same_height))
+                update = candidates & (current_area > area_max_boxes[:, 0])
+                update[:first] = False
+                area_max_boxes = area_max_boxes.copy()
+                area_max_boxes[update] = new_box[0]
+            # 如果遍历了所有的区间最大文本框列表，发现是新的一行，则直接添加，并跳过该帧剩余的文本框
+            elif not (area_max_boxes == new_box[0]).all(axis=1).any():
+                return np.concatenate([area_max_boxes, new_box])
+        return area_max_boxes
 
     def get_area_max_box_dict(self, sub_frame_no_list_continuous, subtitle_frame_no_box_dict):
         _area_max_box_dict = dict()
         for start_no, end_no in sub_frame_no_list_continuous:
-            # 寻找面积最大文本框
-            current_no = start_no
             # 查找当前区间矩形框最大面积
-            area_max_box_list = []
-            while current_no <= end_no:
-                for coord in subtitle_frame_no_box_dict[current_no]:
-                    # 取出每一个文本框坐标
-                    xmin, xmax, ymin, ymax = coord
-                    # 计算当前文本框坐标面积
-                    current_area = abs(xmax - xmin) * abs(ymax - ymin)
-                    # 如果区间最大框列表为空，则当前面积为区间最大面积
-                    if len(area_max_box_list) < 1:
-                        area_max_box_list.append({
-                            'area': current_area,
-                            'xmin': xmin,
-                            'xmax': xmax,
-                            'ymin': ymin,
-                            'ymax': ymax
-                        })
-                    # 如果列表非空，判断当前文本框是与区间最大文本框在同一区域
-                    else:
-                        has_same_position = False
-                        # 遍历每个区间最大文本框，判断当前文本框位置是否与区间最大文本框列表的某个文本框位于同一行且交叉
-                        for area_max_box in area_max_box_list:
-                            if (area_max_box['ymin'] - config.THRESHOLD_HEIGHT_DIFFERENCE <= ymin
-                                    and ymax <= area_max_box['ymax'] + config.THRESHOLD_HEIGHT_DIFFERENCE):
-                                if self.compute_iou((xmin, xmax, ymin, ymax), (
-                                        area_max_box['xmin'], area_max_box['xmax'], area_max_box['ymin'],
-                                        area_max_box['ymax'])) != -1:
-                                    # 如果高度差异不一样
-                                    if abs(abs(area_max_box['ymax'] - area_max_box['ymin']) - abs(
-                                            ymax - ymin)) < config.THRESHOLD_HEIGHT_DIFFERENCE:
-                                        has_same_position = True
-                                    # 如果在同一行，则计算当前面积是不是最大
-                                    # 判断面积大小，若当前面积更大，则将当前行的最大区域坐标点更新
-                                    if has_same_position and current_area > area_max_box['area']:
-                                        area_max_box['area'] = current_area
-                                        area_max_box['xmin'] = xmin
-                                        area_max_box['xmax'] = xmax
-                                        area_max_box['ymin'] = ymin
-                                        area_max_box['ymax'] = ymax
-                        # 如果遍历了所有的区间最大文本框列表，发现是新的一行，则直接添加
-                        if not has_same_position:
-                            new_large_area = {
-                                'area': current_area,
-                                'xmin': xmin,
-                                'xmax': xmax,
-                                'ymin': ymin,
-                                'ymax': ymax
-                            }
-                            if new_large_area not in area_max_box_list:
-                                area_max_box_list.append(new_large_area)
-                                break
-                current_no += 1
+            area_max_boxes = np.zeros((0, 5), dtype=np.int64)
+            last_box_list = None
+            changed = True
+            for current_no in range(start_no, end_no + 1):
+                box_list = subtitle_frame_no_box_dict[current_no]
+                # 与上一帧文本框相同且上一帧没有更新最大文本框时，结果不会变化
+                if not changed and box_list == last_box_list:
+                    continue
+                updated_boxes = self._update_area_max_boxes(area_max_boxes, box_list)
+                changed = not np.array_equal(updated_boxes, area_max_boxes)
+                area_max_boxes = updated_boxes
+                last_box_list = box_list
             _area_max_box_list = list()
-            for area_max_box in area_max_box_list:
+            for area, xmin, xmax, ymin, ymax in area_max_boxes.tolist():
+                area_max_box = {'area': area, 'xmin': xmin, 'xmax': xmax, 'ymin': ymin, 'ymax': ymax}
                 if area_max_box not in _area_max_box_list:
                     _area_max_box_list.append(area_max_box)
             _area_max_box_dict[f'{start_no}->{end_no}'] = _area_max_box_list
@@ -479,29 +717,21 @@ class SubtitleDetect:
         frame_no_list = self.find_continuous_ranges_with_same_mask(subtitle_frame_no_box_dict)
         area_max_box_dict = self.get_area_max_box_dict(frame_no_list, subtitle_frame_no_box_dict)
         for start_no, end_no in frame_no_list:
-            current_no = start_no
-            while True:
-                area_max_box_list = area_max_box_dict[f'{start_no}->{end_no}']
-                current_boxes = subtitle_frame_no_box_dict[current_no]
-                new_subtitle_frame_no_box_list = []
-                for current_box in current_boxes:
-                    current_xmin, current_xmax, current_ymin, current_ymax = current_box
-                    for max_box in area_max_box_list:
-                        large_xmin = max_box['xmin']
-                        large_xmax = max_box['xmax']
-                        large_ymin = max_box['ymin']
-                        large_ymax = max_box['ymax']
-                        box1 = (current_xmin, current_xmax, current_ymin, current_ymax)
-                        box2 = (large_xmin, large_xmax, large_ymin, large_ymax)
-                        res = self.compute_iou(box1, box2)
-                        if res != -1:
-                            new_subtitle_frame_no_box = (large_xmin, large_xmax, large_ymin, large_ymax)
-                            if new_subtitle_frame_no_box not in new_subtitle_frame_no_box_list:
-                                new_subtitle_frame_no_box_list.append(new_subtitle_frame_no_box)
-                subtitle_frame_no_box_dict_with_united_coordinates[current_no] = new_subtitle_frame_no_box_list
-                current_no += 1
-                if current_no > end_no:
-                    break
+            area_max_box_list = area_max_box_dict[f'{start_no}->{end_no}']
+            max_boxes = [(box['xmin'], box['xmax'], box['ymin'], box['ymax']) for box in area_max_box_list]
+            # 区间内文本框相同的帧只计算一次
+            united_box_lists = {}
+            for current_no in range(start_no, end_no + 1):
+                current_boxes = tuple(subtitle_frame_no_box_dict[current_no])
+                if current_boxes not in united_box_lists:
+                    # 与当前文本框相交的最大文本框，按当前文本框、最大文本框的顺序去重
+                    _, intersects = text_boxes.get_intersection_matrix(current_boxes, max_boxes)
+                    new_subtitle_frame_no_box_list = []
+                    for max_box_index in np.nonzero(intersects)[1].tolist():
+                        if max_boxes[max_box_index] not in new_subtitle_frame_no_box_list:
+                            new_subtitle_frame_no_box_list.append(max_boxes[max_box_index])
+                    united_box_lists[current_boxes] = new_subtitle_frame_no_box_list
+                subtitle_frame_no_box_dict_with_united_coordinates[current_no] = list(united_box_lists[current_boxes])
         return subtitle_frame_no_box_dict_with_united_coordinates
 
     def prevent_missed_detection(self, subtitle_frame_no_box_dict):
@@ -563,7 +793,12 @@ class SubtitleDetect:
 
 
 class SubtitleRemover:
-    def __init__(self, vd_path, sub_area=None, gui_mode=False):
+    def __init__(self, vd_path, sub_area=None, gui_mode=False, frame_range=None, output_path=None, job_dir=None):
+        """
+        :param frame_range: 只处理视频的部分帧(start, end)，帧号从0开始，左闭右开，用于分段并行处理
+        :param output_path: 输出视频路径，为None时输出到原视频目录
+        :param job_dir: 可续跑任务目录，设置后(或开启RESUMABLE_JOB)按片段处理并保存进度，中断后可从最后完成的片段继续
+        """
         importlib.reload(config)
         # 线程锁
         self.lock = threading.RLock()
@@ -578,27 +813,42 @@ class SubtitleRemover:
             self.is_picture = True
         # 视频路径
         self.video_path = vd_path
-        self.video_cap = cv2.VideoCapture(vd_path)
+        self.frame_range = frame_range
+        # 视频帧读取对象，在后台线程中提前解码
+        self.video_cap = open_frame_source(vd_path, frame_range=frame_range)
         # 通过视频路径获取视频名称
         self.vd_name = Path(self.video_path).stem
         # 视频帧总数
-        self.frame_count = int(self.video_cap.get(cv2.CAP_PROP_FRAME_COUNT) + 0.5)
+        self.frame_count = self.video_cap.frame_count
         # 视频帧率
-        self.fps = self.video_cap.get(cv2.CAP_PROP_FPS)
+        self.fps = self.video_cap.fps
         # 视频尺寸
-        self.size = (int(self.video_cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(self.video_cap.get(cv2.CAP_PROP_FRAME_HEIGHT)))
-        self.mask_size = (int(self.video_cap.get(cv2.CAP_PROP_FRAME_HEIGHT)), int(self.video_cap.get(cv2.CAP_PROP_FRAME_WIDTH)))
-        self.frame_height = int(self.video_cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-        self.frame_width = int(self.video_cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        self.size = (self.video_cap.width, self.video_cap.height)
+        self.mask_size = (self.video_cap.height, self.video_cap.width)
+        self.frame_height = self.video_cap.height
+        self.frame_width = self.video_cap.width
+        # 读取视频容器与流信息(带缓存，不解码)
+        self.media_probe = MediaProbe.get(vd_path)
         # 获取原视频码率
-        self.video_bitrate = self._get_video_bitrate(vd_path)
+        self.video_bitrate = self.media_probe.bitrate
         # 创建字幕检测对象
-        self.sub_detector = SubtitleDetect(self.video_path, self.sub_area)
-        # 创建视频临时对象，windows下delete=True会有permission denied的报错
-        self.video_temp_file = tempfile.NamedTemporaryFile(suffix='.mp4', delete=False)
-        # 创建视频写对象
-        self.video_writer = cv2.VideoWriter(self.video_temp_file.name, cv2.VideoWriter_fourcc(*'mp4v'), self.fps, self.size)
+        self.sub_detector = SubtitleDetect(self.video_path, self.sub_area, frame_range=frame_range)
         self.video_out_name = os.path.join(os.path.dirname(self.video_path), f'{self.vd_name}_no_sub.mp4')
+        if output_path is not None:
+            self.video_out_name = output_path
+        self.video_temp_file = None
+        if frame_range is not None:
+            # 分段处理时只输出视频片段，音频在拼接时统一合并
+            self.video_writer = FFmpegVideoWriter(self.video_out_name, self.fps, self.size, bitrate=self.video_bitrate)
+        elif config.USE_FFMPEG_PIPE_WRITER:
+            # 视频帧直接通过管道送入ffmpeg编码，同时合并原音频
+            self.video_writer = FFmpegVideoWriter(self.video_out_name, self.fps, self.size,
+                                                  audio_source=self.video_path, bitrate=self.video_bitrate)
+        else:
+            # 创建视频临时对象，windows下delete=True会有permission denied的报错
+            self.video_temp_file = tempfile.NamedTemporaryFile(suffix='.mp4', delete=False)
+            # 创建视频写对象
+            self.video_writer = cv2.VideoWriter(self.video_temp_file.name, cv2.VideoWriter_fourcc(*'mp4v'), self.fps, self.size)
         self.video_inpaint = None
         self.lama_inpaint = None
         self.ext = os.path.splitext(vd_path)[-1]
@@ -625,6 +875,12 @@ class SubtitleRemover:
         self.preview_frame = None
         # 是否将原音频嵌入到去除字幕后的视频
         self.is_successful_merged = False
+        # 是否已分段并行处理
+        self.is_chunked = False
+        # 可续跑任务目录
+        self.job_dir = job_dir
+        if self.job_dir is None and config.RESUMABLE_JOB and not self.is_picture and self.frame_range is None:
+            self.job_dir = f'{os.path.splitext(self.video_out_name)[0]}_job'
 
     @staticmethod
     def _get_video_bitrate(video_path):
@@ -633,79 +889,123 @@ class SubtitleRemover:
         :param video_path: 视频路径
         :return: 码率字符串 (例如 "5M") 或 None
         """
-        try:
-            use_shell = True if os.name == "nt" else False
-            command = [
-                config.FFMPEG_PATH, "-i", video_path,
-                "-f", "null", "-"
-            ]
-            result = subprocess.run(
-                command,
-                stderr=subprocess.PIPE,
-                stdout=subprocess.PIPE,
-                stdin=open(os.devnull),
-                shell=use_shell,
-                text=True
-            )
-            # 从 ffmpeg 输出中解析码率
-            output = result.stderr
-            import re
-            # 查找类似 "bitrate: 5000 kb/s" 的模式
-            match = re.search(r'bitrate:\s*(\d+)\s*kb/s', output)
-            if match:
-                bitrate_kbps = int(match.group(1))
-                # 转换为合适的单位
-                if bitrate_kbps >= 1000:
-                    bitrate_mbps = bitrate_kbps / 1000
-                    return f"{bitrate_mbps:.1f}M"
-                else:
-                    return f"{bitrate_kbps}k"
-            return None
-        except Exception as e:
-            print(f"Failed to get video bitrate: {e}")
-            return None
+        return MediaProbe.get(video_path).bitrate
 
     @staticmethod
     def get_coordinates(dt_box):
         """
         从返回的检测框中获取坐标
-        :param dt_box 检测框返回结果
+        :param dt_box 检测框返回结果(N, 4, 2)，数组或列表
         :return list 坐标点列表
         """
-        coordinate_list = list()
-        if isinstance(dt_box, list):
-            for i in dt_box:
-                i = list(i)
-                (x1, y1) = int(i[0][0]), int(i[0][1])
-                (x2, y2) = int(i[1][0]), int(i[1][1])
-                (x3, y3) = int(i[2][0]), int(i[2][1])
-                (x4, y4) = int(i[3][0]), int(i[3][1])
-                xmin = max(x1, x4)
-                xmax = min(x2, x3)
-                ymin = max(y1, y2)
-                ymax = min(y3, y4)
-                coordinate_list.append((xmin, xmax, ymin, ymax))
-        return coordinate_list
+        if dt_box is None:
+            return []
+        return text_boxes.to_tuples(text_boxes.get_boxes(dt_box))
 
-    @staticmethod
-    def is_current_frame_no_start(frame_no, continuous_frame_no_list):
+    def use_smart_render(self, dirty_intervals):
         """
-        判断给定的帧号是否为开头，是的话返回结束帧号，不是的话返回-1
+        开启智能渲染时替换视频写对象，只重新编码包含字幕的GOP，其余GOP直接复制原视频码流
+        :param dirty_intervals: 需要重绘的帧区间列表，帧号从1开始
         """
-        for start_no, end_no in continuous_frame_no_list:
-            if start_no == frame_no:
-                return True
-        return False
+        if not config.SMART_RENDER or not config.USE_H264 or not isinstance(self.video_writer, FFmpegVideoWriter):
+            return
+        # 分段处理的片段需要与其他片段拼接，统一重新编码
+        if self.frame_range is not None:
+            return
+        # 只有原视频同为H264编码时，复制的码流才能与重新编码的片段拼接
+        if self.media_probe.codec != 'h264':
+            print(f'[SmartRender] unsupported video codec: {self.media_probe.codec}, re-encode the whole video')
+            return
+        try:
+            keyframes, keyframe_times = self.media_probe.load_keyframes()
+        except Exception as e:
+            print(f'[SmartRender] failed to read keyframes: {e}')
+            return
+        if len(keyframes) == 0:
+            return
+        self.video_writer = SmartRenderWriter(self.video_out_name, self.fps, self.size, self.video_path,
+                                              keyframes, keyframe_times, self.media_probe.packet_count,
+                                              dirty_intervals, bitrate=self.video_bitrate)
 
-    @staticmethod
-    def find_frame_no_end(frame_no, continuous_frame_no_list):
+    def get_chunk_ranges(self):
+        """
+        在关键帧或场景切换位置将视频切分为多个片段
+        :return: [(start, end)]，帧号从0开始，左闭右开
+        """
+        if config.CHUNK_COUNT > 0:
+            chunk_count = config.CHUNK_COUNT
+        elif self.job_dir is not None and self.fps:
+            # 可续跑任务按时长切分，中断后最多重新处理一个片段，短视频不切分
+            chunk_count = math.ceil(self.frame_count / self.fps / config.RESUMABLE_CHUNK_SECONDS)
+        else:
+            chunk_count = config.CHUNK_PARALLEL_WORKERS * 2
+        if config.CHUNK_SPLIT_MODE == 'scene':
+            # 场景切换帧号从1开始，切换后的第一帧作为新片段的第一帧
+            boundaries = [frame_no - 1 for frame_no in self.sub_detector.get_scene_div_frame_no(self.video_path)]
+        else:
+            try:
+                boundaries, _ = self.media_probe.load_keyframes()
+            except Exception as e:
+                print(f'[Chunk] failed to read keyframes: {e}')
+                return [(0, self.frame_count)]
+        return split_frame_range(self.frame_count, boundaries, max(chunk_count, 1), config.CHUNK_MIN_FRAMES)
+
+    def run_chunked(self, tbar):
         """
-        判断给定的帧号是否为开头，是的话返回结束帧号，不是的话返回-1
+        将视频切分为多个片段分别去除字幕(多进程并行或逐个处理)，最后无损拼接片段并合并原音频
+        设置了任务目录时，已完成的片段与manifest保存在任务目录中，中断后重新运行会跳过已完成的片段
+        :return: 是否已分段处理
         """
-        for start_no, end_no in continuous_frame_no_list:
-            if start_no <= frame_no <= end_no:
-                return end_no
-        return -1
+        resumable = self.job_dir is not None
+        if self.frame_range is not None or (not resumable and config.CHUNK_PARALLEL_WORKERS <= 1):
+            return False
+        job_dir = self.job_dir if resumable else tempfile.mkdtemp(prefix='vsr_chunks_')
+        job = JobManifest.load_or_create(job_dir, self.video_path, get_job_config(config, self.sub_area),
+                                         self.get_chunk_ranges)
+        if len(job.chunk_ranges) <= 1:
+            # 只有一个片段时分段处理没有收益，直接处理整个视频(保留整段处理的智能渲染等优化)
+            print('[Chunk] no suitable split point found, process the whole video')
+            job.cleanup()
+            return False
+        tasks = [(i, self.video_path, self.sub_area, chunk_range, job.segment_path(i))
+                 for i, chunk_range in enumerate(job.chunk_ranges) if not job.is_completed(i)]
+        print(f'[Chunk] split video into {len(job.chunk_ranges)} chunks, {len(tasks)} to process, '
+              f'workers: {max(config.CHUNK_PARALLEL_WORKERS, 1)}')
+        tbar.update(job.completed_frame_count)
+        chunks_ok = True
+        pool = None
+        try:
+            if config.CHUNK_PARALLEL_WORKERS > 1 and len(tasks) > 1:
+                # 使用spawn启动子进程，避免fork后CUDA无法初始化
+                pool = multiprocessing.get_context('spawn').Pool(processes=min(config.CHUNK_PARALLEL_WORKERS, len(tasks)))
+                results = pool.imap_unordered(process_chunk, tasks)
+            else:
+                results = map(process_chunk, tasks)
+            for index, (start, end), success in results:
+                if success:
+                    job.mark_completed(index)
+                else:
+                    chunks_ok = False
+                tbar.update(end - start)
+                self.progress_total = 100 * tbar.n / tbar.total
+            if chunks_ok:
+                segment_paths = [job.segment_path(i) for i in range(len(job.chunk_ranges))]
+                self.is_successful_merged = concat_video_segments(segment_paths, self.video_out_name,
+                                                                  audio_source=self.video_path)
+                if self.is_successful_merged and resumable:
+                    job.cleanup()
+            elif resumable:
+                print(f'[Chunk] some chunks failed, run again to resume from {job_dir}')
+            else:
+                print('[Chunk] some chunks failed')
+        finally:
+            if pool is not None:
+                pool.terminate()
+                pool.join()
+            if not resumable:
+                job.cleanup()
+        self.is_chunked = True
+        return True
 
     def update_progress(self, tbar, increment):
         tbar.update(increment)
@@ -715,11 +1015,10 @@ class SubtitleRemover:
 
     def propainter_mode(self, tbar):
         print('use propainter mode')
-        sub_list = self.sub_detector.find_subtitle_frame_no(sub_remover=self)
-        continuous_frame_no_list = self.sub_detector.find_continuous_ranges_with_same_mask(sub_list)
-        scene_div_points = self.sub_detector.get_scene_div_frame_no(self.video_path)
-        continuous_frame_no_list = self.sub_detector.split_range_by_scene(continuous_frame_no_list,
-                                                                          scene_div_points)
+        # 单次解码同时获取字幕帧与场景切换帧
+        plan, scene_div_points = self.sub_detector.find_subtitle_plan(sub_remover=self, detect_scene=True)
+        plan = plan.with_intervals(self.sub_detector.split_range_by_scene(plan.intervals, scene_div_points))
+        self.use_smart_render(plan.intervals)
         self.video_inpaint = VideoInpaint(config.PROPAINTER_MAX_LOAD_NUM)
         print('[Processing] start removing subtitles...')
         index = 0
@@ -729,7 +1028,7 @@ class SubtitleRemover:
                 break
             index += 1
             # 如果当前帧没有水印/文本则直接写
-            if index not in sub_list.keys():
+            if not plan.has_boxes(index):
                 self.video_writer.write(frame)
                 print(f'write frame: {index}')
                 self.update_progress(tbar, increment=1)
@@ -737,66 +1036,58 @@ class SubtitleRemover:
             # 如果有水印，判断该帧是不是开头帧
             else:
                 # 如果是开头帧，则批推理到尾帧
-                if self.is_current_frame_no_start(index, continuous_frame_no_list):
+                if plan.is_start(index):
                     # print(f'No 1 Current index: {index}')
                     start_frame_no = index
                     print(f'find start: {start_frame_no}')
                     # 找到结束帧
-                    end_frame_no = self.find_frame_no_end(index, continuous_frame_no_list)
+                    end_frame_no = plan.get_end(index)
                     # 判断当前帧号是不是字幕起始位置
                     # 如果获取的结束帧号不为-1则说明
                     if end_frame_no != -1:
                         print(f'find end: {end_frame_no}')
-                        # ************ 读取该区间所有帧 start ************
-                        temp_frames = list()
-                        # 将头帧加入处理列表
-                        temp_frames.append(frame)
+                        # 获取当前区间使用的mask
+                        mask = create_mask(self.mask_size, plan.get_boxes(start_frame_no),
+                                           self.get_glyph_mask(range(start_frame_no, end_frame_no + 1)))
                         inner_index = 0
-                        # 一直读取到尾帧
-                        while index < end_frame_no:
-                            ret, frame = self.video_cap.read()
-                            if not ret:
-                                break
-                            index += 1
-                            temp_frames.append(frame)
-                        # ************ 读取该区间所有帧 end ************
-                        if len(temp_frames) < 1:
-                            # 没有待处理，直接跳过
-                            continue
-                        elif len(temp_frames) == 1:
-                            inner_index += 1
-                            single_mask = create_mask(self.mask_size, sub_list[index])
-                            if self.lama_inpaint is None:
-                                self.lama_inpaint = LamaInpaint()
-                            inpainted_frame = self.lama_inpaint(frame, single_mask)
-                            self.video_writer.write(inpainted_frame)
-                            print(f'write frame: {start_frame_no + inner_index} with mask {sub_list[start_frame_no]}')
-                            self.update_progress(tbar, increment=1)
-                            continue
-                        else:
-                            # 将读取的视频帧分批处理
-                            # 1. 获取当前批次使用的mask
-                            mask = create_mask(self.mask_size, sub_list[start_frame_no])
-                            for batch in batch_generator(temp_frames, config.PROPAINTER_MAX_LOAD_NUM):
-                                # 2. 调用批推理
-                                if len(batch) == 1:
-                                    single_mask = create_mask(self.mask_size, sub_list[start_frame_no])
-                                    if self.lama_inpaint is None:
-                                        self.lama_inpaint = LamaInpaint()
-                                    inpainted_frame = self.lama_inpaint(frame, single_mask)
-                                    self.video_writer.write(inpainted_frame)
-                                    print(f'write frame: {start_frame_no + inner_index} with mask {sub_list[start_frame_no]}')
-                                    inner_index += 1
-                                    self.update_progress(tbar, increment=1)
-                                elif len(batch) > 1:
-                                    inpainted_frames = self.video_inpaint.inpaint(batch, mask)
-                                    for i, inpainted_frame in enumerate(inpainted_frames):
-                                        self.video_writer.write(inpainted_frame)
-                                        print(f'write frame: {start_frame_no + inner_index} with mask {sub_list[index]}')
-                                        inner_index += 1
-                                        if self.gui_mode:
-                                            self.preview_frame = cv2.hconcat([batch[i], inpainted_frame])
-                                self.update_progress(tbar, increment=len(batch))
+                        # 按窗口流式读取该区间的帧，处理完的帧离开窗口后立即写入
+                        interval_frames = self.read_frames_to(frame, start_frame_no, end_frame_no)
+                        for window, emit_start, emit_end in sliding_window_batches(
+                                interval_frames, config.PROPAINTER_MAX_LOAD_NUM, config.PROPAINTER_WINDOW_OVERLAP):
+                            if len(window) == 1:
+                                if self.lama_inpaint is None:
+                                    self.lama_inpaint = LamaInpaint()
+                                inpainted_frames = [self.lama_inpaint(window[0], mask)]
+                            else:
+                                inpainted_frames = self.video_inpaint.inpaint(window, mask)
+                            for i in range(emit_start, emit_end):
+                                self.video_writer.write(inpainted_frames[i])
+                                print(f'write frame: {start_frame_no + inner_index} with mask {plan.get_boxes(start_frame_no)}')
+                                inner_index += 1
+                                if self.gui_mode:
+                                    self.preview_frame = cv2.hconcat([window[i], inpainted_frames[i]])
+                            self.update_progress(tbar, increment=emit_end - emit_start)
+                        index = start_frame_no + inner_index - 1
+
+    def get_glyph_mask(self, frame_nos):
+        """
+        多帧文字区域的并集掩码，未开启DET_GLYPH_MASK或没有文字区域图时返回None(使用矩形掩码)
+        """
+        if self.sub_detector.glyph_masks is None:
+            return None
+        return self.sub_detector.glyph_masks.get_mask(self.mask_size, frame_nos)
+
+    def read_frames_to(self, first_frame, start_frame_no, end_frame_no):
+        """
+        逐帧读取字幕区间[start_frame_no, end_frame_no]内的帧
+        :param first_frame: 已读取的区间头帧
+        """
+        yield first_frame
+        for _ in range(end_frame_no - start_frame_no):
+            ret, frame = self.video_cap.read()
+            if not ret:
+                break
+            yield frame
 
     def sttn_mode_with_no_detection(self, tbar):
         """
@@ -811,7 +1102,7 @@ class SubtitleRemover:
             ymin, ymax, xmin, xmax = 0, self.frame_height, 0, self.frame_width
         mask_area_coordinates = [(xmin, xmax, ymin, ymax)]
         mask = create_mask(self.mask_size, mask_area_coordinates)
-        sttn_video_inpaint = STTNVideoInpaint(self.video_path)
+        sttn_video_inpaint = STTNVideoInpaint(self.video_path, frame_range=self.frame_range)
         sttn_video_inpaint(input_mask=mask, input_sub_remover=self, tbar=tbar)
 
     def sttn_mode(self, tbar):
@@ -822,15 +1113,12 @@ class SubtitleRemover:
         else:
             print('use sttn mode')
             sttn_inpaint = STTNInpaint()
-            sub_list = self.sub_detector.find_subtitle_frame_no(sub_remover=self)
-            continuous_frame_no_list = self.sub_detector.find_continuous_ranges_with_same_mask(sub_list)
-            print(continuous_frame_no_list)
-            continuous_frame_no_list = self.sub_detector.filter_and_merge_intervals(continuous_frame_no_list)
-            print(continuous_frame_no_list)
-            start_end_map = dict()
-            for interval in continuous_frame_no_list:
-                start, end = interval
-                start_end_map[start] = end
+            plan, _ = self.sub_detector.find_subtitle_plan(sub_remover=self)
+            print(plan.intervals)
+            if len(plan) > 0:
+                plan = plan.with_intervals(self.sub_detector.filter_and_merge_intervals(plan.intervals))
+            print(plan.intervals)
+            self.use_smart_render(plan.intervals)
             current_frame_index = 0
             print('[Processing] start removing subtitles...')
             while True:
@@ -840,7 +1128,7 @@ class SubtitleRemover:
                     break
                 current_frame_index += 1
                 # 判断当前帧号是不是字幕区间开始, 如果不是，则直接写
-                if current_frame_index not in start_end_map.keys():
+                if not plan.is_start(current_frame_index):
                     self.video_writer.write(frame)
                     print(f'write frame: {current_frame_index}')
                     self.update_progress(tbar, increment=1)
@@ -849,7 +1137,7 @@ class SubtitleRemover:
                 # 如果是区间开始，则找到尾巴
                 else:
                     start_frame_index = current_frame_index
-                    end_frame_index = start_end_map[current_frame_index]
+                    end_frame_index = plan.get_end(current_frame_index)
                     print(f'processing frame {start_frame_index} to {end_frame_index}')
                     # 用于存储需要去字幕的视频帧
                     frames_need_inpaint = list()
@@ -862,60 +1150,99 @@ class SubtitleRemover:
                             break
                         current_frame_index += 1
                         frames_need_inpaint.append(frame)
-                    mask_area_coordinates = []
-                    # 1. 获取当前批次的mask坐标全集
-                    for mask_index in range(start_frame_index, end_frame_index):
-                        if mask_index in sub_list.keys():
-                            for area in sub_list[mask_index]:
-                                xmin, xmax, ymin, ymax = area
-                                # 判断是不是非字幕区域(如果宽大于长，则认为是错误检测)
-                                if (ymax - ymin) - (xmax - xmin) > config.THRESHOLD_HEIGHT_WIDTH_DIFFERENCE:
-                                    continue
-                                if area not in mask_area_coordinates:
-                                    mask_area_coordinates.append(area)
-                    # 1. 获取当前批次使用的mask
-                    mask = create_mask(self.mask_size, mask_area_coordinates)
+                    # 1. 获取当前批次的mask坐标全集，结束帧也在当前批次中处理
+                    areas = np.asarray(plan.get_range_boxes(start_frame_index, end_frame_index + 1),
+                                       dtype=np.int64).reshape(-1, 4)
+                    # 去掉非字幕区域(如果高比宽大太多，则认为是错误检测)
+                    areas = areas[text_boxes.is_horizontal(areas, config.THRESHOLD_HEIGHT_WIDTH_DIFFERENCE)]
+                    mask_area_coordinates = text_boxes.to_tuples(areas)
+                    # 1. 获取当前批次使用的mask，没有文字区域掩码时使用缓存的掩码几何信息
+                    glyph_mask = self.get_glyph_mask(range(start_frame_index, end_frame_index + 1))
+                    if glyph_mask is None:
+                        mask_geometry = MaskGeometry.get(self.mask_size, mask_area_coordinates)
+                    else:
+                        mask_geometry = MaskGeometry.from_mask(create_mask(self.mask_size, mask_area_coordinates,
+                                                                           glyph_mask))
                     print(f'inpaint with mask: {mask_area_coordinates}')
                     for batch in batch_generator(frames_need_inpaint, config.STTN_MAX_LOAD_NUM):
                         # 2. 调用批推理
                         if len(batch) >= 1:
-                            inpainted_frames = sttn_inpaint(batch, mask)
+                            # 去字幕结果原地写回batch，只有预览时才保留原始帧
+                            original_frames = [frame.copy() for frame in batch] if self.gui_mode else None
+                            inpainted_frames = sttn_inpaint(batch, mask_geometry=mask_geometry)
                             for i, inpainted_frame in enumerate(inpainted_frames):
                                 self.video_writer.write(inpainted_frame)
                                 print(f'write frame: {start_frame_index + inner_index} with mask')
                                 inner_index += 1
                                 if self.gui_mode:
-                                    self.preview_frame = cv2.hconcat([batch[i], inpainted_frame])
+                                    self.preview_frame = cv2.hconcat([original_frames[i], inpainted_frame])
                         self.update_progress(tbar, increment=len(batch))
 
     def lama_mode(self, tbar):
         print('use lama mode')
-        sub_list = self.sub_detector.find_subtitle_frame_no(sub_remover=self)
+        plan, _ = self.sub_detector.find_subtitle_plan(sub_remover=self)
+        self.use_smart_render(plan.with_intervals(plan.get_ranges()).intervals)
+        print('[Processing] start removing subtitles...')
+        if config.LAMA_PARALLEL_WORKERS > 1 and not self.is_picture and self.sub_detector.glyph_masks is None:
+            results = self.lama_inpaint_parallel(plan)
+        else:
+            results = self.lama_inpaint_frames(plan)
+        for index, original_frame, frame in results:
+            if self.gui_mode:
+                self.preview_frame = cv2.hconcat([original_frame, frame])
+            if self.is_picture:
+                cv2.imencode(self.ext, frame)[1].tofile(self.video_out_name)
+            else:
+                self.video_writer.write(frame)
+            tbar.update(1)
+            self.progress_remover = 100 * float(index) / float(self.frame_count) // 2
+            self.progress_total = 50 + self.progress_remover
+
+    def lama_inpaint_frames(self, plan):
+        """
+        在当前进程中逐帧去除字幕
+        :return: 生成(帧号, 原始帧, 去除字幕后的帧)
+        """
         if self.lama_inpaint is None:
             self.lama_inpaint = LamaInpaint()
         index = 0
-        print('[Processing] start removing subtitles...')
         while True:
             ret, frame = self.video_cap.read()
             if not ret:
                 break
             original_frame = frame
             index += 1
-            if index in sub_list.keys():
-                mask = create_mask(self.mask_size, sub_list[index])
+            if plan.has_boxes(index):
+                mask = create_mask(self.mask_size, plan.get_boxes(index), self.get_glyph_mask([index]))
                 if config.LAMA_SUPER_FAST:
                     frame = cv2.inpaint(frame, mask, 3, cv2.INPAINT_TELEA)
                 else:
                     frame = self.lama_inpaint(frame, mask)
-            if self.gui_mode:
-                self.preview_frame = cv2.hconcat([original_frame, frame])
-            if self.is_picture:
-                cv2.imencode(self.ext, frame)[1].tofile(self.video_out_name)
-            else:
-                self.video_writer.write(frame)
-            tbar.update(1)
-            self.progress_remover = 100 * float(index) / float(self.frame_count) // 2
-            self.progress_total = 50 + self.progress_remover
+            yield index, original_frame, frame
+
+    def lama_inpaint_parallel(self, plan):
+        """
+        解码、LAMA_PARALLEL_WORKERS个子进程推理与编码流水线执行，帧通过共享内存环形缓冲区传给子进程
+        :return: 生成(帧号, 原始帧, 去除字幕后的帧)
+        """
+        # 原始帧在共享内存中被原地覆盖，只有预览时才另外保留
+        original_frames = {}
+
+        def read_frames():
+            index = 0
+            while True:
+                ret, frame = self.video_cap.read()
+                if not ret:
+                    break
+                index += 1
+                if self.gui_mode:
+                    original_frames[index] = frame.copy()
+                yield index, frame, plan.get_boxes(index)
+
+        for index, frame in parallel_inference(read_frames(), pool_size=config.LAMA_PARALLEL_WORKERS):
+            # 结果是共享内存槽位的视图，下一次迭代后会被新帧覆盖，而编码器只在队列中保存帧的引用，必须先复制
+            frame = frame.copy()
+            yield index, original_frames.pop(index, frame), frame
 
     def run(self):
         # 记录开始时间
@@ -929,7 +1256,10 @@ class SubtitleRemover:
             self.lama_inpaint = LamaInpaint()
             original_frame = cv2.imread(self.video_path)
             if len(sub_list):
-                mask = create_mask(original_frame.shape[0:2], sub_list[1])
+                glyph_mask = None
+                if self.sub_detector.glyph_masks is not None:
+                    glyph_mask = self.sub_detector.glyph_masks.get_mask(original_frame.shape[0:2], [1])
+                mask = create_mask(original_frame.shape[0:2], sub_list[1], glyph_mask)
                 inpainted_frame = self.lama_inpaint(original_frame, mask)
             else:
                 inpainted_frame = original_frame
@@ -938,6 +1268,9 @@ class SubtitleRemover:
             cv2.imencode(self.ext, inpainted_frame)[1].tofile(self.video_out_name)
             tbar.update(1)
             self.progress_total = 100
+        elif self.run_chunked(tbar):
+            # 已分段并行处理并拼接完成
+            pass
         else:
             # 精准模式下，获取场景分割的帧号，进一步切割
             if config.MODE == config.InpaintMode.PROPAINTER:
@@ -949,15 +1282,22 @@ class SubtitleRemover:
         self.video_cap.release()
         self.video_writer.release()
         if not self.is_picture:
-            # 将原音频合并到新生成的视频文件中
-            self.merge_audio_to_video()
+            if self.is_chunked:
+                # 拼接片段时已经合并了原音频
+                pass
+            elif isinstance(self.video_writer, (FFmpegVideoWriter, SmartRenderWriter)):
+                # 编码完成后已经合并了原音频，音频无法合并时输出不含音频的视频
+                self.is_successful_merged = self.video_writer.success
+            else:
+                # 将原音频合并到新生成的视频文件中
+                self.merge_audio_to_video()
             print(f"[Finished]Subtitle successfully removed, video generated at：{self.video_out_name}")
         else:
             print(f"[Finished]Subtitle successfully removed, picture generated at：{self.video_out_name}")
         print(f'time cost: {round(time.time() - start_time, 2)}s')
         self.isFinished = True
         self.progress_total = 100
-        if os.path.exists(self.video_temp_file.name):
+        if self.video_temp_file is not None and os.path.exists(self.video_temp_file.name):
             try:
                 os.remove(self.video_temp_file.name)
             except Exception:
@@ -980,27 +1320,19 @@ class SubtitleRemover:
             print('fail to extract audio')
             return
         else:
-            if os.path.exists(self.video_temp_file.name):
+            if self.video_temp_file is not None and os.path.exists(self.video_temp_file.name):
                 # 构建高质量编码命令
                 audio_merge_command = [config.FFMPEG_PATH,
                                        "-y", "-i", self.video_temp_file.name,
-                                       "-i", temp.name,
-                                       "-vcodec", "libx264" if config.USE_H264 else "copy"]
+                                       "-i", temp.name]
 
                 # 如果使用 H264 编码，添加高质量参数
                 if config.USE_H264:
-                    audio_merge_command.extend([
-                        "-crf", str(config.VIDEO_CRF),  # 质量因子 (可在config.py配置)
-                        "-preset", config.VIDEO_PRESET  # 编码预设 (可在config.py配置)
-                    ])
-                    # 如果检测到原视频码率，使用相同码率
+                    audio_merge_command.extend(get_video_codec_args(self.video_bitrate))
                     if self.video_bitrate:
-                        audio_merge_command.extend([
-                            "-b:v", self.video_bitrate,
-                            "-maxrate", self.video_bitrate,
-                            "-bufsize", "2M"
-                        ])
                         print(f"Using original video bitrate: {self.video_bitrate}")
+                else:
+                    audio_merge_command.extend(["-vcodec", "copy"])
 
                 audio_merge_command.extend([
                     "-acodec", "copy",
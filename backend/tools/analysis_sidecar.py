@@ -0,0 +1,139 @@
+import hashlib
+import io
+import json
+import os
+import tempfile
+
+import numpy as np
+
+from backend.tools.glyph_mask import GlyphMaskStore
+from backend.tools.media_probe import get_file_fingerprint
+
+# 分析结果缓存目录
+ANALYSIS_CACHE_DIR = os.path.join(tempfile.gettempdir(), 'vsr_analysis')
+# 分析结果文件格式版本，格式变化时递增，旧版本文件自动失效
+ANALYSIS_SIDECAR_VERSION = 3
+
+
+def get_analysis_fingerprint(config, sub_area=None, frame_range=None):
+    """
+    影响字幕检测与场景检测结果的配置指纹，不包含去字幕算法等与分析结果无关的配置
+    """
+    items = {
+        'det_model': os.path.normpath(config.DET_MODEL_PATH),
+        'use_onnx': len(config.ONNX_PROVIDERS) > 0,
+        'det_int8': config.DET_INT8_QUANTIZE,
+        'sub_area': list(sub_area) if sub_area is not None else None,
+        'frame_range': list(frame_range) if frame_range is not None else None,
+        'roi_crop': config.DET_ROI_CROP,
+        'roi_padding': config.DET_ROI_PADDING,
+        'glyph_mask': config.DET_GLYPH_MASK,
+        'cascade': [config.DET_CASCADE, config.DET_CASCADE_MIN_TEXT_HEIGHT, config.DET_CASCADE_TEXT_HEIGHT_RATIO,
+                    config.DET_CASCADE_MAX_SCREEN_RATIO],
+        'sample_interval': config.DET_SAMPLE_INTERVAL,
+        'change_pixel_threshold': config.DET_CHANGE_PIXEL_THRESHOLD,
+        'change_ratio': config.DET_CHANGE_RATIO,
+        'band_hash_reuse': config.DET_BAND_HASH_REUSE,
+        'band_hash_size': list(config.DET_BAND_HASH_SIZE),
+        'band_hash_tolerance': config.DET_BAND_HASH_TOLERANCE,
+        'pixel_tolerance': [config.PIXEL_TOLERANCE_X, config.PIXEL_TOLERANCE_Y],
+    }
+    return hashlib.sha1(json.dumps(items, sort_keys=True).encode()).hexdigest()
+
+
+class AnalysisSidecar:
+    """
+    视频分析结果(媒体信息、逐帧文本框、场景切换帧号、字幕区域哈希、文字区域图)的持久化存储
+    以文件指纹与分析配置指纹为键，使用numpy二进制格式保存，更换去字幕算法重新运行时可以跳过分析
+    """
+
+    def __init__(self, subtitle_frame_no_box_dict, scene_div_frame_no_list=None, band_hashes=None,
+                 probe=None, decoded_frame_count=0, glyph_masks=None):
+        """
+        :param subtitle_frame_no_box_dict: 逐帧文本框字典{帧号: [(xmin, xmax, ymin, ymax)]}，帧号从1开始
+        :param scene_div_frame_no_list: 场景切换帧号列表，为None时表示未检测场景切换
+        :param band_hashes: 字幕区域哈希字典{帧号: 哈希}
+        :param probe: 媒体信息字典(MediaProbe.to_dict)
+        :param decoded_frame_count: 分析时解码的帧数
+        :param glyph_masks: 逐帧文字区域图(GlyphMaskStore)，为None时表示未保存
+        """
+        self.subtitle_frame_no_box_dict = subtitle_frame_no_box_dict
+        self.scene_div_frame_no_list = scene_div_frame_no_list
+        self.band_hashes = band_hashes or {}
+        self.probe = probe or {}
+        self.decoded_frame_count = decoded_frame_count
+        self.glyph_masks = glyph_masks
+
+    @property
+    def has_scene(self):
+        return self.scene_div_frame_no_list is not None
+
+    @staticmethod
+    def get_path(file_fingerprint, analysis_fingerprint):
+        return os.path.join(ANALYSIS_CACHE_DIR, f'{file_fingerprint}_{analysis_fingerprint}.npz')
+
+    @classmethod
+    def load(cls, video_path, analysis_fingerprint, file_fingerprint=None):
+        """
+        读取视频的分析结果，不存在或版本不一致时返回None
+        """
+        if file_fingerprint is None:
+            file_fingerprint = get_file_fingerprint(video_path)
+        sidecar_path = cls.get_path(file_fingerprint, analysis_fingerprint)
+        if not os.path.exists(sidecar_path):
+            return None
+        try:
+            with np.load(sidecar_path) as data:
+                if int(data['version']) != ANALYSIS_SIDECAR_VERSION:
+                    return None
+                subtitle_frame_no_box_dict = {}
+                for frame_no, box in zip(data['box_frame_nos'].tolist(), data['boxes'].tolist()):
+                    subtitle_frame_no_box_dict.setdefault(frame_no, []).append(tuple(box))
+                scene_div_frame_no_list = data['scene_cuts'].tolist() if bool(data['has_scene']) else None
+                band_hashes = dict(zip(data['hash_frame_nos'].tolist(), data['hashes']))
+                probe = json.loads(data['probe'].tobytes().decode('utf-8'))
+                glyph_masks = GlyphMaskStore.from_arrays(data) if bool(data['has_glyph']) else None
+                return cls(subtitle_frame_no_box_dict, scene_div_frame_no_list, band_hashes, probe,
+                           int(data['decoded_frame_count']), glyph_masks)
+        except Exception as e:
+            print(f'[Analysis] failed to load analysis sidecar {sidecar_path}: {e}')
+            return None
+
+    def save(self, video_path, analysis_fingerprint, file_fingerprint=None):
+        if file_fingerprint is None:
+            file_fingerprint = get_file_fingerprint(video_path)
+        box_frame_nos = []
+        boxes = []
+        for frame_no in sorted(self.subtitle_frame_no_box_dict.keys()):
+            for box in self.subtitle_frame_no_box_dict[frame_no]:
+                box_frame_nos.append(frame_no)
+                boxes.append(box)
+        hash_frame_nos = sorted(self.band_hashes.keys())
+        hashes = np.stack([self.band_hashes[frame_no] for frame_no in hash_frame_nos]) if hash_frame_nos \
+            else np.zeros((0, 0), dtype=np.uint8)
+        glyph_arrays = (self.glyph_masks or GlyphMaskStore()).to_arrays()
+        buffer = io.BytesIO()
+        np.savez_compressed(
+            buffer,
+            version=np.int32(ANALYSIS_SIDECAR_VERSION),
+            box_frame_nos=np.asarray(box_frame_nos, dtype=np.int32),
+            boxes=np.asarray(boxes, dtype=np.int32).reshape(-1, 4),
+            has_scene=np.bool_(self.has_scene),
+            scene_cuts=np.asarray(self.scene_div_frame_no_list or [], dtype=np.int32),
+            hash_frame_nos=np.asarray(hash_frame_nos, dtype=np.int32),
+            hashes=hashes.astype(np.uint8),
+            probe=np.frombuffer(json.dumps(self.probe).encode('utf-8'), dtype=np.uint8),
+            decoded_frame_count=np.int64(self.decoded_frame_count),
+            has_glyph=np.bool_(self.glyph_masks is not None),
+            **glyph_arrays,
+        )
+        sidecar_path = self.get_path(file_fingerprint, analysis_fingerprint)
+        try:
+            os.makedirs(ANALYSIS_CACHE_DIR, exist_ok=True)
+            # 先写临时文件再替换，避免并行写入时读到不完整的文件
+            temp_path = f'{sidecar_path}.{os.getpid()}.tmp'
+            with open(temp_path, 'wb') as f:
+                f.write(buffer.getvalue())
+            os.replace(temp_path, sidecar_path)
+        except Exception as e:
+            print(f'[Analysis] failed to save analysis sidecar: {e}')
@@ -0,0 +1,108 @@
+import cv2
+import numpy as np
+
+from backend import config
+
+# 计算字幕区域变化时，缩略图的宽度
+BAND_THUMBNAIL_WIDTH = 160
+
+
+def get_band(frame, sub_area=None):
+    """
+    获取帧中的字幕区域(视图，不复制)，未指定字幕区域时返回整帧
+    :param sub_area: (ymin, ymax, xmin, xmax)
+    """
+    if sub_area is None:
+        return frame
+    ymin, ymax, xmin, xmax = sub_area
+    return frame[max(ymin, 0):ymax, max(xmin, 0):xmax]
+
+
+def get_band_thumbnail(frame, sub_area=None):
+    """
+    字幕区域的灰度缩略图，用于低成本判断字幕区域是否发生变化
+    """
+    band = get_band(frame, sub_area)
+    height, width = band.shape[:2]
+    if height == 0 or width == 0:
+        return np.zeros((1, 1), dtype=np.uint8)
+    thumbnail_height = max(1, round(height * BAND_THUMBNAIL_WIDTH / width))
+    thumbnail = cv2.resize(band, (BAND_THUMBNAIL_WIDTH, thumbnail_height), interpolation=cv2.INTER_AREA)
+    if thumbnail.ndim == 3:
+        thumbnail = cv2.cvtColor(thumbnail, cv2.COLOR_BGR2GRAY)
+    return thumbnail
+
+
+def get_band_change_ratio(thumbnail_a, thumbnail_b):
+    """
+    两帧字幕区域缩略图中发生变化的像素比例
+    """
+    if thumbnail_a.shape != thumbnail_b.shape:
+        return 1.0
+    return float(np.mean(cv2.absdiff(thumbnail_a, thumbnail_b) > config.DET_CHANGE_PIXEL_THRESHOLD))
+
+
+def get_band_hash(frame, sub_area=None, thumbnail=None):
+    """
+    字幕区域的差值哈希(dHash)，相邻像素亮度大小关系组成的比特串
+    :param thumbnail: 已经计算好的字幕区域缩略图，为None时重新计算
+    """
+    if thumbnail is None:
+        thumbnail = get_band_thumbnail(frame, sub_area)
+    hash_width, hash_height = config.DET_BAND_HASH_SIZE
+    thumbnail = cv2.resize(thumbnail, (hash_width + 1, hash_height), interpolation=cv2.INTER_AREA)
+    return np.packbits(thumbnail[:, 1:] > thumbnail[:, :-1])
+
+
+def get_hash_distance(hash_a, hash_b):
+    """
+    两个哈希之间不同的比特数(汉明距离)
+    """
+    return int(np.unpackbits(np.bitwise_xor(hash_a, hash_b)).sum())
+
+
+class BandHashCache:
+    """
+    最近检测过的字幕区域哈希与检测结果，哈希距离不超过容差时认为字幕区域未变化，直接沿用检测结果
+    哈希只反映整体的明暗结构，少量文字出现或变化时哈希可能几乎不变，
+    因此没有文本框的结果同时保存缩略图，沿用前需要用confirm_empty确认缩略图也没有变化
+    """
+
+    def __init__(self, capacity=None, tolerance=None):
+        self.capacity = config.DET_BAND_HASH_CACHE_SIZE if capacity is None else capacity
+        self.tolerance = config.DET_BAND_HASH_TOLERANCE if tolerance is None else tolerance
+        self._entries = []
+
+    def get(self, band_hash, thumbnail=None):
+        """
+        查找哈希相近的缓存结果，优先匹配最近加入的结果
+        :param thumbnail: 当前帧的字幕区域缩略图，用于确认空结果
+        """
+        for i in range(len(self._entries) - 1, -1, -1):
+            cached_hash, value, cached_thumbnail = self._entries[i]
+            if get_hash_distance(cached_hash, band_hash) > self.tolerance:
+                continue
+            if len(value) == 0 and not confirm_empty(cached_thumbnail, thumbnail):
+                continue
+            # 命中的结果移动到末尾，最近最少使用的结果先被淘汰
+            self._entries.append(self._entries.pop(i))
+            return value
+        return None
+
+    def put(self, band_hash, value, thumbnail=None):
+        """
+        :param thumbnail: 字幕区域缩略图，没有文本框的结果需要保存，用于之后确认
+        """
+        self._entries.append((band_hash, value, thumbnail if len(value) == 0 else None))
+        if len(self._entries) > self.capacity:
+            self._entries.pop(0)
+
+
+def confirm_empty(thumbnail_a, thumbnail_b):
+    """
+    沿用没有文本框的检测结果前，确认两帧字幕区域缩略图中没有任何变化像素
+    新出现的一两个字在缩略图中只占几个像素，按变化比例(DET_CHANGE_RATIO)判断会漏掉
+    """
+    if thumbnail_a is None or thumbnail_b is None or thumbnail_a.shape != thumbnail_b.shape:
+        return False
+    return not np.any(cv2.absdiff(thumbnail_a, thumbnail_b) > config.DET_CHANGE_PIXEL_THRESHOLD)
@@ -0,0 +1,274 @@
+import os
+import time
+
+import cv2
+import numpy as np
+
+from backend import config
+
+# 自动调整批大小时，每帧推理占用的内存按输入张量大小的倍数估算(DB模型的中间特征图)
+DET_MEMORY_FACTOR = 40
+# 自动调整批大小时最多使用的可用内存比例
+DET_MEMORY_USAGE_RATIO = 0.5
+
+
+def get_available_memory(use_gpu):
+    """
+    获取可用内存(使用GPU时为可用显存)，单位字节，无法获取时返回None
+    """
+    if use_gpu:
+        try:
+            import torch
+            if torch.cuda.is_available():
+                return torch.cuda.mem_get_info()[0]
+        except Exception:
+            pass
+        return None
+    try:
+        import psutil
+        return psutil.virtual_memory().available
+    except ImportError:
+        pass
+    try:
+        return os.sysconf('SC_AVPHYS_PAGES') * os.sysconf('SC_PAGE_SIZE')
+    except (ValueError, OSError, AttributeError):
+        return None
+
+
+def is_out_of_memory_error(e):
+    if isinstance(e, MemoryError):
+        return True
+    message = str(e).lower()
+    return 'out of memory' in message or 'failed to allocate' in message or 'resourceexhausted' in message
+
+
+def detect_region(detector, imgs, region, padding=None, scale=None, return_maps=False):
+    """
+    只检测图片中的指定区域，文本框坐标转换回原图坐标
+    区域按整帧检测时的缩放比例缩放，保持与整帧检测相同的文字尺度，不再将整帧缩放后补边
+    :param detector: BatchTextDetector或DetectorPool
+    :param imgs: BGR图片列表
+    :param region: 检测区域(ymin, ymax, xmin, xmax)
+    :param padding: 检测区域向外扩展的像素，为None时使用DET_ROI_PADDING
+    :param scale: 区域的缩放比例，为None时使用整帧检测的缩放比例
+    :param return_maps: 是否同时返回文字区域图(坐标已转换回原图)
+    :return: (每张图片的文本框列表, 耗时)，return_maps为True时为(文本框列表, 耗时, 文字区域图列表)
+    """
+    if padding is None:
+        padding = config.DET_ROI_PADDING
+    height, width = imgs[0].shape[:2]
+    ymin, ymax, xmin, xmax = region
+    y0, y1 = max(0, ymin - padding), min(height, ymax + padding)
+    x0, x1 = max(0, xmin - padding), min(width, xmax + padding)
+    if y1 <= y0 or x1 <= x0:
+        result = [np.zeros((0, 4, 2), dtype=np.float32) for _ in imgs]
+        return (result, 0.0, [None] * len(imgs)) if return_maps else (result, 0.0)
+    if scale is None:
+        scale = detector.get_detect_scale((height, width))
+    band_size = (max(1, round((x1 - x0) * scale)), max(1, round((y1 - y0) * scale)))
+    bands = []
+    for img in imgs:
+        band = img[y0:y1, x0:x1]
+        if scale != 1.0:
+            band = cv2.resize(band, band_size, interpolation=cv2.INTER_LINEAR)
+        bands.append(band)
+    if return_maps:
+        dt_boxes_list, elapse, band_maps = detector(bands, return_maps=True)
+    else:
+        dt_boxes_list, elapse = detector(bands)
+    offset = np.array([x0, y0], dtype=np.float32)
+    result = []
+    for dt_boxes in dt_boxes_list:
+        dt_boxes = np.asarray(dt_boxes, dtype=np.float32)
+        if dt_boxes.size > 0:
+            dt_boxes = dt_boxes / np.array([band_size[0] / (x1 - x0), band_size[1] / (y1 - y0)],
+                                           dtype=np.float32) + offset
+        result.append(dt_boxes)
+    if not return_maps:
+        return result, elapse
+    text_maps = []
+    for band_map in band_maps:
+        if band_map is not None:
+            band_map = band_map[2]
+            if band_map.shape != (y1 - y0, x1 - x0):
+                band_map = cv2.resize(band_map.view(np.uint8), (x1 - x0, y1 - y0),
+                                      interpolation=cv2.INTER_NEAREST).astype(bool)
+            band_map = (y0, x0, band_map)
+        text_maps.append(band_map)
+    return result, elapse, text_maps
+
+
+class BatchTextDetector:
+    """
+    批量文本检测，将多帧(或多个裁剪区域)拼成一个批次，一次DB模型前向推理，DB后处理也按批次进行
+    复用paddleocr TextDetector的预处理、推理引擎(paddle或onnx)与后处理
+    """
+
+    def __init__(self, text_detector, batch_size=None, max_batch_size=None):
+        """
+        :param text_detector: paddleocr TextDetector对象
+        :param batch_size: 批大小，为None时使用DET_BATCH_SIZE，为0时根据可用内存自动调整
+        :param max_batch_size: 自动调整时的最大批大小
+        """
+        from paddleocr.tools.infer import predict_det
+        self._transform = predict_det.transform
+        self.text_detector = text_detector
+        self.args = getattr(text_detector, 'args', None)
+        self.use_onnx = text_detector.use_onnx
+        if batch_size is None:
+            batch_size = config.DET_BATCH_SIZE
+        if max_batch_size is None:
+            max_batch_size = config.DET_MAX_BATCH_SIZE
+        self.auto_batch_size = batch_size <= 0
+        # 自动调整前先按最大批大小读取帧，第一次推理时再根据输入尺寸调整
+        self.batch_size = max_batch_size if self.auto_batch_size else batch_size
+        self._tuned = not self.auto_batch_size
+        self.elapse = 0.0
+        # 概率图二值化阈值，与DB后处理一致
+        self.map_threshold = getattr(self.args, 'det_db_thresh', 0.3)
+
+    @property
+    def use_gpu(self):
+        if self.use_onnx:
+            return any('CUDA' in str(provider) or 'Dml' in str(provider) for provider in config.ONNX_PROVIDERS)
+        return bool(getattr(self.args, 'use_gpu', False))
+
+    def _tune_batch_size(self, input_shape):
+        """
+        根据输入张量大小与可用内存估算批大小
+        """
+        self._tuned = True
+        available_memory = get_available_memory(self.use_gpu)
+        if available_memory is None:
+            return
+        frame_memory = int(np.prod(input_shape)) * 4 * DET_MEMORY_FACTOR
+        batch_size = int(available_memory * DET_MEMORY_USAGE_RATIO // frame_memory)
+        self.batch_size = max(1, min(self.batch_size, batch_size))
+        print(f'[Detection] input shape: {tuple(input_shape)}, batch size: {self.batch_size}')
+
+    def _needs_split(self, img):
+        """
+        长宽比过大的图片由TextDetector切分后检测，不参与批处理
+        """
+        limit_side_len = getattr(self.args, 'det_limit_side_len', 960)
+        height, width = img.shape[:2]
+        return (height / width > 2 and height > limit_side_len) or \
+            (width / height > 3 and width > limit_side_len * 3)
+
+    def _forward(self, batch_imgs):
+        if self.use_onnx:
+            input_dict = {self.text_detector.input_tensor.name: batch_imgs}
+            outputs = self.text_detector.predictor.run(self.text_detector.output_tensors, input_dict)
+        else:
+            self.text_detector.input_tensor.copy_from_cpu(batch_imgs)
+            self.text_detector.predictor.run()
+            outputs = [output_tensor.copy_to_cpu() for output_tensor in self.text_detector.output_tensors]
+        return outputs[0]
+
+    def _get_text_map(self, prob_map, shape):
+        """
+        DB概率图去掉补边后缩放回原图尺寸并二值化，得到文字区域图
+        :return: (ymin, xmin, 布尔数组)，整张图片时偏移为0
+        """
+        src_h, src_w, ratio_h, ratio_w = shape
+        src_h, src_w = int(src_h), int(src_w)
+        prob_map = prob_map[:max(1, round(src_h * ratio_h)), :max(1, round(src_w * ratio_w))]
+        prob_map = cv2.resize(prob_map.astype(np.float32), (src_w, src_h), interpolation=cv2.INTER_LINEAR)
+        return 0, 0, prob_map > self.map_threshold
+
+    def _predict_batch(self, imgs, inputs, shapes, return_maps=False):
+        """
+        一次前向推理，DB后处理同时处理整个批次
+        :return: (文本框列表, 文字区域图列表)，return_maps为False时文字区域图列表为None
+        """
+        batch_imgs = np.ascontiguousarray(np.stack(inputs))
+        shape_list = np.stack(shapes)
+        maps = self._forward(batch_imgs)
+        post_result = self.text_detector.postprocess_op({'maps': maps}, shape_list)
+        dt_boxes_list = []
+        for img, result in zip(imgs, post_result):
+            dt_boxes = result['points']
+            if getattr(self.args, 'det_box_type', 'quad') == 'poly':
+                dt_boxes = self.text_detector.filter_tag_det_res_only_clip(dt_boxes, img.shape)
+            else:
+                dt_boxes = self.text_detector.filter_tag_det_res(dt_boxes, img.shape)
+            dt_boxes_list.append(dt_boxes)
+        if not return_maps:
+            return dt_boxes_list, None
+        return dt_boxes_list, [self._get_text_map(maps[k, 0], shape) for k, shape in enumerate(shape_list)]
+
+    def _predict_with_retry(self, imgs, inputs, shapes, return_maps=False):
+        """
+        按批大小分批推理，显存(内存)不足时批大小减半后重试
+        """
+        dt_boxes_list = []
+        text_maps = []
+        start = 0
+        while start < len(imgs):
+            end = start + self.batch_size
+            try:
+                batch_boxes, batch_maps = self._predict_batch(imgs[start:end], inputs[start:end], shapes[start:end],
+                                                              return_maps)
+                dt_boxes_list.extend(batch_boxes)
+                if return_maps:
+                    text_maps.extend(batch_maps)
+                start = end
+            except Exception as e:
+                if self.batch_size <= 1 or not is_out_of_memory_error(e):
+                    raise
+                self.batch_size = max(1, self.batch_size // 2)
+                print(f'[Detection] out of memory, reduce batch size to {self.batch_size}')
+        return dt_boxes_list, text_maps
+
+    def get_detect_scale(self, img_shape):
+        """
+        检测整帧时预处理(DetResizeForTest)使用的缩放比例
+        """
+        limit_side_len = getattr(self.args, 'det_limit_side_len', 960)
+        limit_type = getattr(self.args, 'det_limit_type', 'max')
+        height, width = img_shape[:2]
+        if limit_type == 'min':
+            return limit_side_len / min(height, width) if min(height, width) < limit_side_len else 1.0
+        return limit_side_len / max(height, width) if max(height, width) > limit_side_len else 1.0
+
+    def detect_region(self, imgs, region, padding=None, return_maps=False):
+        return detect_region(self, imgs, region, padding, return_maps=return_maps)
+
+    def __call__(self, imgs, return_maps=False):
+        """
+        批量检测文本框
+        :param imgs: BGR图片列表(视频帧或裁剪区域)
+        :param return_maps: 是否同时返回DB概率图二值化后的文字区域图，切分检测的图片没有文字区域图(为None)
+        :return: (每张图片的文本框列表, 耗时)，return_maps为True时为(文本框列表, 耗时, 文字区域图列表)
+        """
+        start_time = time.time()
+        dt_boxes_list = [None] * len(imgs)
+        text_maps = [None] * len(imgs)
+        # 按预处理后的输入尺寸分组，同尺寸的图片才能拼成一个批次
+        groups = {}
+        for i, img in enumerate(imgs):
+            if self._needs_split(img):
+                dt_boxes_list[i], _ = self.text_detector(img)
+                continue
+            data = self._transform({'image': img}, self.text_detector.preprocess_op)
+            if data is None or data[0] is None:
+                dt_boxes_list[i] = np.zeros((0, 4, 2), dtype=np.float32)
+                continue
+            input_img, shape = data
+            groups.setdefault(input_img.shape, []).append((i, input_img, shape))
+        for input_shape, items in groups.items():
+            if not self._tuned:
+                self._tune_batch_size(input_shape)
+            indices = [i for i, _, _ in items]
+            results, maps = self._predict_with_retry([imgs[i] for i in indices],
+                                                     [input_img for _, input_img, _ in items],
+                                                     [shape for _, _, shape in items], return_maps)
+            for k, (i, dt_boxes) in enumerate(zip(indices, results)):
+                dt_boxes_list[i] = dt_boxes
+                if return_maps:
+                    text_maps[i] = maps[k]
+        elapse = time.time() - start_time
+        self.elapse += elapse
+        if return_maps:
+            return dt_boxes_list, elapse, text_maps
+        return dt_boxes_list, elapse
@@ -0,0 +1,117 @@
+"""
+按交并比在相邻帧之间关联文本框，为每个文本框分配持续的轨迹编号
+同一轨迹中位置变化不超过像素容差的连续帧使用同一个文本框(轨迹片段的标准文本框)，
+与检测结果中文本框的先后顺序无关，避免检测顺序变化把字幕区间切碎
+"""
+import numpy as np
+
+from backend import config
+from backend.tools import text_boxes
+
+
+def get_similar_matrix(boxes_a, boxes_b, tolerance_x=None, tolerance_y=None):
+    """
+    两组文本框两两之间是否相似(各边偏差都在像素容差内)
+    :return: (N, M)布尔矩阵
+    """
+    if tolerance_x is None:
+        tolerance_x = config.PIXEL_TOLERANCE_X
+    if tolerance_y is None:
+        tolerance_y = config.PIXEL_TOLERANCE_Y
+    boxes_a = np.asarray(boxes_a, dtype=np.int64).reshape(-1, 4)
+    boxes_b = np.asarray(boxes_b, dtype=np.int64).reshape(-1, 4)
+    diff = np.abs(boxes_a[:, None, :] - boxes_b[None, :, :])
+    tolerance = np.array([tolerance_x, tolerance_x, tolerance_y, tolerance_y])
+    return (diff <= tolerance).all(axis=2)
+
+
+def match_boxes(boxes, track_boxes, iou_threshold=None, similar=None):
+    """
+    贪心匹配：相似或交并比不低于阈值的文本框对按(是否相似, 交并比)从大到小依次匹配，每个文本框最多匹配一次
+    :param similar: 已经计算好的相似矩阵，为None时重新计算
+    :return: 每个文本框匹配到的轨迹文本框序号，没有匹配时为-1
+    """
+    if iou_threshold is None:
+        iou_threshold = config.BOX_TRACK_IOU_THRESHOLD
+    matches = np.full(len(boxes), -1, dtype=np.int64)
+    if len(boxes) == 0 or len(track_boxes) == 0:
+        return matches
+    iou_matrix = text_boxes.get_iou_matrix(boxes, track_boxes)
+    if similar is None:
+        similar = get_similar_matrix(boxes, track_boxes)
+    score = np.where(similar | (iou_matrix >= iou_threshold), iou_matrix + similar, -1.0)
+    rows, cols = np.nonzero(score >= 0)
+    order = np.argsort(-score[rows, cols], kind='stable')
+    used_tracks = np.zeros(len(track_boxes), dtype=bool)
+    for row, col in zip(rows[order].tolist(), cols[order].tolist()):
+        if matches[row] < 0 and not used_tracks[col]:
+            matches[row] = col
+            used_tracks[col] = True
+    return matches
+
+
+class BoxTracker:
+    """
+    逐帧更新文本框轨迹
+    - 匹配到轨迹且与轨迹片段的标准文本框相似：沿用标准文本框
+    - 匹配到轨迹但位置变化超过容差：同一轨迹开始新片段，当前文本框作为新的标准文本框
+    - 没有匹配到轨迹：创建新轨迹
+    超过max_gap帧没有出现的轨迹不再参与匹配
+    """
+
+    def __init__(self, iou_threshold=None, max_gap=None):
+        self.iou_threshold = config.BOX_TRACK_IOU_THRESHOLD if iou_threshold is None else iou_threshold
+        self.max_gap = config.BOX_TRACK_MAX_GAP if max_gap is None else max_gap
+        # 轨迹编号 -> [标准文本框, 最后出现的帧号]
+        self.tracks = {}
+        # 仍参与匹配的轨迹编号
+        self.active_track_ids = []
+        self.segment_count = 0
+
+    def _get_active_tracks(self, frame_no):
+        self.active_track_ids = [track_id for track_id in self.active_track_ids
+                                 if frame_no - self.tracks[track_id][1] <= self.max_gap]
+        return self.active_track_ids
+
+    def update(self, frame_no, box_list):
+        """
+        :param box_list: 当前帧的文本框列表[(xmin, xmax, ymin, ymax)]
+        :return: [(轨迹编号, 标准文本框)]，按文本框位置排序
+        """
+        track_ids = list(self._get_active_tracks(frame_no))
+        track_boxes = [self.tracks[track_id][0] for track_id in track_ids]
+        similar = get_similar_matrix(box_list, track_boxes)
+        matches = match_boxes(box_list, track_boxes, self.iou_threshold, similar)
+        results = []
+        for i, box in enumerate(box_list):
+            box = tuple(box)
+            if matches[i] >= 0:
+                track_id = track_ids[matches[i]]
+                if not similar[i, matches[i]]:
+                    self.tracks[track_id][0] = box
+                    self.segment_count += 1
+            else:
+                track_id = len(self.tracks)
+                self.tracks[track_id] = [box, frame_no]
+                self.active_track_ids.append(track_id)
+                self.segment_count += 1
+            self.tracks[track_id][1] = frame_no
+            results.append((track_id, self.tracks[track_id][0]))
+        return sorted(results, key=lambda item: (item[1][2], item[1][0], item[1][3], item[1][1]))
+
+
+def track_regions(raw_regions, iou_threshold=None, max_gap=None):
+    """
+    将连续相似的文本框统一为轨迹片段的标准文本框
+    :param raw_regions: {帧号: [(xmin, xmax, ymin, ymax)]}
+    :return: (统一后的字典, BoxTracker)
+    """
+    tracker = BoxTracker(iou_threshold, max_gap)
+    unified_regions = {}
+    for frame_no in sorted(raw_regions.keys()):
+        box_list = []
+        for _, box in tracker.update(frame_no, raw_regions[frame_no]):
+            if box not in box_list:
+                box_list.append(box)
+        unified_regions[frame_no] = box_list
+    return unified_regions, tracker
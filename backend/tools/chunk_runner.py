@@ -0,0 +1,42 @@
+import bisect
+
+
+def split_frame_range(frame_count, boundaries, chunk_count, min_chunk_frames=0):
+    """
+    在关键帧或场景切换位置将视频切分为多个片段
+    :param frame_count: 视频总帧数
+    :param boundaries: 允许切分的帧号列表(从0开始)，切分点为新片段的第一帧
+    :param chunk_count: 期望的片段数量
+    :param min_chunk_frames: 片段最少帧数
+    :return: [(start, end)]，帧号从0开始，左闭右开
+    """
+    boundaries = sorted(set(b for b in boundaries if 0 < b < frame_count))
+    cut_points = []
+    for i in range(1, chunk_count):
+        # 理想的均分位置
+        target = frame_count * i // chunk_count
+        idx = bisect.bisect_left(boundaries, target)
+        candidates = boundaries[max(idx - 1, 0):idx + 1]
+        if not candidates:
+            break
+        # 选择离均分位置最近的切分点
+        point = min(candidates, key=lambda b: abs(b - target))
+        last_point = cut_points[-1] if cut_points else 0
+        if point - last_point >= max(min_chunk_frames, 1) and frame_count - point >= min_chunk_frames:
+            cut_points.append(point)
+    edges = [0] + cut_points + [frame_count]
+    return [(edges[i], edges[i + 1]) for i in range(len(edges) - 1)]
+
+
+def process_chunk(task):
+    """
+    在子进程中处理一个视频片段，编码输出不含音频的视频片段
+    :param task: (片段序号, 视频路径, 字幕区域, 帧范围, 片段输出路径)
+    :return: (片段序号, 帧范围, 是否成功)
+    """
+    index, video_path, sub_area, frame_range, output_path = task
+    # 子进程中再导入，避免与backend.main循环导入
+    from backend.main import SubtitleRemover
+    remover = SubtitleRemover(video_path, sub_area=sub_area, frame_range=frame_range, output_path=output_path)
+    remover.run()
+    return index, frame_range, remover.is_successful_merged
@@ -0,0 +1,199 @@
+import json
+import os
+import time
+
+import cv2
+import numpy as np
+
+from backend import config
+from backend.tools import text_boxes
+from backend.tools.detector_pool import create_text_detector
+from backend.tools.media_probe import MediaProbe
+
+# 对比量化模型与原模型时，交并比超过该值的文本框视为检出
+QUANTIZE_MATCH_IOU = 0.5
+
+
+def get_calibration_frames(video_path, frame_count=None):
+    """
+    在视频中均匀抽取校准帧
+    """
+    if frame_count is None:
+        frame_count = config.DET_INT8_CALIBRATION_FRAMES
+    total = MediaProbe.get(video_path).frame_count
+    cap = cv2.VideoCapture(video_path)
+    frames = []
+    try:
+        if total <= 1:
+            ret, frame = cap.read()
+            return [frame] if ret else []
+        for frame_no in np.unique(np.linspace(0, total - 1, frame_count).astype(int)):
+            cap.set(cv2.CAP_PROP_POS_FRAMES, int(frame_no))
+            ret, frame = cap.read()
+            if ret:
+                frames.append(frame)
+    finally:
+        cap.release()
+    return frames
+
+
+def get_detector_inputs(text_detector, frames):
+    """
+    使用检测器的预处理得到模型输入张量，作为静态量化的校准数据
+    """
+    from paddleocr.tools.infer import predict_det
+    inputs = []
+    for frame in frames:
+        data = predict_det.transform({'image': frame}, text_detector.preprocess_op)
+        if data is not None and data[0] is not None:
+            inputs.append(np.expand_dims(data[0], axis=0).astype(np.float32))
+    return inputs
+
+
+def quantize_model(onnx_model_path, int8_model_path, calibration_inputs, mode=None):
+    """
+    将onnx检测模型量化为INT8
+    :param calibration_inputs: 校准数据，只有静态量化需要
+    :param mode: static(静态量化，权重与激活均为INT8)或dynamic(动态量化，只量化权重)
+    """
+    from onnxruntime.quantization import CalibrationDataReader, QuantFormat, QuantType, quantize_dynamic, \
+        quantize_static
+    if mode is None:
+        mode = config.DET_INT8_QUANTIZE_MODE
+    temp_path = f'{int8_model_path}.{os.getpid()}.tmp'
+    if mode == 'dynamic':
+        quantize_dynamic(onnx_model_path, temp_path, weight_type=QuantType.QUInt8)
+    else:
+        import onnxruntime as ort
+        input_name = ort.InferenceSession(onnx_model_path, providers=['CPUExecutionProvider']).get_inputs()[0].name
+
+        class DetCalibrationReader(CalibrationDataReader):
+
+            def __init__(self):
+                self._inputs = iter(calibration_inputs)
+
+            def get_next(self):
+                input_tensor = next(self._inputs, None)
+                return None if input_tensor is None else {input_name: input_tensor}
+
+        model_input = onnx_model_path
+        try:
+            # 量化前先推断中间张量的形状，paddle2onnx导出的模型为动态形状
+            from onnxruntime.quantization.shape_inference import quant_pre_process
+            model_input = f'{int8_model_path}.{os.getpid()}.pre.onnx'
+            quant_pre_process(onnx_model_path, model_input)
+        except Exception as e:
+            print(f'[Quantization] skip pre-processing: {e}')
+            model_input = onnx_model_path
+        try:
+            quantize_static(model_input, temp_path, DetCalibrationReader(), quant_format=QuantFormat.QDQ,
+                            per_channel=True, activation_type=QuantType.QUInt8, weight_type=QuantType.QInt8)
+        finally:
+            if model_input != onnx_model_path and os.path.exists(model_input):
+                os.remove(model_input)
+    os.replace(temp_path, int8_model_path)
+
+
+def compare_detections(reference_boxes_list, boxes_list, iou_threshold=QUANTIZE_MATCH_IOU):
+    """
+    以原模型的检测结果为基准，计算量化模型的文本框召回率与平均交并比
+    :param reference_boxes_list: 原模型每帧的检测框(N, 4, 2)
+    :param boxes_list: 量化模型每帧的检测框
+    :return: (召回率, 平均交并比, 基准文本框数量)，平均交并比为每个基准文本框与最匹配文本框交并比的平均值，未检出记为0
+    """
+    best_ious = []
+    for reference_boxes, boxes in zip(reference_boxes_list, boxes_list):
+        reference_boxes = text_boxes.get_boxes(reference_boxes)
+        if len(reference_boxes) == 0:
+            continue
+        iou_matrix = text_boxes.get_iou_matrix(reference_boxes, text_boxes.get_boxes(boxes))
+        if iou_matrix.shape[1] == 0:
+            best_ious.append(np.zeros(len(reference_boxes)))
+        else:
+            best_ious.append(iou_matrix.max(axis=1))
+    if len(best_ious) == 0:
+        return 0.0, 0.0, 0
+    best_ious = np.concatenate(best_ious)
+    return float(np.mean(best_ious >= iou_threshold)), float(np.mean(best_ious)), len(best_ious)
+
+
+def get_report_key():
+    """
+    影响量化结果判定的配置，与缓存的对比结果不一致时重新量化
+    """
+    return {
+        'mode': config.DET_INT8_QUANTIZE_MODE,
+        'min_recall': config.DET_INT8_MIN_RECALL,
+        'min_iou': config.DET_INT8_MIN_IOU,
+        'min_reference_boxes': config.DET_INT8_MIN_REFERENCE_BOXES,
+    }
+
+
+def run_detector(text_detector, frames):
+    start_time = time.time()
+    boxes_list = [text_detector(frame)[0] for frame in frames]
+    return boxes_list, time.time() - start_time
+
+
+def get_quantized_model(onnx_model_path, video_path, onnx_providers):
+    """
+    获取INT8量化检测模型，不存在时从视频中抽取校准帧量化，并与原模型对比检测结果
+    召回率或平均交并比低于阈值时拒绝使用量化模型，对比结果保存在模型旁的json文件中，删除该文件可以重新量化
+    校准帧中原模型检出的文本框少于DET_INT8_MIN_REFERENCE_BOXES时无法判断，使用原模型且不保存对比结果
+    :return: 量化模型路径，量化模型未通过对比或量化失败时返回None
+    """
+    int8_model_path = os.path.join(os.path.dirname(onnx_model_path), 'model.int8.onnx')
+    report_path = os.path.join(os.path.dirname(onnx_model_path), 'model.int8.json')
+    report_key = get_report_key()
+    if os.path.exists(report_path):
+        with open(report_path, 'r', encoding='utf-8') as f:
+            report = json.load(f)
+        if all(report.get(key) == value for key, value in report_key.items()):
+            if report.get('accepted') and os.path.exists(int8_model_path):
+                return int8_model_path
+            return None
+        print('[Quantization] quantization settings changed, re-evaluating')
+    try:
+        frames = get_calibration_frames(video_path)
+        if len(frames) == 0:
+            return None
+        print(f'[Quantization] quantizing {onnx_model_path} with {len(frames)} calibration frames...')
+        fp32_detector = create_text_detector(onnx_model_path, onnx_providers)
+        quantize_model(onnx_model_path, int8_model_path, get_detector_inputs(fp32_detector, frames))
+        int8_detector = create_text_detector(int8_model_path, onnx_providers)
+        # 先各运行一次预热，避免首次推理的初始化耗时影响速度对比
+        run_detector(fp32_detector, frames[:1])
+        run_detector(int8_detector, frames[:1])
+        reference_boxes_list, fp32_time = run_detector(fp32_detector, frames)
+        boxes_list, int8_time = run_detector(int8_detector, frames)
+    except Exception as e:
+        print(f'[Quantization] failed to quantize detection model: {e}')
+        return None
+    recall, mean_iou, reference_count = compare_detections(reference_boxes_list, boxes_list)
+    if reference_count < config.DET_INT8_MIN_REFERENCE_BOXES:
+        print(f'[Quantization] only {reference_count} reference boxes in calibration frames, '
+              f'not enough to verify the quantized model, use original model')
+        if os.path.exists(int8_model_path):
+            os.remove(int8_model_path)
+        return None
+    accepted = recall >= config.DET_INT8_MIN_RECALL and mean_iou >= config.DET_INT8_MIN_IOU
+    report = {
+        'accepted': accepted,
+        **report_key,
+        'calibration_frames': len(frames),
+        'reference_boxes': reference_count,
+        'recall': round(recall, 4),
+        'mean_iou': round(mean_iou, 4),
+        'fp32_time': round(fp32_time, 3),
+        'int8_time': round(int8_time, 3),
+    }
+    print(f'[Quantization] recall: {report["recall"]}, mean iou: {report["mean_iou"]}, '
+          f'fp32: {report["fp32_time"]}s, int8: {report["int8_time"]}s, '
+          f'{"accepted" if accepted else "rejected, use original model"}')
+    if not accepted and os.path.exists(int8_model_path):
+        os.remove(int8_model_path)
+    temp_path = f'{report_path}.{os.getpid()}.tmp'
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    os.replace(temp_path, report_path)
+    return int8_model_path if accepted else None
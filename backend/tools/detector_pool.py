@@ -0,0 +1,183 @@
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from backend import config
+from backend.tools.batch_text_detector import BatchTextDetector, detect_region
+
+
+# 进程内设置的检测会话数量，为None时使用DET_POOL_SIZE
+# SubtitleRemover初始化时会重新加载配置模块，因此web服务在这里开启会话池
+_pool_size = None
+
+
+def set_pool_size(pool_size):
+    """
+    设置进程内共享的检测会话数量，设置为0时不使用会话池
+    """
+    global _pool_size
+    _pool_size = pool_size
+
+
+def get_pool_size():
+    return config.DET_POOL_SIZE if _pool_size is None else _pool_size
+
+
+def get_cpu_threads(pool_size):
+    """
+    每个检测会话使用的CPU线程数，为0时按CPU核数平均分配给各会话
+    """
+    if config.DET_POOL_CPU_THREADS > 0:
+        return config.DET_POOL_CPU_THREADS
+    return max(1, (os.cpu_count() or 1) // max(1, pool_size))
+
+
+def create_text_detector(model_dir, onnx_providers, cpu_threads=None):
+    """
+    创建paddleocr DB文本检测器
+    :param model_dir: paddle模型目录或onnx模型路径
+    :param onnx_providers: onnx推理后端，为空时使用paddle推理
+    :param cpu_threads: 单个会话的算子内线程数，为None时使用paddleocr默认值
+    """
+    import paddle
+    paddle.disable_signal_handler()
+    from paddleocr.tools.infer import utility
+    from paddleocr.tools.infer.predict_det import TextDetector
+    # 获取参数对象
+    args = utility.parse_args()
+    args.det_algorithm = 'DB'
+    args.det_model_dir = model_dir
+    args.use_onnx = len(onnx_providers) > 0
+    args.onnx_providers = onnx_providers
+    if cpu_threads is not None:
+        args.cpu_threads = cpu_threads
+        if args.use_onnx:
+            import onnxruntime as ort
+            sess_options = ort.SessionOptions()
+            # 多个会话并行推理，每个会话只使用分配到的线程，算子之间串行执行
+            sess_options.intra_op_num_threads = cpu_threads
+            sess_options.inter_op_num_threads = 1
+            args.onnx_sess_options = sess_options
+    return TextDetector(args)
+
+
+class _DetectRequest:
+
+    def __init__(self, imgs, return_maps=False):
+        self.imgs = imgs
+        self.return_maps = return_maps
+        self.future = Future()
+
+
+class DetectorPool:
+    """
+    进程内共享的文本检测会话池，保持N个已加载模型的检测会话
+    多个任务(线程)提交的帧进入同一个请求队列，空闲会话在等待时间内合并多个请求凑成一个批次(微批处理)再推理
+    """
+
+    def __init__(self, model_dir, onnx_providers, pool_size=None, batch_timeout=None):
+        """
+        :param model_dir: paddle模型目录或onnx模型路径
+        :param onnx_providers: onnx推理后端，为空时使用paddle推理
+        :param pool_size: 检测会话数量，为None时使用get_pool_size()
+        :param batch_timeout: 合并请求的最长等待时间(秒)，为None时使用DET_POOL_BATCH_TIMEOUT
+        """
+        if pool_size is None:
+            pool_size = get_pool_size()
+        self.pool_size = max(1, pool_size)
+        self.batch_timeout = config.DET_POOL_BATCH_TIMEOUT if batch_timeout is None else batch_timeout
+        cpu_threads = get_cpu_threads(self.pool_size)
+        self.detectors = [BatchTextDetector(create_text_detector(model_dir, onnx_providers, cpu_threads))
+                          for _ in range(self.pool_size)]
+        self._requests = queue.Queue()
+        self._workers = []
+        for detector in self.detectors:
+            worker = threading.Thread(target=self._run, args=(detector,), daemon=True)
+            worker.start()
+            self._workers.append(worker)
+        print(f'[Detection] detector pool: {self.pool_size} sessions, {cpu_threads} cpu threads per session')
+
+    @property
+    def batch_size(self):
+        return min(detector.batch_size for detector in self.detectors)
+
+    def get_detect_scale(self, img_shape):
+        return self.detectors[0].get_detect_scale(img_shape)
+
+    def submit(self, imgs, return_maps=False):
+        """
+        提交一组图片，返回Future，结果与BatchTextDetector.__call__一致
+        """
+        request = _DetectRequest(list(imgs), return_maps)
+        if len(request.imgs) == 0:
+            request.future.set_result(([], 0.0, []) if return_maps else ([], 0.0))
+        else:
+            self._requests.put(request)
+        return request.future
+
+    def detect_region(self, imgs, region, padding=None, return_maps=False):
+        return detect_region(self, imgs, region, padding, return_maps=return_maps)
+
+    def __call__(self, imgs, return_maps=False):
+        """
+        批量检测文本框，阻塞直到结果返回，可以在多个线程中同时调用
+        :return: (每张图片的文本框列表, 耗时)，return_maps为True时为(文本框列表, 耗时, 文字区域图列表)
+        """
+        return self.submit(imgs, return_maps).result()
+
+    def _collect(self, batch_size):
+        """
+        取出一个请求，并在等待时间内继续合并请求，直到图片数达到批大小
+        """
+        requests = [self._requests.get()]
+        image_count = len(requests[0].imgs)
+        deadline = time.time() + self.batch_timeout
+        while image_count < batch_size:
+            timeout = deadline - time.time()
+            try:
+                request = self._requests.get(timeout=timeout) if timeout > 0 else self._requests.get_nowait()
+            except queue.Empty:
+                break
+            requests.append(request)
+            image_count += len(request.imgs)
+        return requests
+
+    def _run(self, detector):
+        while True:
+            requests = self._collect(detector.batch_size)
+            imgs = [img for request in requests for img in request.imgs]
+            return_maps = any(request.return_maps for request in requests)
+            try:
+                if return_maps:
+                    dt_boxes_list, elapse, text_maps = detector(imgs, return_maps=True)
+                else:
+                    dt_boxes_list, elapse = detector(imgs)
+            except Exception as e:
+                for request in requests:
+                    request.future.set_exception(e)
+                continue
+            start = 0
+            for request in requests:
+                end = start + len(request.imgs)
+                if request.return_maps:
+                    request.future.set_result((dt_boxes_list[start:end], elapse, text_maps[start:end]))
+                else:
+                    request.future.set_result((dt_boxes_list[start:end], elapse))
+                start = end
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_detector_pool(model_dir, onnx_providers):
+    """
+    获取进程内共享的检测会话池，同一模型与推理后端只加载一次
+    """
+    key = (os.path.normpath(model_dir), tuple(onnx_providers))
+    with _pools_lock:
+        if key not in _pools:
+            _pools[key] = DetectorPool(model_dir, onnx_providers)
+        return _pools[key]
@@ -0,0 +1,260 @@
+import os
+import queue
+import subprocess
+import threading
+
+import cv2
+import numpy as np
+
+from backend import config
+from backend.tools.common_tools import is_image_file
+from backend.tools.media_probe import MediaProbe
+
+
+class FrameSource:
+    """
+    视频帧读取基类：在后台线程中提前解码视频帧并放入有界队列，使解码与模型推理重叠执行
+    read()接口与cv2.VideoCapture.read()保持一致，可以直接替换原有的读取循环
+    """
+
+    def __init__(self, video_path, crop_area=None, queue_size=None, frame_range=None):
+        """
+        :param video_path: 视频路径
+        :param crop_area: 需要额外裁剪出来的区域(ymin, ymax, xmin, xmax)，为None时不裁剪
+        :param queue_size: 预解码队列长度，为None时使用config.FRAME_SOURCE_QUEUE_SIZE
+        :param frame_range: 只读取指定的帧范围(start, end)，帧号从0开始，左闭右开，为None时读取整个视频
+        """
+        self.video_path = video_path
+        self.crop_area = crop_area
+        self.frame_range = frame_range
+        if queue_size is None:
+            queue_size = config.FRAME_SOURCE_QUEUE_SIZE
+        self._queue = queue.Queue(maxsize=max(1, queue_size))
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._error = None
+        self._finished = False
+        # 读取视频信息，不解码视频帧
+        self.media_probe = MediaProbe.get(video_path)
+        self.frame_count = self.media_probe.frame_count
+        self.fps = self.media_probe.fps
+        self.width = self.media_probe.width
+        self.height = self.media_probe.height
+        self.start_frame = 0
+        if frame_range is not None:
+            self.start_frame, end_frame = frame_range
+            if self.frame_count > 0:
+                end_frame = min(end_frame, self.frame_count)
+            self.frame_count = max(0, end_frame - self.start_frame)
+
+    def _iter_frames(self):
+        """
+        逐帧解码视频，由子类实现，返回BGR格式的numpy数组
+        """
+        raise NotImplementedError
+
+    def _close(self):
+        """
+        释放解码器资源
+        """
+        pass
+
+    def _crop(self, frame):
+        if self.crop_area is None:
+            return None
+        ymin, ymax, xmin, xmax = self.crop_area
+        return np.ascontiguousarray(frame[ymin:ymax, xmin:xmax])
+
+    def _put(self, item):
+        # 队列满时周期性检查是否已经被要求停止，防止release时解码线程永久阻塞
+        while not self._stop_event.is_set():
+            try:
+                self._queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _decode_loop(self):
+        try:
+            count = 0
+            for frame in self._iter_frames():
+                if not self._put((frame, self._crop(frame))):
+                    break
+                count += 1
+                # 指定帧范围时，读取到结尾帧即停止
+                if self.frame_range is not None and count >= self.frame_count:
+                    break
+        except Exception as e:
+            self._error = e
+        finally:
+            self._put(None)
+
+    def _start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._decode_loop, daemon=True)
+            self._thread.start()
+
+    def isOpened(self):
+        return not self._finished
+
+    def read_with_band(self):
+        """
+        读取下一帧及其裁剪区域
+        :return: (是否读取成功, 视频帧, 裁剪区域)，未设置crop_area时裁剪区域为None
+        """
+        if self._finished:
+            return False, None, None
+        self._start()
+        item = self._queue.get()
+        if item is None:
+            self._finished = True
+            if self._error is not None:
+                print(f'[FrameSource] failed to decode {self.video_path}: {self._error}')
+            return False, None, None
+        frame, band = item
+        return True, frame, band
+
+    def read(self):
+        ret, frame, _ = self.read_with_band()
+        return ret, frame
+
+    def release(self):
+        self._stop_event.set()
+        self._finished = True
+        if self._thread is not None:
+            # 清空队列，让阻塞在put上的解码线程能够退出
+            while self._thread.is_alive():
+                try:
+                    self._queue.get(timeout=0.1)
+                except queue.Empty:
+                    pass
+            self._thread = None
+        self._close()
+
+
+class OpenCVFrameSource(FrameSource):
+    """
+    使用OpenCV解码
+    """
+
+    def __init__(self, video_path, crop_area=None, queue_size=None, frame_range=None):
+        super().__init__(video_path, crop_area, queue_size, frame_range)
+        self._video_cap = None
+
+    def _iter_frames(self):
+        self._video_cap = cv2.VideoCapture(self.video_path)
+        if self.start_frame > 0:
+            self._video_cap.set(cv2.CAP_PROP_POS_FRAMES, self.start_frame)
+        while not self._stop_event.is_set():
+            ret, frame = self._video_cap.read()
+            if not ret:
+                break
+            yield frame
+
+    def _close(self):
+        if self._video_cap is not None:
+            self._video_cap.release()
+            self._video_cap = None
+
+
+class PyAVFrameSource(FrameSource):
+    """
+    使用PyAV解码，开启多线程解码
+    """
+
+    def __init__(self, video_path, crop_area=None, queue_size=None, frame_range=None):
+        import av
+        super().__init__(video_path, crop_area, queue_size, frame_range)
+        self._av = av
+        self._container = None
+
+    def _iter_frames(self):
+        self._container = self._av.open(self.video_path)
+        stream = self._container.streams.video[0]
+        stream.thread_type = 'AUTO'
+        stream_start = stream.start_time if stream.start_time is not None else 0
+        if self.start_frame > 0:
+            # seek到起始帧之前的关键帧，再丢弃起始帧之前的视频帧
+            self._container.seek(stream_start + int(self.start_frame / self.fps / stream.time_base),
+                                 stream=stream, backward=True)
+        for frame in self._container.decode(stream):
+            if self._stop_event.is_set():
+                break
+            if self.start_frame > 0 and frame.pts is not None:
+                if round((frame.pts - stream_start) * stream.time_base * self.fps) < self.start_frame:
+                    continue
+            yield frame.to_ndarray(format='bgr24')
+
+    def _close(self):
+        if self._container is not None:
+            self._container.close()
+            self._container = None
+        super()._close()
+
+
+class FFmpegPipeFrameSource(FrameSource):
+    """
+    使用ffmpeg子进程解码，通过管道读取rawvideo格式的BGR视频帧
+    """
+
+    def __init__(self, video_path, crop_area=None, queue_size=None, frame_range=None):
+        super().__init__(video_path, crop_area, queue_size, frame_range)
+        self._process = None
+
+    def _iter_frames(self):
+        command = [config.FFMPEG_PATH, "-loglevel", "error"]
+        if self.start_frame > 0:
+            # 输入端seek，ffmpeg解码时会丢弃起始时间之前的视频帧
+            command.extend(["-ss", f"{self.start_frame / self.fps:.6f}"])
+        command.extend(["-i", self.video_path])
+        if self.frame_range is not None:
+            command.extend(["-frames:v", str(self.frame_count)])
+        command.extend(["-an", "-sn",
+                        "-vsync", "0",
+                        "-f", "rawvideo",
+                        "-pix_fmt", "bgr24",
+                        "-"])
+        use_shell = True if os.name == "nt" else False
+        self._process = subprocess.Popen(command, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE,
+                                         stderr=subprocess.DEVNULL, shell=use_shell)
+        frame_size = self.width * self.height * 3
+        while not self._stop_event.is_set():
+            # 读入可写的bytearray，帧需要支持原地修改(例如STTN把去字幕结果直接写回原帧)
+            buffer = bytearray(frame_size)
+            if self._process.stdout.readinto(buffer) < frame_size:
+                break
+            yield np.frombuffer(buffer, dtype=np.uint8).reshape((self.height, self.width, 3))
+
+    def _close(self):
+        if self._process is not None:
+            if self._process.poll() is None:
+                self._process.kill()
+            self._process.stdout.close()
+            self._process.wait()
+            self._process = None
+        super()._close()
+
+
+def open_frame_source(video_path, backend=None, crop_area=None, queue_size=None, frame_range=None):
+    """
+    根据配置创建视频帧读取对象
+    :param video_path: 视频路径
+    :param backend: 解码后端，可选opencv、pyav、ffmpeg，为None时使用config.FRAME_SOURCE_BACKEND
+    :param crop_area: 需要额外裁剪出来的区域(ymin, ymax, xmin, xmax)
+    :param queue_size: 预解码队列长度
+    :param frame_range: 只读取指定的帧范围(start, end)，帧号从0开始，左闭右开
+    """
+    if backend is None:
+        backend = config.FRAME_SOURCE_BACKEND
+    # 图片只能使用OpenCV读取
+    if is_image_file(str(video_path)):
+        backend = 'opencv'
+    if backend == 'pyav':
+        try:
+            return PyAVFrameSource(video_path, crop_area, queue_size, frame_range)
+        except ImportError:
+            print('[FrameSource] PyAV is not installed, falling back to OpenCV')
+    elif backend == 'ffmpeg':
+        return FFmpegPipeFrameSource(video_path, crop_area, queue_size, frame_range)
+    return OpenCVFrameSource(video_path, crop_area, queue_size, frame_range)
@@ -0,0 +1,128 @@
+import bisect
+
+import cv2
+import numpy as np
+
+from backend import config
+
+
+class GlyphMaskStore:
+    """
+    逐帧保存检测模型输出的文字区域图(DB概率图二值化结果)
+    每帧只保存文本框外接区域内的部分，按比特压缩存储
+    没有检测过的帧(沿用其他帧检测结果的帧)按文本框集合对应到最近一次检测出相同文本框的帧，
+    文本框不同时不使用其他帧的文字区域图，避免字幕变化后使用上一条字幕的文字区域
+    """
+
+    def __init__(self):
+        # {帧号: (ymin, xmin, height, width, 压缩后的比特数组)}
+        self._entries = {}
+        # 每一帧使用的文字区域图所在帧号，只记录变化的位置：帧号列表与对应的来源帧号(没有时为-1)
+        self._source_frame_nos = []
+        self._sources = []
+        # {文本框集合: 最近保存的帧号}，只在检测时使用，不保存
+        self._box_sets = {}
+
+    def __len__(self):
+        return len(self._entries)
+
+    def put(self, frame_no, text_map, box_list):
+        """
+        :param text_map: 文字区域图(ymin, xmin, 布尔数组)
+        :param box_list: 该帧的文本框列表[(xmin, xmax, ymin, ymax)]，只保存文本框扩展后的外接区域
+        """
+        if text_map is None or len(box_list) == 0:
+            return
+        map_y0, map_x0, bitmap = text_map
+        boxes = np.asarray(box_list, dtype=np.int64).reshape(-1, 4)
+        deviation = config.SUBTITLE_AREA_DEVIATION_PIXEL
+        y0 = max(map_y0, int(boxes[:, 2].min()) - deviation)
+        y1 = min(map_y0 + bitmap.shape[0], int(boxes[:, 3].max()) + deviation)
+        x0 = max(map_x0, int(boxes[:, 0].min()) - deviation)
+        x1 = min(map_x0 + bitmap.shape[1], int(boxes[:, 1].max()) + deviation)
+        if y1 <= y0 or x1 <= x0:
+            return
+        bitmap = bitmap[y0 - map_y0:y1 - map_y0, x0 - map_x0:x1 - map_x0]
+        self._entries[frame_no] = (y0, x0, y1 - y0, x1 - x0, np.packbits(bitmap))
+        self._box_sets[get_box_set(box_list)] = frame_no
+
+    def assign(self, frame_no, box_list):
+        """
+        记录帧使用的文字区域图，需要按帧号顺序调用，同一窗口中检测过的帧先put再assign
+        保存过文字区域图的帧使用自己的，否则使用最近保存的文本框完全相同的帧(沿用检测结果时文本框不变)
+        :param box_list: 该帧的文本框列表，与put时的文本框同为检测结果(未经统一)
+        """
+        if frame_no in self._entries:
+            source = frame_no
+        elif len(box_list) == 0:
+            source = -1
+        else:
+            source = self._box_sets.get(get_box_set(box_list), -1)
+        if not self._sources or self._sources[-1] != source:
+            self._source_frame_nos.append(frame_no)
+            self._sources.append(source)
+
+    def find(self, frame_no):
+        """
+        获取帧使用的文字区域图所在帧号，没有时返回None
+        """
+        if frame_no in self._entries:
+            return frame_no
+        position = bisect.bisect_right(self._source_frame_nos, frame_no)
+        if position == 0 or self._sources[position - 1] < 0:
+            return None
+        return self._sources[position - 1]
+
+    def get_mask(self, size, frame_nos):
+        """
+        多帧文字区域图的并集，并向外膨胀DET_GLYPH_MASK_DILATE像素
+        :param size: 帧尺寸(height, width)
+        :param frame_nos: 帧号列表
+        :return: uint8掩码(文字为255)，任一帧没有对应的文字区域图时返回None(使用矩形掩码)
+        """
+        stored_frame_nos = {self.find(frame_no) for frame_no in frame_nos}
+        if len(stored_frame_nos) == 0 or None in stored_frame_nos:
+            return None
+        mask = np.zeros(size, dtype=np.uint8)
+        for frame_no in stored_frame_nos:
+            y0, x0, height, width, bits = self._entries[frame_no]
+            bitmap = np.unpackbits(bits, count=height * width).reshape(height, width)
+            region = mask[y0:y0 + height, x0:x0 + width]
+            region |= bitmap[:region.shape[0], :region.shape[1]] * np.uint8(255)
+        dilate = config.DET_GLYPH_MASK_DILATE
+        if dilate > 0:
+            mask = cv2.dilate(mask, cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (2 * dilate + 1, 2 * dilate + 1)))
+        return mask
+
+    def to_arrays(self):
+        """
+        转换为numpy数组，用于保存到分析结果文件
+        """
+        frame_nos = sorted(self._entries.keys())
+        rects = [self._entries[frame_no][:4] for frame_no in frame_nos]
+        bits = [self._entries[frame_no][4] for frame_no in frame_nos]
+        return {
+            'glyph_frame_nos': np.asarray(frame_nos, dtype=np.int32),
+            'glyph_rects': np.asarray(rects, dtype=np.int32).reshape(-1, 4),
+            'glyph_sizes': np.asarray([len(b) for b in bits], dtype=np.int64),
+            'glyph_bits': np.concatenate(bits) if bits else np.zeros(0, dtype=np.uint8),
+            'glyph_source_frame_nos': np.asarray(self._source_frame_nos, dtype=np.int32),
+            'glyph_sources': np.asarray(self._sources, dtype=np.int32),
+        }
+
+    @classmethod
+    def from_arrays(cls, data):
+        store = cls()
+        offsets = np.concatenate([[0], np.cumsum(data['glyph_sizes'])])
+        for i, (frame_no, rect) in enumerate(zip(data['glyph_frame_nos'].tolist(), data['glyph_rects'].tolist())):
+            store._entries[frame_no] = (*rect, data['glyph_bits'][offsets[i]:offsets[i + 1]])
+        store._source_frame_nos = data['glyph_source_frame_nos'].tolist()
+        store._sources = data['glyph_sources'].tolist()
+        return store
+
+
+def get_box_set(box_list):
+    """
+    与文本框顺序无关的文本框集合，作为文字区域图的键
+    """
+    return tuple(sorted(tuple(int(v) for v in box) for box in box_list))
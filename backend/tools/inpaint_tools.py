@@ -1,9 +1,12 @@
+import itertools
 import multiprocessing
 import cv2
 import numpy as np
 
 from backend import config
 from backend.inpaint.lama_inpaint import LamaInpaint
+from backend.tools.shared_frame_buffer import SharedFrameRingBuffer
+from backend.tools.mask_geometry import MaskGeometry
 
 
 def batch_generator(data, max_batch_size):
@@ -31,36 +34,117 @@ def batch_generator(data, max_batch_size):
         yield data[last_batch_start:]
 
 
-def inference_task(batch_data):
-    inpainted_frame_dict = dict()
-    for data in batch_data:
-        index, original_frame, coords_list = data
-        mask_size = original_frame.shape[:2]
-        mask = create_mask(mask_size, coords_list)
-        inpaint_frame = inpaint(original_frame, mask)
-        inpainted_frame_dict[index] = inpaint_frame
-    return inpainted_frame_dict
+def sliding_window_batches(frames, window_size, overlap):
+    """
+    流式滑动窗口分批，每个窗口最多window_size帧，窗口前后各保留overlap帧作为时序上下文
+    只保存当前窗口内的帧，内存占用与区间长度无关
+    :param frames: 视频帧迭代器
+    :param window_size: 窗口最大帧数
+    :param overlap: 相邻窗口重叠的帧数
+    :return: 生成(窗口帧列表, 输出起始位置, 输出结束位置)，窗口中[起始位置, 结束位置)的帧为新输出的帧
+    """
+    # 每个窗口至少输出一帧
+    overlap = max(0, min(overlap, (window_size - 1) // 2))
+    window = []
+    emit_start = 0
+    for frame in frames:
+        window.append(frame)
+        if len(window) < window_size:
+            continue
+        emit_end = window_size - overlap
+        yield window, emit_start, emit_end
+        # 保留overlap帧已输出的帧作为下一窗口的前文，以及overlap帧未输出的帧
+        window = window[emit_end - overlap:]
+        emit_start = overlap
+    if len(window) > emit_start:
+        yield window, emit_start, len(window)
+
+
+# 子进程中已附加的共享内存帧缓冲区
+_attached_buffers = {}
+# 子进程中的LaMa模型，只加载一次
+_lama_inpaint = None
+
+
+def inference_task(task):
+    """
+    子进程推理任务，从共享内存读取帧，去除字幕后原地写回同一槽位
+    :param task: (帧缓冲区句柄, [(帧号, 槽位序号, 文本框坐标列表)])
+    :return: [(帧号, 槽位序号)]
+    """
+    handle, batch_data = task
+    name = handle[0]
+    if name not in _attached_buffers:
+        _attached_buffers[name] = SharedFrameRingBuffer.attach(handle)
+    frame_buffer = _attached_buffers[name]
+    results = []
+    for index, slot, coords_list in batch_data:
+        # 没有字幕的帧原样返回
+        if coords_list:
+            original_frame = frame_buffer.get(slot)
+            mask = create_mask(original_frame.shape[:2], coords_list)
+            if config.LAMA_SUPER_FAST:
+                original_frame[:] = cv2.inpaint(original_frame, mask, 3, cv2.INPAINT_TELEA)
+            else:
+                original_frame[:] = inpaint(original_frame, mask)
+        results.append((index, slot))
+    return results
 
 
 def parallel_inference(inputs, batch_size=None, pool_size=None):
     """
     并行推理，同时保持结果顺序
+    帧通过共享内存环形缓冲区在进程间传递，进程之间只传递槽位序号
+    :param inputs: (帧号, 视频帧, 文本框坐标列表)的可迭代对象，可以是边解码边生成的生成器
+    :return: 按输入顺序生成(帧号, 去除字幕后的帧)，帧为共享内存视图，下一次迭代后失效，需要保留时请复制
     """
+    inputs = iter(inputs)
+    first_input = next(inputs, None)
+    if first_input is None:
+        return
     if pool_size is None:
         pool_size = multiprocessing.cpu_count()
-    # 使用上下文管理器自动管理进程池
-    with multiprocessing.Pool(processes=pool_size) as pool:
-        batched_inputs = list(batch_generator(inputs, batch_size))
-        # 使用map函数保证输入输出的顺序是一致的
-        batch_results = pool.map(inference_task, batched_inputs)
-    # 将批推理结果展平
-    index_inpainted_frames = [item for sublist in batch_results for item in sublist]
-    return index_inpainted_frames
+    if batch_size is None:
+        batch_size = 1
+    # 保证每个进程同时有一个批次在推理、一个批次在等待
+    slot_count = batch_size * pool_size * 2
+    frame_buffer = SharedFrameRingBuffer(slot_count, first_input[1].shape)
+
+    def generate_tasks():
+        batch_data = []
+        for index, frame, coords_list in itertools.chain([first_input], inputs):
+            # 没有空闲槽位时阻塞，直到主进程取走结果，主进程停止读取结果后不再生成任务
+            slot = frame_buffer.put(frame)
+            if slot is None:
+                return
+            batch_data.append((index, slot, coords_list))
+            if len(batch_data) == batch_size:
+                yield frame_buffer.handle, batch_data
+                batch_data = []
+        if batch_data:
+            yield frame_buffer.handle, batch_data
+
+    try:
+        # 使用上下文管理器自动管理进程池，使用spawn启动子进程，避免fork后CUDA无法初始化
+        with multiprocessing.get_context('spawn').Pool(processes=pool_size) as pool:
+            try:
+                # 使用imap函数保证输入输出的顺序是一致的
+                for batch_results in pool.imap(inference_task, generate_tasks()):
+                    for index, slot in batch_results:
+                        yield index, frame_buffer.get(slot)
+                        frame_buffer.release(slot)
+            finally:
+                # 子进程出错或调用方提前停止时，先唤醒等待空闲槽位的任务线程，否则进程池退出时会一直等待该线程
+                frame_buffer.stop()
+    finally:
+        frame_buffer.close()
 
 
 def inpaint(img, mask):
-    lama_inpaint_instance = LamaInpaint()
-    img_inpainted = lama_inpaint_instance(img, mask)
+    global _lama_inpaint
+    if _lama_inpaint is None:
+        _lama_inpaint = LamaInpaint()
+    img_inpainted = _lama_inpaint(img, mask)
     return img_inpainted
 
 
@@ -72,7 +156,15 @@ def inpaint_with_multiple_masks(censored_img, mask_list):
     return inpainted_frame
 
 
-def create_mask(size, coords_list):
+def create_mask(size, coords_list, glyph_mask=None):
+    """
+    :param glyph_mask: 文字区域掩码(GlyphMaskStore.get_mask)，不为None时每个文本框只保留框内的文字区域，
+    文本框内没有文字区域时仍使用整个文本框
+    :return: uint8掩码，glyph_mask为None时为同一组文本框共用的只读数组，需要修改时请复制
+    """
+    if glyph_mask is None:
+        # 同一组文本框只光栅化一次
+        return MaskGeometry.get(size, coords_list).to_mask()
     mask = np.zeros(size, dtype="uint8")
     if coords_list:
         for coords in coords_list:
@@ -86,32 +178,10 @@ def create_mask(size, coords_list):
                 y1 = 0
             x2 = xmax + config.SUBTITLE_AREA_DEVIATION_PIXEL
             y2 = ymax + config.SUBTITLE_AREA_DEVIATION_PIXEL
+            if glyph_mask is not None and glyph_mask[max(ymin, 0):ymax, max(xmin, 0):xmax].any():
+                np.maximum(mask[y1:y2 + 1, x1:x2 + 1], glyph_mask[y1:y2 + 1, x1:x2 + 1],
+                           out=mask[y1:y2 + 1, x1:x2 + 1])
+                continue
             cv2.rectangle(mask, (x1, y1),
                           (x2, y2), (255, 255, 255), thickness=-1)
     return mask
-
-
-def inpaint_video(video_path, sub_list):
-    index = 0
-    frame_to_inpaint_list = []
-    video_cap = cv2.VideoCapture(video_path)
-    while True:
-        # 读取视频帧
-        ret, frame = video_cap.read()
-        if not ret:
-            break
-        index += 1
-        if index in sub_list.keys():
-            frame_to_inpaint_list.append((index, frame, sub_list[index]))
-        if len(frame_to_inpaint_list) > config.PROPAINTER_MAX_LOAD_NUM:
-            batch_results = parallel_inference(frame_to_inpaint_list)
-            for index, frame in batch_results:
-                file_name = f'/home/yao/Documents/Project/video-subtitle-remover/test/temp/{index}.png'
-                cv2.imwrite(file_name, frame)
-                print(f"success write: {file_name}")
-            frame_to_inpaint_list.clear()
-    print(f'finished')
-
-
-if __name__ == '__main__':
-    multiprocessing.set_start_method("spawn")
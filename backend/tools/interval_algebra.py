@@ -0,0 +1,132 @@
+"""
+帧区间运算，区间为闭区间[起始帧号, 结束帧号]，以起始帧号数组与结束帧号数组表示
+与SubtitleDetect中原有的逐区间循环实现结果一致
+"""
+import numpy as np
+
+
+def to_arrays(intervals):
+    """
+    区间列表[(start, end)]转换为(起始帧号数组, 结束帧号数组)
+    """
+    intervals = np.asarray(intervals, dtype=np.int64).reshape(-1, 2)
+    return intervals[:, 0].copy(), intervals[:, 1].copy()
+
+
+def to_list(starts, ends):
+    return list(zip(np.asarray(starts).tolist(), np.asarray(ends).tolist()))
+
+
+def continuous_ranges(frame_nos, ids=None):
+    """
+    连续帧号组成的区间
+    :param frame_nos: 帧号数组(可以无序)
+    :param ids: 每一帧的文本框集合编号，不为None时编号变化的位置也作为区间分界
+    """
+    frame_nos = np.asarray(frame_nos, dtype=np.int64)
+    if len(frame_nos) == 0:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    order = np.argsort(frame_nos, kind='stable')
+    frame_nos = frame_nos[order]
+    breaks = np.diff(frame_nos) != 1
+    if ids is not None:
+        ids = np.asarray(ids)[order]
+        breaks |= ids[1:] != ids[:-1]
+    break_positions = np.flatnonzero(breaks)
+    starts = frame_nos[np.concatenate([[0], break_positions + 1])]
+    ends = frame_nos[np.concatenate([break_positions, [len(frame_nos) - 1]])]
+    return starts, ends
+
+
+def split_by_points(starts, ends, points):
+    """
+    在切分点处切分区间(切分点作为新区间的起始帧)，对应split_range_by_scene
+    """
+    starts = np.asarray(starts, dtype=np.int64)
+    ends = np.asarray(ends, dtype=np.int64)
+    points = np.unique(np.asarray(points, dtype=np.int64))
+    # 每个区间内大于起始帧且不超过结束帧的切分点
+    lo = np.searchsorted(points, starts, side='right')
+    hi = np.searchsorted(points, ends, side='right')
+    counts = np.maximum(hi - lo, 0)
+    sizes = counts + 1
+    block_starts = np.cumsum(sizes) - sizes
+    out_starts = np.empty(int(sizes.sum()), dtype=np.int64)
+    out_ends = np.empty_like(out_starts)
+    out_starts[block_starts] = starts
+    out_ends[block_starts + counts] = ends
+    total = int(counts.sum())
+    if total > 0:
+        interval_ids = np.repeat(np.arange(len(starts)), counts)
+        within = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+        cut_points = points[lo[interval_ids] + within]
+        cut_positions = block_starts[interval_ids] + 1 + within
+        out_starts[cut_positions] = cut_points
+        out_ends[cut_positions - 1] = cut_points - 1
+    return out_starts, out_ends
+
+
+def expand_and_merge(starts, ends, expand_size, max_length):
+    """
+    将区间扩展到至少expand_size帧(不超过max_length帧)，并按输入顺序合并与前一个区间重叠的区间
+    对应expand_and_merge_intervals
+    """
+    starts = np.asarray(starts, dtype=np.int64)
+    ends = np.asarray(ends, dtype=np.int64)
+    if len(starts) == 0:
+        return starts.copy(), ends.copy()
+    amounts = np.maximum(expand_size - (ends - starts + 1), 0)
+    new_starts = np.maximum(starts - amounts // 2, 1)
+    new_ends = ends + amounts // 2
+    new_ends = np.where(new_ends - new_starts + 1 > max_length, new_starts + max_length - 1, new_ends)
+    single = (starts == ends) & (new_ends - new_starts + 1 < expand_size)
+    new_ends = np.where(single, new_starts + expand_size - 1, new_ends)
+    # 合并后区间的结束帧为组内结束帧的最大值，且各组的最大值递增，因此与之前所有区间结束帧的最大值比较即可
+    previous_max_ends = np.maximum.accumulate(new_ends)[:-1]
+    group_starts = np.concatenate([[0], np.flatnonzero(new_starts[1:] > previous_max_ends) + 1])
+    return new_starts[group_starts], np.maximum.reduceat(new_ends, group_starts)
+
+
+def merge_short(starts, ends, target_length):
+    """
+    将单帧区间在不与相邻区间重叠的前提下扩展到接近target_length帧，再合并相邻且长度不足target_length的区间
+    对应filter_and_merge_intervals，输入区间先按起始帧排序，相互重叠的区间先合并为一个区间
+    """
+    starts = np.asarray(starts, dtype=np.int64)
+    ends = np.asarray(ends, dtype=np.int64)
+    if len(starts) == 0:
+        return starts.copy(), ends.copy()
+    if np.any(ends < starts):
+        raise ValueError('interval end frame is before its start frame')
+    order = np.lexsort((ends, starts))
+    starts, ends = starts[order], ends[order]
+    previous_max_ends = np.maximum.accumulate(ends)[:-1]
+    if np.any(starts[1:] <= previous_max_ends):
+        group_starts = np.concatenate([[0], np.flatnonzero(starts[1:] > previous_max_ends) + 1])
+        starts, ends = starts[group_starts], np.maximum.reduceat(ends, group_starts)
+    half = (target_length - 1) // 2
+    single = starts == ends
+    next_starts = np.concatenate([starts[1:], [np.iinfo(np.int64).max // 2]])
+    # 单帧区间扩展后的结束帧只取决于下一个区间，扩展后仍与前后区间互不重叠
+    new_ends = np.where(single, np.minimum(starts + half, next_starts - 1), ends)
+    previous_ends = np.concatenate([[np.iinfo(np.int64).min // 2], new_ends[:-1]])
+    new_starts = np.where(single, np.maximum(starts - half, previous_ends + 1), starts)
+    # 相邻(首尾相接)的区间组成一段，段内依次合并，直到合并后的长度达到target_length
+    adjacent = new_starts[1:] == new_ends[:-1] + 1
+    run_starts = np.concatenate([[0], np.flatnonzero(~adjacent) + 1])
+    run_ends = np.concatenate([run_starts[1:] - 1, [len(new_starts) - 1]])
+    out_starts = []
+    out_ends = []
+    for first, last in zip(run_starts.tolist(), run_ends.tolist()):
+        if first == last:
+            out_starts.append(new_starts[first])
+            out_ends.append(new_ends[first])
+            continue
+        group = first
+        while group <= last:
+            end = group + int(np.searchsorted(new_ends[group:last + 1], new_starts[group] + target_length - 1))
+            end = min(end, last)
+            out_starts.append(new_starts[group])
+            out_ends.append(new_ends[end])
+            group = end + 1
+    return np.asarray(out_starts, dtype=np.int64), np.asarray(out_ends, dtype=np.int64)
@@ -0,0 +1,133 @@
+import numpy as np
+
+from backend.tools.interval_algebra import continuous_ranges
+
+
+class IntervalPlan:
+    """
+    去字幕计划：逐帧文本框与待处理的帧区间，使用numpy数组保存
+    - frame_box_ids: 帧号到文本框集合编号的映射，帧号从1开始，没有字幕的帧为-1
+    - box_sets: 文本框集合表，同一组文本框只保存一次
+    - starts/ends: 按起始帧号排序的处理区间(闭区间)
+    按帧号查询文本框为O(1)，查询区间为O(log n)
+    """
+
+    def __init__(self, frame_box_ids, box_sets, starts=None, ends=None):
+        self.frame_box_ids = frame_box_ids
+        self.box_sets = box_sets
+        self.starts = np.zeros(0, dtype=np.int64) if starts is None else np.asarray(starts, dtype=np.int64)
+        self.ends = np.zeros(0, dtype=np.int64) if ends is None else np.asarray(ends, dtype=np.int64)
+
+    @classmethod
+    def from_frame_box_dict(cls, subtitle_frame_no_box_dict):
+        """
+        :param subtitle_frame_no_box_dict: {帧号: [(xmin, xmax, ymin, ymax)]}
+        """
+        frame_count = max(subtitle_frame_no_box_dict.keys(), default=0)
+        frame_box_ids = np.full(frame_count + 1, -1, dtype=np.int32)
+        box_set_ids = {}
+        box_sets = []
+        for frame_no, box_list in subtitle_frame_no_box_dict.items():
+            if len(box_list) == 0:
+                continue
+            box_set = tuple(tuple(box) for box in box_list)
+            box_set_id = box_set_ids.get(box_set)
+            if box_set_id is None:
+                box_set_id = box_set_ids[box_set] = len(box_sets)
+                box_sets.append(box_set)
+            frame_box_ids[frame_no] = box_set_id
+        return cls(frame_box_ids, box_sets)
+
+    @property
+    def frame_nos(self):
+        """
+        有字幕的帧号
+        """
+        return np.flatnonzero(self.frame_box_ids >= 0)
+
+    @property
+    def intervals(self):
+        """
+        处理区间列表[(起始帧号, 结束帧号)]
+        """
+        return list(zip(self.starts.tolist(), self.ends.tolist()))
+
+    def __len__(self):
+        return len(self.starts)
+
+    def __bool__(self):
+        return bool(np.any(self.frame_box_ids >= 0))
+
+    def get_box_set_id(self, frame_no):
+        if 0 <= frame_no < len(self.frame_box_ids):
+            return int(self.frame_box_ids[frame_no])
+        return -1
+
+    def has_boxes(self, frame_no):
+        return self.get_box_set_id(frame_no) >= 0
+
+    def get_boxes(self, frame_no):
+        """
+        帧的文本框列表，没有字幕时返回空列表
+        """
+        box_set_id = self.get_box_set_id(frame_no)
+        return list(self.box_sets[box_set_id]) if box_set_id >= 0 else []
+
+    def get_range_boxes(self, start, stop):
+        """
+        帧号[start, stop)内所有帧的文本框，按出现顺序去重
+        """
+        ids = self.frame_box_ids[max(start, 0):max(stop, 0)]
+        ids = ids[ids >= 0]
+        _, first_indices = np.unique(ids, return_index=True)
+        boxes = []
+        for box_set_id in ids[np.sort(first_indices)].tolist():
+            for box in self.box_sets[box_set_id]:
+                if box not in boxes:
+                    boxes.append(box)
+        return boxes
+
+    def get_ranges(self, same_boxes=False):
+        """
+        有字幕的连续帧区间
+        :param same_boxes: 为True时文本框发生变化的位置也作为区间分界
+        :return: (起始帧号数组, 结束帧号数组)
+        """
+        frame_nos = self.frame_nos
+        return continuous_ranges(frame_nos, self.frame_box_ids[frame_nos] if same_boxes else None)
+
+    def with_intervals(self, intervals):
+        """
+        使用同一份逐帧文本框，替换处理区间
+        :param intervals: [(起始帧号, 结束帧号)]或(起始帧号数组, 结束帧号数组)
+        """
+        if isinstance(intervals, tuple) and len(intervals) == 2 and isinstance(intervals[0], np.ndarray):
+            starts, ends = intervals
+        else:
+            intervals = np.asarray(intervals, dtype=np.int64).reshape(-1, 2)
+            starts, ends = intervals[:, 0], intervals[:, 1]
+        order = np.argsort(starts, kind='stable')
+        return IntervalPlan(self.frame_box_ids, self.box_sets, starts[order], ends[order])
+
+    def find_interval(self, frame_no):
+        """
+        包含该帧的处理区间序号，不在任何区间内时返回-1
+        """
+        i = int(np.searchsorted(self.starts, frame_no, side='right')) - 1
+        if i >= 0 and frame_no <= self.ends[i]:
+            return i
+        return -1
+
+    def is_start(self, frame_no):
+        """
+        该帧是否为某个处理区间的起始帧
+        """
+        i = int(np.searchsorted(self.starts, frame_no, side='left'))
+        return i < len(self.starts) and self.starts[i] == frame_no
+
+    def get_end(self, frame_no):
+        """
+        包含该帧的处理区间的结束帧号，不在任何区间内时返回-1
+        """
+        i = self.find_interval(frame_no)
+        return int(self.ends[i]) if i >= 0 else -1
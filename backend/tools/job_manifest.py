@@ -0,0 +1,125 @@
+import json
+import os
+import shutil
+import time
+
+from backend.tools.media_probe import get_file_fingerprint
+
+MANIFEST_FILE_NAME = 'manifest.json'
+MANIFEST_VERSION = 1
+
+
+def get_job_config(config, sub_area=None):
+    """
+    获取影响输出结果的配置，配置变化后已完成的片段不能复用
+    """
+    return {
+        'mode': config.MODE.value,
+        'sub_area': list(sub_area) if sub_area is not None else None,
+        'sttn_skip_detection': config.STTN_SKIP_DETECTION,
+        'sttn_neighbor_stride': config.STTN_NEIGHBOR_STRIDE,
+        'sttn_reference_length': config.STTN_REFERENCE_LENGTH,
+        'sttn_max_load_num': config.STTN_MAX_LOAD_NUM,
+        'propainter_max_load_num': config.PROPAINTER_MAX_LOAD_NUM,
+        'lama_super_fast': config.LAMA_SUPER_FAST,
+        'use_h264': config.USE_H264,
+        'video_crf': config.VIDEO_CRF,
+        'video_preset': config.VIDEO_PRESET,
+    }
+
+
+class JobManifest:
+    """
+    可断点续跑的去字幕任务，记录输入文件指纹、配置以及已完成的片段，保存在任务目录的manifest.json中
+    任务中断后重新运行，会跳过已完成的片段
+    """
+
+    def __init__(self, job_dir, input_hash, job_config, chunk_ranges, completed=None):
+        """
+        :param job_dir: 任务目录，保存manifest与已完成的视频片段
+        :param input_hash: 输入视频文件指纹
+        :param job_config: 影响输出结果的配置
+        :param chunk_ranges: 片段帧范围列表[(start, end)]，帧号从0开始，左闭右开
+        :param completed: 已完成的片段序号
+        """
+        self.job_dir = job_dir
+        self.input_hash = input_hash
+        self.job_config = job_config
+        self.chunk_ranges = [tuple(chunk_range) for chunk_range in chunk_ranges]
+        self.completed = set(completed or [])
+
+    @property
+    def manifest_path(self):
+        return os.path.join(self.job_dir, MANIFEST_FILE_NAME)
+
+    def segment_path(self, index):
+        return os.path.join(self.job_dir, f'{index:06d}.ts')
+
+    def is_completed(self, index):
+        return index in self.completed
+
+    @property
+    def completed_frame_count(self):
+        return sum(end - start for i, (start, end) in enumerate(self.chunk_ranges) if i in self.completed)
+
+    @classmethod
+    def read(cls, job_dir):
+        """
+        读取任务目录中的manifest，不存在或损坏时返回None
+        """
+        manifest_path = os.path.join(job_dir, MANIFEST_FILE_NAME)
+        if not os.path.exists(manifest_path):
+            return None
+        try:
+            with open(manifest_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except Exception as e:
+            print(f'[Job] failed to read manifest {manifest_path}: {e}')
+            return None
+        if data.get('version') != MANIFEST_VERSION:
+            return None
+        return cls(job_dir, data['input_hash'], data['config'], data['chunk_ranges'], data['completed'])
+
+    @classmethod
+    def load_or_create(cls, job_dir, video_path, job_config, create_chunk_ranges):
+        """
+        输入文件与配置都未变化时恢复已有任务，否则重新创建任务
+        :param create_chunk_ranges: 创建新任务时调用，返回片段帧范围列表
+        """
+        input_hash = get_file_fingerprint(video_path)
+        manifest = cls.read(job_dir)
+        if manifest is not None and manifest.input_hash == input_hash and manifest.job_config == job_config:
+            # 片段文件丢失时需要重新处理
+            manifest.completed = {i for i in manifest.completed if os.path.exists(manifest.segment_path(i))}
+            print(f'[Job] resume job from {job_dir}, '
+                  f'{len(manifest.completed)}/{len(manifest.chunk_ranges)} chunks completed')
+            return manifest
+        if manifest is not None:
+            print(f'[Job] input file or config changed, restart job in {job_dir}')
+        shutil.rmtree(job_dir, ignore_errors=True)
+        os.makedirs(job_dir, exist_ok=True)
+        manifest = cls(job_dir, input_hash, job_config, create_chunk_ranges())
+        manifest.save()
+        return manifest
+
+    def mark_completed(self, index):
+        self.completed.add(index)
+        self.save()
+
+    def save(self):
+        data = {
+            'version': MANIFEST_VERSION,
+            'input_hash': self.input_hash,
+            'config': self.job_config,
+            'chunk_ranges': [list(chunk_range) for chunk_range in self.chunk_ranges],
+            'completed': sorted(self.completed),
+            'updated_at': time.time(),
+        }
+        # 先写临时文件再替换，避免中断时manifest损坏
+        temp_path = f'{self.manifest_path}.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f)
+        os.replace(temp_path, self.manifest_path)
+
+    def cleanup(self):
+        shutil.rmtree(self.job_dir, ignore_errors=True)
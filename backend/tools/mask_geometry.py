@@ -0,0 +1,175 @@
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from backend import config
+
+# 掩码中大于该值的像素视为需要去除的区域(与STTN中cv2.threshold(mask, 127, 1)一致)
+MASK_THRESHOLD = 127
+
+
+def get_inpaint_area(H, h, row_counts):
+    """
+    与STTNInpaint.get_inpaint_area_by_mask一致，从视频底部开始每h行为一段，确定需要填补的区域
+    :param H: 帧高度
+    :param h: 每段的高度
+    :param row_counts: 每一行掩码像素的数量，长度为H
+    :return: [(from_H, to_H)]
+    """
+    row_counts = np.asarray(row_counts, dtype=np.int64)[:H]
+    if len(row_counts) < H:
+        row_counts = np.concatenate([row_counts, np.zeros(H - len(row_counts), dtype=np.int64)])
+    # 前缀和，任意一段的像素数为O(1)
+    prefix = np.concatenate([[0], np.cumsum(row_counts)])
+    inpaint_area = []
+    to_H = from_H = H
+    while from_H != 0:
+        if to_H - h < 0:
+            from_H = 0
+            to_H = h
+        else:
+            from_H = to_H - h
+        if prefix[min(to_H, H)] - prefix[from_H] > 10:
+            # 如果不是第一个段落，向下移动以确保没遗漏遮罩区域
+            if to_H != H:
+                move = 0
+                while to_H + move < H and row_counts[to_H + move] != 0:
+                    move += 1
+                if to_H + move < H and move < h:
+                    to_H += move
+                    from_H += move
+            if (from_H, to_H) not in inpaint_area:
+                inpaint_area.append((from_H, to_H))
+            else:
+                break
+        to_H -= h
+    return inpaint_area
+
+
+class MaskGeometry:
+    """
+    字幕掩码的几何信息，只保存掩码所在的行范围(带)，同一组文本框只光栅化一次
+    - top/bottom: 掩码所在的行范围[top, bottom)
+    - band: 行范围内的掩码(整行宽度)
+    - row_counts: 每一行掩码像素的数量
+    - bbox: 掩码像素的外接矩形(xmin, xmax, ymin, ymax)，空掩码为None
+    """
+    _cache = OrderedDict()
+    _lock = threading.Lock()
+
+    def __init__(self, size, top, band):
+        self.size = tuple(size)
+        self.top = top
+        self.bottom = top + band.shape[0]
+        self.band = band
+        self.band.flags.writeable = False
+        occupied = band > MASK_THRESHOLD
+        self.row_counts = np.count_nonzero(occupied, axis=1)
+        self.bbox = None
+        if self.row_counts.any():
+            rows = np.flatnonzero(self.row_counts)
+            cols = np.flatnonzero(occupied.any(axis=0))
+            self.bbox = (int(cols[0]), int(cols[-1]), top + int(rows[0]), top + int(rows[-1]))
+        # {split_h: (inpaint_area, band_masks)}
+        self._inpaint_areas = {}
+        # 整帧掩码，第一次使用时生成
+        self._mask = None
+
+    @classmethod
+    def from_boxes(cls, size, coords_list):
+        """
+        光栅化文本框，与create_mask一致：每个文本框向外扩展SUBTITLE_AREA_DEVIATION_PIXEL像素
+        """
+        height, width = size[:2]
+        deviation = config.SUBTITLE_AREA_DEVIATION_PIXEL
+        rects = []
+        for xmin, xmax, ymin, ymax in coords_list or []:
+            x1, x2 = sorted((max(xmin - deviation, 0), xmax + deviation))
+            y1, y2 = sorted((max(ymin - deviation, 0), ymax + deviation))
+            x1, y1, x2, y2 = max(x1, 0), max(y1, 0), min(x2, width - 1), min(y2, height - 1)
+            if x1 <= x2 and y1 <= y2:
+                rects.append((x1, y1, x2, y2))
+        if len(rects) == 0:
+            return cls(size, 0, np.zeros((0, width), dtype=np.uint8))
+        top = min(rect[1] for rect in rects)
+        bottom = max(rect[3] for rect in rects) + 1
+        band = np.zeros((bottom - top, width), dtype=np.uint8)
+        for x1, y1, x2, y2 in rects:
+            band[y1 - top:y2 + 1 - top, x1:x2 + 1] = 255
+        return cls(size, top, band)
+
+    @classmethod
+    def from_mask(cls, mask):
+        """
+        从整帧掩码创建，不缓存
+        """
+        mask = np.asarray(mask)
+        if mask.ndim == 3:
+            mask = mask[:, :, 0]
+        rows = np.flatnonzero((mask > MASK_THRESHOLD).any(axis=1))
+        if len(rows) == 0:
+            return cls(mask.shape, 0, np.zeros((0, mask.shape[1]), dtype=np.uint8))
+        return cls(mask.shape, int(rows[0]), mask[rows[0]:rows[-1] + 1].astype(np.uint8))
+
+    @classmethod
+    def get(cls, size, coords_list):
+        """
+        获取文本框集合对应的掩码几何信息，最近使用的MASK_CACHE_SIZE个直接返回缓存
+        """
+        key = (tuple(size[:2]), tuple(tuple(coords) for coords in coords_list or []),
+               config.SUBTITLE_AREA_DEVIATION_PIXEL)
+        with cls._lock:
+            geometry = cls._cache.get(key)
+            if geometry is not None:
+                cls._cache.move_to_end(key)
+                return geometry
+        geometry = cls.from_boxes(size, coords_list)
+        with cls._lock:
+            cls._cache[key] = geometry
+            while len(cls._cache) > max(config.MASK_CACHE_SIZE, 1):
+                cls._cache.popitem(last=False)
+        return geometry
+
+    @property
+    def is_empty(self):
+        return self.bbox is None
+
+    def to_mask(self):
+        """
+        整帧uint8掩码(去除区域为255)，第一次调用时生成并缓存，返回只读数组，需要修改时请复制
+        """
+        if self._mask is None:
+            mask = np.zeros(self.size[:2], dtype=np.uint8)
+            mask[self.top:self.bottom] = self.band
+            mask.flags.writeable = False
+            # 行范围内的掩码改为整帧掩码的视图，不重复占用内存
+            self.band = mask[self.top:self.bottom]
+            self._mask = mask
+        return self._mask
+
+    def get_row_counts(self):
+        """
+        整帧每一行掩码像素的数量
+        """
+        row_counts = np.zeros(self.size[0], dtype=np.int64)
+        row_counts[self.top:self.bottom] = self.row_counts
+        return row_counts
+
+    def get_inpaint_area(self, split_h):
+        """
+        STTN去除区域与每个区域的布尔遮罩(h, W, 1)，按分段高度缓存
+        :return: (inpaint_area, band_masks)
+        """
+        result = self._inpaint_areas.get(split_h)
+        if result is None:
+            inpaint_area = get_inpaint_area(self.size[0], split_h, self.get_row_counts())
+            band_masks = []
+            for from_H, to_H in inpaint_area:
+                band_mask = np.zeros((to_H - from_H, self.size[1], 1), dtype=bool)
+                top, bottom = max(from_H, self.top), min(to_H, self.bottom)
+                if top < bottom:
+                    band_mask[top - from_H:bottom - from_H, :, 0] = self.band[top - self.top:bottom - self.top] > MASK_THRESHOLD
+                band_masks.append(band_mask[:min(to_H, self.size[0]) - from_H])
+            result = self._inpaint_areas[split_h] = (inpaint_area, band_masks)
+        return result
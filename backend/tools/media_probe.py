@@ -0,0 +1,222 @@
+import bisect
+import hashlib
+import json
+import os
+import re
+import subprocess
+import tempfile
+import threading
+from collections import OrderedDict
+
+import cv2
+
+from backend import config
+
+# 探测结果缓存目录
+PROBE_CACHE_DIR = os.path.join(tempfile.gettempdir(), 'vsr_media_probe')
+# 计算文件指纹时读取的文件头尾字节数
+FINGERPRINT_CHUNK_SIZE = 1024 * 1024
+# 内存中缓存最近使用的多少个视频的探测结果，更早的结果仍可以从缓存目录读取
+MEMORY_CACHE_SIZE = 16
+
+
+def get_file_fingerprint(file_path):
+    """
+    根据文件大小、修改时间以及文件首尾数据计算文件指纹，不读取整个文件
+    """
+    stat = os.stat(file_path)
+    sha1 = hashlib.sha1()
+    sha1.update(f'{stat.st_size}|{stat.st_mtime_ns}'.encode())
+    with open(file_path, 'rb') as f:
+        sha1.update(f.read(FINGERPRINT_CHUNK_SIZE))
+        if stat.st_size > FINGERPRINT_CHUNK_SIZE:
+            f.seek(max(stat.st_size - FINGERPRINT_CHUNK_SIZE, FINGERPRINT_CHUNK_SIZE))
+            sha1.update(f.read(FINGERPRINT_CHUNK_SIZE))
+    return sha1.hexdigest()
+
+
+def format_bitrate(bitrate_kbps):
+    """
+    将码率转换为ffmpeg参数格式，例如"5.0M"或"800k"
+    """
+    if not bitrate_kbps:
+        return None
+    if bitrate_kbps >= 1000:
+        return f"{bitrate_kbps / 1000:.1f}M"
+    return f"{bitrate_kbps}k"
+
+
+class MediaProbe:
+    """
+    读取视频容器与流信息(不解码视频帧)，并按文件缓存探测结果
+    """
+    _cache = OrderedDict()
+    _lock = threading.Lock()
+
+    def __init__(self, video_path, fingerprint=None):
+        self.video_path = video_path
+        self.fingerprint = fingerprint
+        self.width = 0
+        self.height = 0
+        self.fps = 0.0
+        self.frame_count = 0
+        self.duration = 0.0
+        # 视频码率，单位kb/s
+        self.bitrate_kbps = None
+        self.codec = None
+        self.audio_streams = []
+        # 关键帧帧号(从0开始)与时间，首次使用时才读取
+        self.keyframes = None
+        self.keyframe_times = None
+        self.packet_count = None
+
+    @classmethod
+    def get(cls, video_path):
+        """
+        获取视频探测结果，文件未变化时直接返回缓存
+        """
+        fingerprint = get_file_fingerprint(video_path)
+        with cls._lock:
+            probe = cls._cache.get(fingerprint)
+            if probe is not None:
+                cls._cache.move_to_end(fingerprint)
+                return probe
+        probe = cls._load(fingerprint)
+        if probe is None:
+            probe = cls(video_path, fingerprint)
+            probe._probe()
+            probe._save()
+        probe.video_path = video_path
+        with cls._lock:
+            cls._cache[fingerprint] = probe
+            while len(cls._cache) > MEMORY_CACHE_SIZE:
+                cls._cache.popitem(last=False)
+        return probe
+
+    @property
+    def bitrate(self):
+        """
+        码率字符串(例如"5.0M")，未知时为None
+        """
+        return format_bitrate(self.bitrate_kbps)
+
+    def _probe(self):
+        video_cap = cv2.VideoCapture(self.video_path)
+        self.frame_count = int(video_cap.get(cv2.CAP_PROP_FRAME_COUNT) + 0.5)
+        self.fps = video_cap.get(cv2.CAP_PROP_FPS)
+        self.width = int(video_cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        self.height = int(video_cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        video_cap.release()
+        if self.fps:
+            self.duration = self.frame_count / self.fps
+        try:
+            self._probe_with_pyav()
+        except Exception as e:
+            print(f'[MediaProbe] PyAV probe failed: {e}, falling back to ffmpeg')
+            self.bitrate_kbps = self._probe_bitrate_with_ffmpeg(self.video_path)
+
+    def _probe_with_pyav(self):
+        import av
+        with av.open(self.video_path) as container:
+            if container.bit_rate:
+                self.bitrate_kbps = int(container.bit_rate // 1000)
+            if container.duration:
+                self.duration = container.duration / 1000000
+            if container.streams.video:
+                self.codec = container.streams.video[0].codec_context.name
+            for stream in container.streams.audio:
+                self.audio_streams.append({
+                    'index': stream.index,
+                    'codec': stream.codec_context.name,
+                    'channels': stream.codec_context.channels,
+                    'sample_rate': stream.codec_context.sample_rate,
+                })
+
+    @staticmethod
+    def _probe_bitrate_with_ffmpeg(video_path):
+        """
+        解析ffmpeg -i输出的文件头信息获取码率，不进行解码
+        """
+        try:
+            use_shell = True if os.name == "nt" else False
+            result = subprocess.run([config.FFMPEG_PATH, "-hide_banner", "-i", video_path],
+                                    stderr=subprocess.PIPE, stdout=subprocess.PIPE,
+                                    stdin=subprocess.DEVNULL, shell=use_shell, text=True)
+            # 查找类似 "bitrate: 5000 kb/s" 的模式
+            match = re.search(r'bitrate:\s*(\d+)\s*kb/s', result.stderr)
+            if match:
+                return int(match.group(1))
+        except Exception as e:
+            print(f"Failed to get video bitrate: {e}")
+        return None
+
+    def load_keyframes(self):
+        """
+        读取视频数据包(不解码)，获取关键帧位置
+        :return: (关键帧帧号列表(从0开始), 关键帧时间列表(秒，相对于文件起始时间))
+        """
+        if self.keyframes is not None:
+            return self.keyframes, self.keyframe_times
+        import av
+        with av.open(self.video_path) as container:
+            stream = container.streams.video[0]
+            time_base = float(stream.time_base)
+            start_time = container.start_time / 1000000 if container.start_time is not None else 0
+            pts_list = []
+            keyframe_pts_list = []
+            for packet in container.demux(stream):
+                if packet.pts is None:
+                    continue
+                pts_list.append(packet.pts)
+                if packet.is_keyframe:
+                    keyframe_pts_list.append(packet.pts)
+        # 数据包按解码顺序排列，按显示时间排序后得到帧号
+        pts_list.sort()
+        keyframe_pts_list.sort()
+        self.keyframes = [bisect.bisect_left(pts_list, pts) for pts in keyframe_pts_list]
+        self.keyframe_times = [pts * time_base - start_time for pts in keyframe_pts_list]
+        self.packet_count = len(pts_list)
+        self._save()
+        return self.keyframes, self.keyframe_times
+
+    def to_dict(self):
+        return {
+            'width': self.width,
+            'height': self.height,
+            'fps': self.fps,
+            'frame_count': self.frame_count,
+            'duration': self.duration,
+            'bitrate_kbps': self.bitrate_kbps,
+            'codec': self.codec,
+            'audio_streams': self.audio_streams,
+            'keyframes': self.keyframes,
+            'keyframe_times': self.keyframe_times,
+            'packet_count': self.packet_count,
+        }
+
+    @classmethod
+    def from_dict(cls, video_path, fingerprint, data):
+        probe = cls(video_path, fingerprint)
+        for key, value in data.items():
+            if hasattr(probe, key):
+                setattr(probe, key, value)
+        return probe
+
+    @classmethod
+    def _load(cls, fingerprint):
+        cache_path = os.path.join(PROBE_CACHE_DIR, f'{fingerprint}.json')
+        if not os.path.exists(cache_path):
+            return None
+        try:
+            with open(cache_path, 'r', encoding='utf-8') as f:
+                return cls.from_dict(None, fingerprint, json.load(f))
+        except Exception:
+            return None
+
+    def _save(self):
+        try:
+            os.makedirs(PROBE_CACHE_DIR, exist_ok=True)
+            with open(os.path.join(PROBE_CACHE_DIR, f'{self.fingerprint}.json'), 'w', encoding='utf-8') as f:
+                json.dump(self.to_dict(), f)
+        except Exception as e:
+            print(f'[MediaProbe] failed to save probe cache: {e}')
@@ -0,0 +1,114 @@
+import queue
+import threading
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+
+# 等待空闲槽位时检查缓冲区是否已停止的间隔(秒)
+STOP_POLL_INTERVAL = 0.1
+
+
+class SharedFrameRingBuffer:
+    """
+    基于共享内存的视频帧环形缓冲区，由固定尺寸的uint8帧槽位组成
+    进程之间只传递槽位序号(帧句柄)，不再序列化整帧数据
+    槽位协议：创建方通过acquire获取空闲槽位并写入帧，把槽位序号交给子进程读取或原地写回结果，
+    创建方读取结果后release槽位，槽位重新进入空闲队列
+    停止(stop)后等待空闲槽位的调用立即返回None，避免消费方提前退出时生产方一直阻塞
+    """
+
+    def __init__(self, slot_count, frame_shape, name=None):
+        """
+        :param slot_count: 槽位数量
+        :param frame_shape: 帧尺寸(height, width, channels)
+        :param name: 共享内存名称，为None时创建新的共享内存，否则附加到已有共享内存
+        """
+        self.slot_count = slot_count
+        self.frame_shape = tuple(frame_shape)
+        self.frame_size = int(np.prod(self.frame_shape))
+        self.is_owner = name is None
+        if self.is_owner:
+            self.shm = shared_memory.SharedMemory(create=True, size=self.frame_size * slot_count)
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+        self.frames = np.ndarray((slot_count, *self.frame_shape), dtype=np.uint8, buffer=self.shm.buf)
+        # 空闲槽位队列，只在创建方进程中使用
+        self._free_slots = None
+        self._stop_event = threading.Event()
+        if self.is_owner:
+            self._free_slots = queue.Queue()
+            for slot in range(slot_count):
+                self._free_slots.put(slot)
+
+    @property
+    def handle(self):
+        """
+        可序列化的缓冲区句柄，子进程通过attach附加
+        """
+        return self.shm.name, self.slot_count, self.frame_shape
+
+    @classmethod
+    def attach(cls, handle):
+        name, slot_count, frame_shape = handle
+        return cls(slot_count, frame_shape, name=name)
+
+    def acquire(self, timeout=None):
+        """
+        获取一个空闲槽位，没有空闲槽位时阻塞
+        :return: 槽位序号，缓冲区已停止时返回None
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while not self._stop_event.is_set():
+            wait = STOP_POLL_INTERVAL
+            if deadline is not None:
+                wait = min(wait, deadline - time.monotonic())
+                if wait <= 0:
+                    raise queue.Empty
+            try:
+                return self._free_slots.get(timeout=wait)
+            except queue.Empty:
+                continue
+        return None
+
+    def release(self, slot):
+        self._free_slots.put(slot)
+
+    def put(self, frame, timeout=None):
+        """
+        将帧写入空闲槽位
+        :return: 槽位序号，缓冲区已停止时返回None
+        """
+        slot = self.acquire(timeout=timeout)
+        if slot is not None:
+            self.frames[slot] = frame
+        return slot
+
+    def stop(self):
+        """
+        停止缓冲区，唤醒所有等待空闲槽位的调用
+        """
+        self._stop_event.set()
+
+    def get(self, slot):
+        """
+        获取槽位中帧的视图(不复制)，槽位释放后视图内容会被覆盖
+        """
+        return self.frames[slot]
+
+    def close(self):
+        # 先释放numpy视图，否则共享内存无法关闭
+        self.frames = None
+        try:
+            self.shm.close()
+        except BufferError:
+            # 调用方仍持有帧视图，视图释放后共享内存随之释放
+            pass
+        if self.is_owner:
+            self.shm.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
@@ -0,0 +1,134 @@
+import bisect
+import os
+import shutil
+import subprocess
+import tempfile
+
+from backend import config
+from backend.tools.video_writer import FFmpegVideoWriter, concat_video_segments
+
+
+def plan_segments(keyframes, frame_count, dirty_intervals):
+    """
+    按GOP切分视频，包含需要去字幕帧的GOP重新编码，其余GOP直接复制
+    :param keyframes: 关键帧帧号列表(从0开始)
+    :param frame_count: 视频总帧数
+    :param dirty_intervals: 需要重绘的帧区间列表[(start, end)]，帧号从1开始，闭区间
+    :return: [(起始帧, 结束帧, 是否需要重新编码, GOP起始关键帧序号)]，帧号从0开始，闭区间
+    """
+    # 合并重叠区间，保证区间的起始帧与结束帧都有序
+    merged_intervals = []
+    for start, end in sorted(dirty_intervals):
+        if merged_intervals and start - 1 <= merged_intervals[-1][1]:
+            merged_intervals[-1] = (merged_intervals[-1][0], max(merged_intervals[-1][1], end - 1))
+        else:
+            merged_intervals.append((start - 1, end - 1))
+    dirty_starts = [start for start, _ in merged_intervals]
+    segments = []
+    for i, gop_start in enumerate(keyframes):
+        gop_end = keyframes[i + 1] - 1 if i + 1 < len(keyframes) else frame_count - 1
+        if gop_end < gop_start:
+            continue
+        # 起始帧不晚于GOP结尾的最后一个区间如果结束帧不早于GOP开头，则与GOP重叠
+        idx = bisect.bisect_right(dirty_starts, gop_end) - 1
+        need_encode = idx >= 0 and merged_intervals[idx][1] >= gop_start
+        if segments and segments[-1][2] == need_encode:
+            segments[-1] = (segments[-1][0], gop_end, need_encode, segments[-1][3])
+        else:
+            segments.append((gop_start, gop_end, need_encode, i))
+    return segments
+
+
+class SmartRenderWriter:
+    """
+    智能渲染：只重新编码包含字幕的GOP，其余GOP直接复制原视频码流，最后拼接并合并原音频
+    接口与cv2.VideoWriter保持一致，要求按顺序写入视频的每一帧
+    """
+
+    def __init__(self, output_path, fps, size, video_path, keyframes, keyframe_times, frame_count,
+                 dirty_intervals, bitrate=None):
+        """
+        :param output_path: 输出视频路径
+        :param fps: 帧率
+        :param size: 视频尺寸(width, height)
+        :param video_path: 原视频路径
+        :param keyframes: 关键帧帧号列表(从0开始)
+        :param keyframe_times: 关键帧时间列表(秒)
+        :param frame_count: 视频总帧数
+        :param dirty_intervals: 需要重绘的帧区间列表，帧号从1开始
+        :param bitrate: 重新编码时使用的码率
+        """
+        self.output_path = output_path
+        self.fps = fps
+        self.size = size
+        self.video_path = video_path
+        self.keyframe_times = keyframe_times
+        self.bitrate = bitrate
+        self.segments = plan_segments(keyframes, frame_count, dirty_intervals)
+        self.temp_dir = tempfile.mkdtemp(prefix='vsr_smart_render_')
+        self.segment_paths = []
+        self._frame_index = 0
+        self._segment_index = 0
+        self._segment_writer = None
+        self._copy_processes = []
+        self._failed = False
+        self._released = False
+        self.success = False
+        encode_frames = sum(end - start + 1 for start, end, need_encode, _ in self.segments if need_encode)
+        print(f'[SmartRender] re-encode {encode_frames}/{frame_count} frames, '
+              f'stream copy {frame_count - encode_frames}/{frame_count} frames')
+
+    def _begin_segment(self, segment):
+        start, end, need_encode, gop_index = segment
+        segment_path = os.path.join(self.temp_dir, f'{len(self.segment_paths):06d}.ts')
+        self.segment_paths.append(segment_path)
+        if need_encode:
+            self._segment_writer = FFmpegVideoWriter(segment_path, self.fps, self.size, bitrate=self.bitrate)
+        else:
+            # 向后偏移半帧，保证seek到当前GOP的关键帧
+            seek_time = max(self.keyframe_times[gop_index] + 0.5 / self.fps, 0)
+            command = [config.FFMPEG_PATH, "-y", "-loglevel", "error",
+                       "-ss", f"{seek_time:.6f}", "-i", self.video_path,
+                       "-map", "0:v:0", "-frames:v", str(end - start + 1),
+                       "-c:v", "copy", "-an", "-sn", segment_path]
+            use_shell = True if os.name == "nt" else False
+            self._copy_processes.append(subprocess.Popen(command, stdin=subprocess.DEVNULL, shell=use_shell))
+
+    def _end_segment(self):
+        if self._segment_writer is not None:
+            if not self._segment_writer.release():
+                self._failed = True
+            self._segment_writer = None
+
+    def isOpened(self):
+        return not self._released
+
+    def write(self, frame):
+        if self._released or self._segment_index >= len(self.segments):
+            return
+        segment = self.segments[self._segment_index]
+        start, end, need_encode, _ = segment
+        if self._frame_index == start:
+            self._begin_segment(segment)
+        if need_encode:
+            self._segment_writer.write(frame)
+        if self._frame_index == end:
+            self._end_segment()
+            self._segment_index += 1
+        self._frame_index += 1
+
+    def release(self):
+        if self._released:
+            return self.success
+        self._released = True
+        self._end_segment()
+        segments_ok = not self._failed
+        for process in self._copy_processes:
+            if process.wait() != 0:
+                segments_ok = False
+        if self._segment_index < len(self.segments):
+            print(f'[SmartRender] expected {len(self.segments)} segments, got {self._segment_index}')
+            segments_ok = False
+        self.success = segments_ok and concat_video_segments(self.segment_paths, self.output_path, self.video_path)
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+        return self.success
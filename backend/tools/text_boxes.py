@@ -0,0 +1,119 @@
+import numpy as np
+
+# 判断字幕区域时的默认阈值：最小宽高比、文本框顶部在画面中的最低位置比例、文本框最小宽度比例
+SUBTITLE_MIN_ASPECT_RATIO = 3
+SUBTITLE_MIN_Y_RATIO = 0.5
+SUBTITLE_MIN_WIDTH_RATIO = 0.2
+
+
+def get_boxes(dt_boxes):
+    """
+    将检测模型输出的四边形文本框(N, 4, 2)转换为轴对齐的文本框
+    取四边形的内接矩形：左边取左上、左下x的较大值，右边取右上、右下x的较小值，上下边同理
+    :param dt_boxes: 检测框数组或列表，点的顺序为左上、右上、右下、左下
+    :return: (N, 4)整数数组，每行为(xmin, xmax, ymin, ymax)
+    """
+    dt_boxes = np.asarray(dt_boxes, dtype=np.float64)
+    if dt_boxes.size == 0:
+        return np.zeros((0, 4), dtype=np.int64)
+    # 与int()一致，向0截断
+    points = dt_boxes.reshape(-1, 4, 2).astype(np.int64)
+    xs, ys = points[:, :, 0], points[:, :, 1]
+    return np.stack([np.maximum(xs[:, 0], xs[:, 3]),
+                     np.minimum(xs[:, 1], xs[:, 2]),
+                     np.maximum(ys[:, 0], ys[:, 1]),
+                     np.minimum(ys[:, 2], ys[:, 3])], axis=1)
+
+
+def to_tuples(boxes):
+    """
+    文本框数组转换为(xmin, xmax, ymin, ymax)元组列表
+    """
+    return [tuple(box) for box in np.asarray(boxes).tolist()]
+
+
+def in_area(boxes, area):
+    """
+    文本框是否完全位于区域内
+    :param boxes: (N, 4)数组，每行为(xmin, xmax, ymin, ymax)
+    :param area: (ymin, ymax, xmin, xmax)，为None时全部返回True
+    :return: (N,)布尔数组
+    """
+    boxes = np.asarray(boxes).reshape(-1, 4)
+    if area is None:
+        return np.ones(len(boxes), dtype=bool)
+    ymin, ymax, xmin, xmax = area
+    return (boxes[:, 0] >= xmin) & (boxes[:, 1] <= xmax) & (boxes[:, 2] >= ymin) & (boxes[:, 3] <= ymax)
+
+
+def is_horizontal(boxes, threshold):
+    """
+    文本框是否为横向文本，高度比宽度大threshold以上的文本框认为是错误检测
+    :return: (N,)布尔数组
+    """
+    boxes = np.asarray(boxes).reshape(-1, 4)
+    return (boxes[:, 3] - boxes[:, 2]) - (boxes[:, 1] - boxes[:, 0]) <= threshold
+
+
+def is_subtitle_region(boxes, frame_height, frame_width, min_aspect_ratio=SUBTITLE_MIN_ASPECT_RATIO,
+                       min_y_ratio=SUBTITLE_MIN_Y_RATIO, min_width_ratio=SUBTITLE_MIN_WIDTH_RATIO):
+    """
+    根据形状与位置判断文本框是否为字幕：字幕通常比较扁平、位于画面下半部分、占画面宽度的一定比例
+    :return: (N,)布尔数组
+    """
+    boxes = np.asarray(boxes).reshape(-1, 4)
+    width = boxes[:, 1] - boxes[:, 0]
+    height = boxes[:, 3] - boxes[:, 2]
+    return (width >= height * min_aspect_ratio) & (boxes[:, 2] >= frame_height * min_y_ratio) & \
+        (width >= frame_width * min_width_ratio)
+
+
+def _get_edges(boxes):
+    """
+    文本框的左右上下边，左右或上下颠倒的文本框按实际范围计算
+    """
+    boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+    return (np.minimum(boxes[:, 0], boxes[:, 1]), np.maximum(boxes[:, 0], boxes[:, 1]),
+            np.minimum(boxes[:, 2], boxes[:, 3]), np.maximum(boxes[:, 2], boxes[:, 3]))
+
+
+def get_intersection_matrix(boxes_a, boxes_b):
+    """
+    两组文本框两两之间的相交面积与是否相交
+    边界接触(相交面积为0)也算相交，与shapely中两个矩形的交集非空一致
+    :param boxes_a: (N, 4)数组，每行为(xmin, xmax, ymin, ymax)
+    :param boxes_b: (M, 4)数组
+    :return: ((N, M)相交面积矩阵, (N, M)布尔矩阵)
+    """
+    xmin_a, xmax_a, ymin_a, ymax_a = _get_edges(boxes_a)
+    xmin_b, xmax_b, ymin_b, ymax_b = _get_edges(boxes_b)
+    inter_w = np.minimum(xmax_a[:, None], xmax_b[None, :]) - np.maximum(xmin_a[:, None], xmin_b[None, :])
+    inter_h = np.minimum(ymax_a[:, None], ymax_b[None, :]) - np.maximum(ymin_a[:, None], ymin_b[None, :])
+    intersects = (inter_w >= 0) & (inter_h >= 0)
+    return np.where(intersects, inter_w * inter_h, 0.0), intersects
+
+
+def get_iou_matrix(boxes_a, boxes_b):
+    """
+    两组文本框两两之间的交并比
+    :param boxes_a: (N, 4)数组，每行为(xmin, xmax, ymin, ymax)
+    :param boxes_b: (M, 4)数组
+    :return: (N, M)交并比矩阵
+    """
+    xmin_a, xmax_a, ymin_a, ymax_a = _get_edges(boxes_a)
+    xmin_b, xmax_b, ymin_b, ymax_b = _get_edges(boxes_b)
+    intersection, _ = get_intersection_matrix(boxes_a, boxes_b)
+    area_a = (xmax_a - xmin_a) * (ymax_a - ymin_a)
+    area_b = (xmax_b - xmin_b) * (ymax_b - ymin_b)
+    union = area_a[:, None] + area_b[None, :] - intersection
+    return np.divide(intersection, union, out=np.zeros_like(intersection), where=union > 0)
+
+
+def compute_iou(box1, box2):
+    """
+    两个文本框的交并比，两个文本框不相交(边界也不接触)时返回-1
+    """
+    _, intersects = get_intersection_matrix(box1, box2)
+    if not intersects[0, 0]:
+        return -1
+    return float(get_iou_matrix(box1, box2)[0, 0])
@@ -0,0 +1,177 @@
+import os
+import queue
+import subprocess
+import threading
+
+from backend import config
+
+
+def get_video_codec_args(bitrate=None):
+    """
+    根据配置生成ffmpeg视频编码参数
+    :param bitrate: 原视频码率(例如"5M")，为None时仅使用CRF控制质量
+    """
+    if not config.USE_H264:
+        return ["-vcodec", "mpeg4", "-q:v", "2"]
+    codec_args = ["-vcodec", "libx264",
+                  "-crf", str(config.VIDEO_CRF),  # 质量因子 (可在config.py配置)
+                  "-preset", config.VIDEO_PRESET]  # 编码预设 (可在config.py配置)
+    # 如果检测到原视频码率，使用相同码率
+    if bitrate:
+        codec_args.extend(["-b:v", bitrate, "-maxrate", bitrate, "-bufsize", "2M"])
+    return codec_args
+
+
+def concat_video_segments(segment_paths, output_path, audio_source=None):
+    """
+    使用ffmpeg concat demuxer无损拼接视频片段，同时合并原视频音频
+    :param segment_paths: 视频片段路径列表(编码参数需一致)
+    :param output_path: 输出视频路径
+    :param audio_source: 音频来源视频路径，为None时不合并音频
+    :return: 是否拼接成功
+    """
+    list_path = f'{output_path}.concat.txt'
+    with open(list_path, 'w', encoding='utf-8') as f:
+        for segment_path in segment_paths:
+            segment_path = os.path.abspath(segment_path).replace("'", "'\\''")
+            f.write(f"file '{segment_path}'\n")
+    command = [config.FFMPEG_PATH, "-y", "-loglevel", "error",
+               "-f", "concat", "-safe", "0", "-i", list_path]
+    if audio_source is not None:
+        command.extend(["-i", audio_source, "-map", "0:v:0", "-map", "1:a?"])
+    command.extend(["-c", "copy", output_path])
+    use_shell = True if os.name == "nt" else False
+    try:
+        subprocess.check_output(command, stdin=open(os.devnull), shell=use_shell)
+        return True
+    except Exception:
+        if audio_source is not None:
+            # 原音频无法直接复制到输出容器时(例如MP4不支持的PCM音频)，只拼接视频
+            print(f'fail to merge audio from {audio_source}, output video without audio')
+            return concat_video_segments(segment_paths, output_path)
+        print(f'fail to concat video segments into {output_path}')
+        return False
+    finally:
+        if os.path.exists(list_path):
+            os.remove(list_path)
+
+
+def merge_audio(video_path, audio_source, output_path):
+    """
+    以流复制的方式将原视频音频合并到视频中，合并失败时(例如MP4不支持的PCM音频)输出不含音频的视频
+    :param video_path: 不含音频的视频路径，完成后删除
+    :return: 是否合并了音频
+    """
+    command = [config.FFMPEG_PATH, "-y", "-loglevel", "error",
+               "-i", video_path, "-i", audio_source,
+               "-map", "0:v:0", "-map", "1:a?", "-c", "copy", output_path]
+    use_shell = True if os.name == "nt" else False
+    try:
+        subprocess.check_output(command, stdin=open(os.devnull), shell=use_shell)
+        os.remove(video_path)
+        return True
+    except Exception:
+        print(f'fail to merge audio from {audio_source}, output video without audio')
+        os.replace(video_path, output_path)
+        return False
+
+
+class FFmpegVideoWriter:
+    """
+    通过管道将BGR视频帧直接送入ffmpeg编码，只需一次编码
+    需要合并原视频音频时先编码到临时文件，再以流复制的方式合并音频，音频无法合并时仍然输出视频
+    接口与cv2.VideoWriter保持一致
+    """
+
+    def __init__(self, output_path, fps, size, audio_source=None, bitrate=None, queue_size=None):
+        """
+        :param output_path: 输出视频路径
+        :param fps: 帧率
+        :param size: 视频尺寸(width, height)
+        :param audio_source: 音频来源视频路径，为None时不合并音频
+        :param bitrate: 视频码率
+        :param queue_size: 待编码帧队列长度
+        """
+        self.output_path = output_path
+        self.fps = fps
+        self.size = size
+        self.audio_source = audio_source
+        self.bitrate = bitrate
+        if queue_size is None:
+            queue_size = config.FRAME_SOURCE_QUEUE_SIZE
+        self._queue = queue.Queue(maxsize=max(1, queue_size))
+        self._process = None
+        self._thread = None
+        self._error = None
+        self._released = False
+        # 编码输出的视频路径，需要合并音频时为临时文件
+        self._video_path = output_path
+        if audio_source is not None:
+            root, ext = os.path.splitext(output_path)
+            self._video_path = f'{root}.{os.getpid()}.noaudio{ext}'
+        # 编码是否成功完成(输出视频已生成)
+        self.success = False
+        # 是否合并了原视频音频
+        self.audio_merged = False
+
+    def _build_command(self):
+        width, height = self.size
+        command = [config.FFMPEG_PATH, "-y", "-loglevel", "error",
+                   "-f", "rawvideo", "-pix_fmt", "bgr24",
+                   "-s", f"{width}x{height}", "-r", str(self.fps),
+                   "-i", "-"]
+        command.extend(get_video_codec_args(self.bitrate))
+        command.extend(["-pix_fmt", "yuv420p", self._video_path])
+        return command
+
+    def _start(self):
+        use_shell = True if os.name == "nt" else False
+        self._process = subprocess.Popen(self._build_command(), stdin=subprocess.PIPE,
+                                         stdout=subprocess.DEVNULL, shell=use_shell)
+        self._thread = threading.Thread(target=self._write_loop, daemon=True)
+        self._thread.start()
+
+    def _write_loop(self):
+        while True:
+            frame = self._queue.get()
+            if frame is None:
+                break
+            # ffmpeg出错退出后，只消费队列，不再写入
+            if self._error is not None:
+                continue
+            try:
+                self._process.stdin.write(frame.tobytes())
+            except (BrokenPipeError, OSError) as e:
+                self._error = e
+
+    def isOpened(self):
+        return not self._released
+
+    def write(self, frame):
+        if self._released:
+            return
+        if self._process is None:
+            self._start()
+        self._queue.put(frame)
+
+    def release(self):
+        if self._released:
+            return self.success
+        self._released = True
+        if self._process is None:
+            return self.success
+        self._queue.put(None)
+        self._thread.join()
+        try:
+            self._process.stdin.close()
+        except (BrokenPipeError, OSError):
+            pass
+        return_code = self._process.wait()
+        self.success = self._error is None and return_code == 0
+        if not self.success:
+            print(f'fail to encode video {self.output_path}, ffmpeg return code: {return_code}')
+            if self._video_path != self.output_path and os.path.exists(self._video_path):
+                os.remove(self._video_path)
+        elif self.audio_source is not None:
+            self.audio_merged = merge_audio(self._video_path, self.audio_source, self.output_path)
+        return self.success
@@ -16,6 +16,7 @@ sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 import backend.main
 from backend.tools.common_tools import is_image_file
+from backend.tools.media_probe import MediaProbe
 
 
 class SubtitleRemoverGUI:
@@ -190,14 +191,16 @@ class SubtitleRemoverGUI:
                 if ret:
                     for video in self.video_paths:
                         print(f"Open Video Success：{video}")
+                    # 读取视频信息(带缓存，不解码)
+                    media_probe = MediaProbe.get(self.video_path)
                     # 获取视频的帧数
-                    self.frame_count = self.video_cap.get(cv2.CAP_PROP_FRAME_COUNT)
+                    self.frame_count = media_probe.frame_count
                     # 获取视频的高度
-                    self.frame_height = self.video_cap.get(cv2.CAP_PROP_FRAME_HEIGHT)
+                    self.frame_height = media_probe.height
                     # 获取视频的宽度
-                    self.frame_width = self.video_cap.get(cv2.CAP_PROP_FRAME_WIDTH)
+                    self.frame_width = media_probe.width
                     # 获取视频的帧率
-                    self.fps = self.video_cap.get(cv2.CAP_PROP_FPS)
+                    self.fps = media_probe.fps
                     # 调整视频帧大小，使播放器能够显示
                     resized_frame = self._img_resize(frame)
                     # resized_frame = cv2.resize(src=frame, dsize=(self.video_preview_width, self.video_preview_height))
@@ -271,11 +274,11 @@ class SubtitleRemoverGUI:
                     # 先判断每个视频的分辨率是否一致，一致的话设置相同的字幕区域，否则设置为None
                     global_size = None
                     for temp_video_path in self.video_paths:
-                        temp_cap = cv2.VideoCapture(temp_video_path)
+                        temp_probe = MediaProbe.get(temp_video_path)
                         if global_size is None:
-                            global_size = (int(temp_cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(temp_cap.get(cv2.CAP_PROP_FRAME_HEIGHT)))
+                            global_size = (temp_probe.width, temp_probe.height)
                         else:
-                            temp_size = (int(temp_cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(temp_cap.get(cv2.CAP_PROP_FRAME_HEIGHT)))
+                            temp_size = (temp_probe.width, temp_probe.height)
                             if temp_size != global_size:
                                 print('not all video/images in same size, processing in full screen')
                                 subtitle_area = None
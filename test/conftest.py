@@ -0,0 +1,58 @@
+import os
+import sys
+
+# 测试从仓库根目录导入backend
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+import cv2
+import numpy as np
+
+from backend.tools.batch_text_detector import detect_region
+
+# 检测相关测试共用的视频帧尺寸与字幕区域
+FRAME_SIZE = (1080, 1920)
+SUB_AREA = (900, 1080, 0, 1920)
+
+
+def blank_frame():
+    return np.zeros((*FRAME_SIZE, 3), dtype=np.uint8)
+
+
+def text_frame(text='ABC'):
+    frame = blank_frame()
+    cv2.putText(frame, text, (900, 1000), cv2.FONT_HERSHEY_SIMPLEX, 2, (255, 255, 255), 4)
+    return frame
+
+
+class FakeBatchDetector:
+    """
+    以亮像素的外接矩形作为检测框，记录每次调用的图片尺寸，缩放比例与DetResizeForTest(max 960)一致
+    """
+
+    def __init__(self):
+        self.calls = []
+
+    def get_detect_scale(self, img_shape):
+        return min(1.0, 960 / max(img_shape[:2]))
+
+    def detect_region(self, imgs, region, padding=None, return_maps=False):
+        return detect_region(self, imgs, region, padding, return_maps=return_maps)
+
+    def __call__(self, imgs, return_maps=False):
+        self.calls.append([img.shape[:2] for img in imgs])
+        dt_boxes_list = []
+        text_maps = []
+        for img in imgs:
+            bright = img[:, :, 0] > 127
+            text_maps.append((0, 0, bright))
+            ys, xs = np.nonzero(bright)
+            if len(xs) == 0:
+                dt_boxes_list.append(np.zeros((0, 4, 2), dtype=np.float32))
+                continue
+            x0, x1, y0, y1 = xs.min(), xs.max(), ys.min(), ys.max()
+            dt_boxes_list.append(np.array([[[x0, y0], [x1, y0], [x1, y1], [x0, y1]]], dtype=np.float32))
+        if return_maps:
+            return dt_boxes_list, 0.0, text_maps
+        return dt_boxes_list, 0.0
@@ -0,0 +1,141 @@
+import random
+
+import pytest
+
+from backend import main
+from backend.main import SubtitleDetect
+
+
+def compute_iou_reference(box1, box2):
+    """
+    与原来shapely多边形的计算一致，边界相接也视为相交
+    """
+    x0, x1 = max(min(box1[:2]), min(box2[:2])), min(max(box1[:2]), max(box2[:2]))
+    y0, y1 = max(min(box1[2:]), min(box2[2:])), min(max(box1[2:]), max(box2[2:]))
+    if x1 < x0 or y1 < y0:
+        return -1
+    intersection_area = (x1 - x0) * (y1 - y0)
+    union_area = abs(box1[1] - box1[0]) * abs(box1[3] - box1[2]) + \
+        abs(box2[1] - box2[0]) * abs(box2[3] - box2[2]) - intersection_area
+    return intersection_area / union_area if union_area > 0 else 0
+
+
+def get_area_max_box_dict_reference(sub_frame_no_list_continuous, subtitle_frame_no_box_dict):
+    """
+    SubtitleDetect中原有的逐帧、逐文本框循环实现
+    """
+    threshold = main.config.THRESHOLD_HEIGHT_DIFFERENCE
+    _area_max_box_dict = dict()
+    for start_no, end_no in sub_frame_no_list_continuous:
+        area_max_box_list = []
+        for current_no in range(start_no, end_no + 1):
+            for xmin, xmax, ymin, ymax in subtitle_frame_no_box_dict[current_no]:
+                current_area = abs(xmax - xmin) * abs(ymax - ymin)
+                if len(area_max_box_list) < 1:
+                    area_max_box_list.append({'area': current_area, 'xmin': xmin, 'xmax': xmax, 'ymin': ymin,
+                                              'ymax': ymax})
+                    continue
+                has_same_position = False
+                for area_max_box in area_max_box_list:
+                    if area_max_box['ymin'] - threshold <= ymin and ymax <= area_max_box['ymax'] + threshold:
+                        if compute_iou_reference((xmin, xmax, ymin, ymax), (
+                                area_max_box['xmin'], area_max_box['xmax'], area_max_box['ymin'],
+                                area_max_box['ymax'])) != -1:
+                            if abs(abs(area_max_box['ymax'] - area_max_box['ymin']) - abs(ymax - ymin)) < threshold:
+                                has_same_position = True
+                            if has_same_position and current_area > area_max_box['area']:
+                                area_max_box.update(area=current_area, xmin=xmin, xmax=xmax, ymin=ymin, ymax=ymax)
+                if not has_same_position:
+                    new_large_area = {'area': current_area, 'xmin': xmin, 'xmax': xmax, 'ymin': ymin, 'ymax': ymax}
+                    if new_large_area not in area_max_box_list:
+                        area_max_box_list.append(new_large_area)
+                        break
+        _area_max_box_list = list()
+        for area_max_box in area_max_box_list:
+            if area_max_box not in _area_max_box_list:
+                _area_max_box_list.append(area_max_box)
+        _area_max_box_dict[f'{start_no}->{end_no}'] = _area_max_box_list
+    return _area_max_box_dict
+
+
+def united_coordinates_reference(frame_no_list, area_max_box_dict, subtitle_frame_no_box_dict):
+    result = dict()
+    for start_no, end_no in frame_no_list:
+        area_max_box_list = area_max_box_dict[f'{start_no}->{end_no}']
+        for current_no in range(start_no, end_no + 1):
+            new_box_list = []
+            for current_box in subtitle_frame_no_box_dict[current_no]:
+                for max_box in area_max_box_list:
+                    box = (max_box['xmin'], max_box['xmax'], max_box['ymin'], max_box['ymax'])
+                    if compute_iou_reference(current_box, box) != -1 and box not in new_box_list:
+                        new_box_list.append(box)
+            result[current_no] = new_box_list
+    return result
+
+
+@pytest.fixture
+def detector(monkeypatch):
+    monkeypatch.setattr(main.config, 'THRESHOLD_HEIGHT_DIFFERENCE', 10)
+    return object.__new__(SubtitleDetect)
+
+
+def random_box_dict(rng):
+    """
+    随机生成逐帧文本框，文本框从少量候选中抽取，模拟字幕在若干帧内保持不变
+    """
+    def random_box():
+        x, y = rng.randint(0, 100), rng.randint(0, 60)
+        return x, x + rng.randint(0, 60), y, y + rng.randint(0, 20)
+
+    pool = [random_box() for _ in range(rng.randint(1, 6))]
+    box_dict = {}
+    box_list = []
+    for frame_no in range(1, rng.randint(2, 80)):
+        if rng.random() < 0.2:
+            box_list = rng.sample(pool, rng.randint(0, min(3, len(pool))))
+        if box_list:
+            box_dict[frame_no] = list(box_list)
+    return box_dict
+
+
+def test_area_max_box_dict(detector):
+    box_dict = {
+        1: [(100, 300, 600, 630)],
+        2: [(90, 320, 602, 632), (100, 200, 700, 730)],
+        3: [(95, 310, 601, 631), (100, 260, 700, 730)],
+    }
+    assert detector.get_area_max_box_dict([(1, 3)], box_dict) == {'1->3': [
+        {'area': 6900, 'xmin': 90, 'xmax': 320, 'ymin': 602, 'ymax': 632},
+        {'area': 4800, 'xmin': 100, 'xmax': 260, 'ymin': 700, 'ymax': 730},
+    ]}
+    assert detector.get_area_max_box_dict([(1, 1), (2, 3)], box_dict) == \
+        get_area_max_box_dict_reference([(1, 1), (2, 3)], box_dict)
+
+
+def test_united_coordinates(detector):
+    # 同一行相交的两个文本框统一为面积较大的文本框，另一行的文本框不变
+    two_boxes = [(100, 200, 600, 630), (150, 300, 600, 630), (120, 260, 700, 730)]
+    box_dict = {1: two_boxes, 2: two_boxes, 3: [(100, 200, 600, 630)], 5: [(500, 600, 600, 630)]}
+    united = detector.get_subtitle_frame_no_box_dict_with_united_coordinates(box_dict)
+    assert united == {
+        1: [(150, 300, 600, 630), (120, 260, 700, 730)],
+        2: [(150, 300, 600, 630), (120, 260, 700, 730)],
+        3: [(100, 200, 600, 630)],
+        5: [(500, 600, 600, 630)],
+    }
+
+
+def test_matches_loop_implementation(detector):
+    rng = random.Random(0)
+    for _ in range(400):
+        box_dict = random_box_dict(rng)
+        if not box_dict:
+            continue
+        frame_no_list = detector.find_continuous_ranges_with_same_mask(box_dict)
+        area_max_box_dict = get_area_max_box_dict_reference(frame_no_list, box_dict)
+        assert detector.get_area_max_box_dict(frame_no_list, box_dict) == area_max_box_dict
+        continuous = detector.find_continuous_ranges(box_dict)
+        assert detector.get_area_max_box_dict(continuous, box_dict) == \
+            get_area_max_box_dict_reference(continuous, box_dict)
+        assert detector.get_subtitle_frame_no_box_dict_with_united_coordinates(box_dict) == \
+            united_coordinates_reference(frame_no_list, area_max_box_dict, box_dict)
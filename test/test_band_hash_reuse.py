@@ -0,0 +1,63 @@
+import pytest
+
+from backend.main import SubtitleDetect
+from backend.tools.band_signal import BandHashCache
+from conftest import SUB_AREA, FakeBatchDetector, blank_frame, text_frame
+
+
+@pytest.fixture
+def detector():
+    """
+    不加载模型的SubtitleDetect，只保留detect_frames用到的状态，哈希容差设为最大使哈希总是命中
+    """
+    detector = object.__new__(SubtitleDetect)
+    detector.sub_area = SUB_AREA
+    detector.glyph_masks = None
+    detector.band_hash_cache = BandHashCache(capacity=8, tolerance=10 ** 6)
+    detector.band_hash_lookups = 0
+    detector.band_hash_hits = 0
+    detector._window_hashes = {}
+    detector.detected_frames = []
+    fake_detector = FakeBatchDetector()
+
+    def detect_subtitle_batch(imgs, return_maps=False):
+        detector.detected_frames.extend(imgs)
+        return fake_detector(imgs)
+
+    detector.detect_subtitle_batch = detect_subtitle_batch
+    return detector
+
+
+def test_empty_result_is_not_reused_when_text_appears(detector):
+    frames = [blank_frame(), text_frame()]
+    box_lists = [None, None]
+    assert detector.detect_frames(frames, [0], box_lists) == 1
+    assert box_lists[0] == []
+    # 哈希命中了空结果，但缩略图发生了变化，需要重新检测
+    assert detector.detect_frames(frames, [1], box_lists) == 1
+    assert len(box_lists[1]) == 1
+
+
+def test_empty_result_is_not_reused_in_same_batch(detector):
+    frames = [blank_frame(), text_frame()]
+    box_lists = [None, None]
+    assert detector.detect_frames(frames, [0, 1], box_lists) == 2
+    assert box_lists[0] == []
+    assert len(box_lists[1]) == 1
+
+
+def test_unchanged_empty_band_is_reused(detector):
+    frames = [blank_frame(), blank_frame(), blank_frame()]
+    box_lists = [None, None, None]
+    assert detector.detect_frames(frames, [0, 1], box_lists) == 1
+    assert detector.detect_frames(frames, [2], box_lists) == 0
+    assert box_lists == [[], [], []]
+    assert detector.band_hash_hits == 2
+
+
+def test_text_result_is_reused(detector):
+    frames = [text_frame(), text_frame()]
+    box_lists = [None, None]
+    detector.detect_frames(frames, [0], box_lists)
+    assert detector.detect_frames(frames, [1], box_lists) == 0
+    assert box_lists[1] == box_lists[0]
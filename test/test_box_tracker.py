@@ -0,0 +1,144 @@
+import random
+import time
+
+import pytest
+
+from backend import config
+from backend.tools.box_tracker import BoxTracker, match_boxes, track_regions
+from backend.tools.interval_plan import IntervalPlan
+
+
+def are_similar_reference(region1, region2):
+    xmin1, xmax1, ymin1, ymax1 = region1
+    xmin2, xmax2, ymin2, ymax2 = region2
+    return abs(xmin1 - xmin2) <= config.PIXEL_TOLERANCE_X and abs(xmax1 - xmax2) <= config.PIXEL_TOLERANCE_X and \
+        abs(ymin1 - ymin2) <= config.PIXEL_TOLERANCE_Y and abs(ymax1 - ymax2) <= config.PIXEL_TOLERANCE_Y
+
+
+def unify_regions_reference(raw_regions):
+    """
+    SubtitleDetect中原有的实现：按文本框在列表中的序号与上一帧对应
+    """
+    if len(raw_regions) == 0:
+        return raw_regions
+    keys = sorted(raw_regions.keys())
+    unify_value_map = {keys[0]: raw_regions[keys[0]]}
+    last_key = keys[0]
+    for key in keys[1:]:
+        new_unify_values = []
+        for idx, region in enumerate(raw_regions[key]):
+            last_standard_region = unify_value_map[last_key][idx] if idx < len(unify_value_map[last_key]) else None
+            if last_standard_region and are_similar_reference(region, last_standard_region):
+                new_unify_values.append(last_standard_region)
+            else:
+                new_unify_values.append(region)
+        unify_value_map[key] = new_unify_values
+        last_key = key
+    return {key: unify_value_map[key] for key in keys}
+
+
+def random_subtitles(frame_count=20000, subtitle_length=60, seed=0):
+    """
+    生成字幕区间：每条字幕两行，字幕之间有随机长度的空白帧
+    :return: [(起始帧号, 结束帧号, 两行的文本框)]
+    """
+    rng = random.Random(seed)
+    subtitles = []
+    frame_no = 1
+    while frame_no <= frame_count:
+        length = rng.randint(subtitle_length // 2, subtitle_length * 2)
+        width = rng.randint(200, 800)
+        lines = [(640 - width // 2, 640 + width // 2, 600, 640), (600 - width // 2, 600 + width // 2, 650, 690)]
+        subtitles.append((frame_no, min(frame_no + length, frame_count + 1) - 1, lines))
+        frame_no += length + rng.randint(0, subtitle_length // 2)
+    return subtitles
+
+
+def random_regions(subtitles, jitter=6, shuffle=True, seed=0):
+    """
+    生成逐帧文本框：检测框有抖动，shuffle为True时两行的先后顺序随机
+    """
+    rng = random.Random(seed)
+    regions = {}
+    for start, end, lines in subtitles:
+        for frame_no in range(start, end + 1):
+            box_list = [tuple(v + rng.randint(-jitter, jitter) for v in line) for line in lines]
+            if shuffle and rng.random() < 0.5:
+                box_list.reverse()
+            regions[frame_no] = box_list
+    return regions
+
+
+def count_intervals(regions):
+    plan = IntervalPlan.from_frame_box_dict(regions)
+    return len(plan.get_ranges(same_boxes=True)[0])
+
+
+@pytest.fixture(autouse=True)
+def tolerance(monkeypatch):
+    monkeypatch.setattr(config, 'PIXEL_TOLERANCE_X', 20)
+    monkeypatch.setattr(config, 'PIXEL_TOLERANCE_Y', 20)
+    monkeypatch.setattr(config, 'BOX_TRACK_IOU_THRESHOLD', 0.5)
+    monkeypatch.setattr(config, 'BOX_TRACK_MAX_GAP', 50)
+
+
+def test_match_boxes_prefers_similar_boxes():
+    track_boxes = [(100, 300, 600, 640), (100, 300, 650, 690)]
+    assert match_boxes([(102, 298, 652, 688), (101, 301, 601, 641)], track_boxes).tolist() == [1, 0]
+    assert match_boxes([(1000, 1100, 100, 140)], track_boxes).tolist() == [-1]
+    assert match_boxes([], track_boxes).tolist() == []
+
+
+def test_tracker_keeps_canonical_box_within_tolerance():
+    tracker = BoxTracker()
+    assert tracker.update(1, [(100, 300, 600, 640)]) == [(0, (100, 300, 600, 640))]
+    assert tracker.update(2, [(110, 290, 605, 645)]) == [(0, (100, 300, 600, 640))]
+    # 位置变化超过容差但仍有重叠：同一轨迹开始新片段
+    assert tracker.update(3, [(125, 325, 600, 640)]) == [(0, (125, 325, 600, 640))]
+    assert tracker.segment_count == 2
+    # 超过max_gap帧没有出现的轨迹不再参与匹配
+    assert tracker.update(100, [(125, 325, 600, 640)]) == [(1, (125, 325, 600, 640))]
+
+
+def test_tracking_is_independent_of_detection_order():
+    regions = random_regions(random_subtitles(3000), shuffle=False)
+    ordered, _ = track_regions(regions)
+    for seed in range(3):
+        rng = random.Random(seed)
+        shuffled, _ = track_regions({frame_no: rng.sample(box_list, len(box_list))
+                                     for frame_no, box_list in regions.items()})
+        assert shuffled.keys() == ordered.keys()
+        for frame_no in ordered:
+            assert sorted(shuffled[frame_no]) == sorted(ordered[frame_no])
+
+
+def test_tracking_keeps_subtitles_in_one_interval():
+    subtitles = random_subtitles(5000)
+    regions = random_regions(subtitles)
+    tracked, _ = track_regions(regions)
+    # 抖动在容差内，每条字幕的两行基本保持一个标准文本框，区间数量接近没有抖动的检测结果
+    # 相邻两条字幕宽度接近容差时，后一条字幕可能先沿用前一条的标准文本框，再开始新片段
+    subtitle_interval_count = count_intervals(random_regions(subtitles, jitter=0, shuffle=False))
+    assert count_intervals(tracked) <= subtitle_interval_count * 1.1
+    assert count_intervals(unify_regions_reference(regions)) > 5 * subtitle_interval_count
+    for frame_no, box_list in tracked.items():
+        assert len(box_list) == 2
+        for box in box_list:
+            assert any(are_similar_reference(box, raw_box) for raw_box in regions[frame_no])
+
+
+def test_benchmark(frame_count=20000):
+    """
+    与按序号对应的原实现对比区间数量与耗时，使用pytest -s查看耗时
+    """
+    regions = random_regions(random_subtitles(frame_count))
+    start_time = time.time()
+    reference = unify_regions_reference(regions)
+    reference_time = time.time() - start_time
+    start_time = time.time()
+    tracked, tracker = track_regions(regions)
+    track_time = time.time() - start_time
+    print(f'[Tracking] {frame_count} frames, {len(tracker.tracks)} tracks, {tracker.segment_count} segments')
+    print(f'index matching: {count_intervals(reference)} intervals, {round(reference_time, 4)}s')
+    print(f'iou tracking: {count_intervals(tracked)} intervals, {round(track_time, 4)}s')
+    assert count_intervals(tracked) < count_intervals(reference)
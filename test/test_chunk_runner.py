@@ -0,0 +1,26 @@
+import pytest
+
+from backend.tools.chunk_runner import split_frame_range
+
+
+@pytest.mark.parametrize('frame_count, boundaries, chunk_count, min_chunk_frames, expected', [
+    # 不切分或没有可用的切分点
+    (100, [25, 50, 75], 1, 0, [(0, 100)]),
+    (100, [], 4, 0, [(0, 100)]),
+    # 切分点正好在均分位置，输入无序
+    (100, [75, 25, 50], 4, 0, [(0, 25), (25, 50), (50, 75), (75, 100)]),
+    # 选择离均分位置最近的切分点，多个均分位置选中同一切分点时只切分一次
+    (100, [30, 60], 4, 0, [(0, 30), (30, 60), (60, 100)]),
+    # 第一帧、超出视频范围与重复的切分点被忽略
+    (100, [0, 50, 50, 100, 150], 2, 0, [(0, 50), (50, 100)]),
+    # 片段不足最少帧数时不切分：开头与结尾
+    (100, [10, 95], 2, 20, [(0, 100)]),
+    (100, [90], 2, 20, [(0, 100)]),
+    (100, [50], 2, 20, [(0, 50), (50, 100)]),
+])
+def test_split_frame_range(frame_count, boundaries, chunk_count, min_chunk_frames, expected):
+    chunks = split_frame_range(frame_count, boundaries, chunk_count, min_chunk_frames)
+    assert chunks == expected
+    # 片段首尾相接并覆盖整个视频
+    assert chunks[0][0] == 0 and chunks[-1][1] == frame_count
+    assert all(chunks[i][1] == chunks[i + 1][0] for i in range(len(chunks) - 1))
@@ -0,0 +1,89 @@
+import json
+import os
+
+import numpy as np
+import pytest
+
+from backend import config
+from backend.tools import det_quantization
+
+
+def quad(xmin, xmax, ymin, ymax):
+    return [[xmin, ymin], [xmax, ymin], [xmax, ymax], [xmin, ymax]]
+
+
+def boxes(count, shift=0):
+    return np.array([quad(100 + 50 * i + shift, 140 + 50 * i + shift, 900, 940) for i in range(count)],
+                    dtype=np.float32)
+
+
+@pytest.fixture
+def model_dir(tmp_path, monkeypatch):
+    """
+    用假的量化与检测函数替换onnxruntime与paddleocr，每次量化都记录下来
+    """
+    onnx_model_path = str(tmp_path / 'model.onnx')
+    state = {'quantized': 0, 'reference': [], 'int8': []}
+
+    def fake_quantize(onnx_path, int8_path, calibration_inputs, mode=None):
+        state['quantized'] += 1
+        open(int8_path, 'wb').close()
+
+    def fake_run_detector(text_detector, frames):
+        return (state['reference'] if text_detector == 'fp32' else state['int8']), 0.0
+
+    monkeypatch.setattr(det_quantization, 'get_calibration_frames', lambda video_path: [None] * 4)
+    monkeypatch.setattr(det_quantization, 'create_text_detector',
+                        lambda path, providers: 'int8' if path.endswith('int8.onnx') else 'fp32')
+    monkeypatch.setattr(det_quantization, 'get_detector_inputs', lambda text_detector, frames: [])
+    monkeypatch.setattr(det_quantization, 'quantize_model', fake_quantize)
+    monkeypatch.setattr(det_quantization, 'run_detector', fake_run_detector)
+    monkeypatch.setattr(config, 'DET_INT8_MIN_REFERENCE_BOXES', 8)
+    monkeypatch.setattr(config, 'DET_INT8_MIN_RECALL', 0.95)
+    monkeypatch.setattr(config, 'DET_INT8_MIN_IOU', 0.85)
+    monkeypatch.setattr(config, 'DET_INT8_QUANTIZE_MODE', 'static')
+    return onnx_model_path, tmp_path, state
+
+
+def test_compare_detections_without_reference_boxes():
+    assert det_quantization.compare_detections([np.zeros((0, 4, 2))] * 3, [boxes(2)] * 3) == (0.0, 0.0, 0)
+
+
+def test_compare_detections_counts_reference_boxes():
+    recall, mean_iou, reference_count = det_quantization.compare_detections([boxes(3), boxes(2)],
+                                                                            [boxes(3), boxes(1)])
+    assert reference_count == 5
+    assert recall == pytest.approx(0.8)
+    assert mean_iou == pytest.approx(0.8)
+
+
+def test_no_subtitles_in_calibration_frames_keeps_fp32_uncached(model_dir):
+    onnx_model_path, tmp_path, state = model_dir
+    state['reference'] = state['int8'] = [np.zeros((0, 4, 2))] * 4
+    assert det_quantization.get_quantized_model(onnx_model_path, 'video.mp4', []) is None
+    assert not os.path.exists(tmp_path / 'model.int8.json')
+    assert not os.path.exists(tmp_path / 'model.int8.onnx')
+    # 下一个有字幕的视频重新量化并对比
+    state['reference'] = state['int8'] = [boxes(3)] * 4
+    assert det_quantization.get_quantized_model(onnx_model_path, 'video.mp4', []) == str(tmp_path / 'model.int8.onnx')
+    assert state['quantized'] == 2
+    with open(tmp_path / 'model.int8.json', 'r', encoding='utf-8') as f:
+        report = json.load(f)
+    assert report['accepted'] and report['reference_boxes'] == 12
+
+
+def test_cached_report_requires_matching_settings(model_dir, monkeypatch):
+    onnx_model_path, tmp_path, state = model_dir
+    state['reference'] = [boxes(3)] * 4
+    state['int8'] = [boxes(3, shift=4)] * 4
+    assert det_quantization.get_quantized_model(onnx_model_path, 'video.mp4', []) is None
+    assert det_quantization.get_quantized_model(onnx_model_path, 'video.mp4', []) is None
+    assert state['quantized'] == 1
+    # 放宽阈值后不沿用之前的拒绝结果
+    monkeypatch.setattr(config, 'DET_INT8_MIN_IOU', 0.5)
+    assert det_quantization.get_quantized_model(onnx_model_path, 'video.mp4', []) == str(tmp_path / 'model.int8.onnx')
+    assert state['quantized'] == 2
+    # 修改量化方式后同样重新量化
+    monkeypatch.setattr(config, 'DET_INT8_QUANTIZE_MODE', 'dynamic')
+    det_quantization.get_quantized_model(onnx_model_path, 'video.mp4', [])
+    assert state['quantized'] == 3
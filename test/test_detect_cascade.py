@@ -0,0 +1,60 @@
+import numpy as np
+import pytest
+
+from backend import config
+from backend import main
+from backend.main import SubtitleDetect
+from conftest import FRAME_SIZE, SUB_AREA, FakeBatchDetector, blank_frame, text_frame
+
+
+@pytest.fixture
+def detector(monkeypatch):
+    """
+    不加载模型的SubtitleDetect，检测器替换为FakeBatchDetector
+    backend.main通过sys.path导入的config与backend.config是两个模块，两者都需要设置
+    """
+    for module in {config, main.config}:
+        monkeypatch.setattr(module, 'DET_CASCADE', True)
+        monkeypatch.setattr(module, 'DET_ROI_CROP', True)
+        monkeypatch.setattr(module, 'DET_POOL_SIZE', 0)
+    detector = object.__new__(SubtitleDetect)
+    detector.sub_area = SUB_AREA
+    detector.batch_text_detector = FakeBatchDetector()
+    return detector
+
+
+def test_cascade_is_used_for_full_hd_frames(detector):
+    assert detector.get_screen_scale(FRAME_SIZE) is not None
+
+
+def test_detect_cascade_only_refines_screened_frames(detector):
+    frames = [blank_frame(), text_frame(), blank_frame(), text_frame('XY')]
+    dt_boxes_list, _ = detector.detect_subtitle_batch(frames)
+    assert len(dt_boxes_list) == len(frames)
+    for i in (0, 2):
+        assert dt_boxes_list[i].shape == (0, 4, 2)
+        assert dt_boxes_list[i].dtype == np.float32
+    # 低分辨率筛选检测全部帧，只有两帧有文字的帧按检测模型的输入尺寸检测
+    screen_call, full_call = detector.batch_text_detector.calls
+    assert len(screen_call) == 4 and len(full_call) == 2
+    assert screen_call[0][0] < full_call[0][0]
+    full_boxes, _ = detector.detect_full([frames[1], frames[3]], SUB_AREA)
+    np.testing.assert_array_equal(dt_boxes_list[1], full_boxes[0])
+    np.testing.assert_array_equal(dt_boxes_list[3], full_boxes[1])
+    assert detector.get_subtitle_boxes(dt_boxes_list[1])
+
+
+def test_detect_cascade_returns_maps_of_refined_frames(detector):
+    frames = [text_frame(), blank_frame()]
+    dt_boxes_list, _, text_maps = detector.detect_subtitle_batch(frames, return_maps=True)
+    assert len(dt_boxes_list[0]) == 1 and len(dt_boxes_list[1]) == 0
+    assert text_maps[1] is None
+    y0, x0, text_map = text_maps[0]
+    assert (y0, x0) == (SUB_AREA[0] - config.DET_ROI_PADDING, 0)
+    assert text_map.any()
+
+
+def test_detect_cascade_without_text(detector):
+    dt_boxes_list, _ = detector.detect_cascade([blank_frame(), blank_frame()], None, 0.25)
+    assert [dt_boxes.shape for dt_boxes in dt_boxes_list] == [(0, 4, 2), (0, 4, 2)]
+    assert len(detector.batch_text_detector.calls) == 1
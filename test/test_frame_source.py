@@ -0,0 +1,74 @@
+import io
+import os
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from backend import config
+from backend.inpaint.sttn_inpaint import STTNInpaint
+from backend.tools import frame_source
+from backend.tools.frame_source import FFmpegPipeFrameSource
+
+VIDEO_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'test2.mp4')
+
+
+class FakeProcess:
+
+    def __init__(self, data):
+        self.stdout = io.BufferedReader(io.BytesIO(data))
+
+    def poll(self):
+        return 0
+
+    def kill(self):
+        pass
+
+    def wait(self):
+        return 0
+
+
+def paste_in_place(frame):
+    """
+    与STTN写回结果相同：把补全区域按遮罩原地写回帧
+    """
+    height, width = frame.shape[:2]
+    comp = np.full((height, width, 3), 255, dtype=np.uint8)
+    band_mask = np.zeros((height, width, 1), dtype=bool)
+    band_mask[height // 2:] = True
+    STTNInpaint.paste_bands(frame, [comp], [(0, height)], [band_mask])
+    assert (frame[height // 2:] == 255).all()
+
+
+def test_ffmpeg_pipe_frames_are_writable(monkeypatch):
+    width, height, frame_count = 8, 6, 3
+    data = np.arange(width * height * 3 * frame_count, dtype=np.uint32).astype(np.uint8).tobytes()
+    probe = SimpleNamespace(frame_count=frame_count, fps=25.0, width=width, height=height)
+    monkeypatch.setattr(frame_source.MediaProbe, 'get', staticmethod(lambda video_path: probe))
+    monkeypatch.setattr(frame_source.subprocess, 'Popen', lambda *args, **kwargs: FakeProcess(data))
+    source = FFmpegPipeFrameSource('fake.mp4')
+    frames = []
+    while True:
+        ret, frame = source.read()
+        if not ret:
+            break
+        frames.append(frame)
+    source.release()
+    assert len(frames) == frame_count
+    assert frames[1].tobytes() == data[width * height * 3:width * height * 3 * 2]
+    for frame in frames:
+        assert frame.flags.writeable
+        paste_in_place(frame)
+
+
+@pytest.mark.skipif(not os.path.exists(config.FFMPEG_PATH) or not os.path.exists(VIDEO_PATH),
+                    reason='ffmpeg or test video not found')
+def test_ffmpeg_pipe_frames_of_test_video_are_writable():
+    source = FFmpegPipeFrameSource(VIDEO_PATH)
+    try:
+        ret, frame = source.read()
+        assert ret
+        assert frame.flags.writeable
+        paste_in_place(frame)
+    finally:
+        source.release()
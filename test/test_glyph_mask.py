@@ -0,0 +1,84 @@
+import numpy as np
+import pytest
+
+from backend import config
+from backend.tools.glyph_mask import GlyphMaskStore
+
+FRAME_SIZE = (200, 400)
+BOX_A = (100, 200, 150, 180)
+BOX_B = (50, 300, 140, 185)
+
+
+def text_map(box, column):
+    """
+    文本框内只有一列文字像素的文字区域图，用列的位置区分不同字幕
+    """
+    bitmap = np.zeros(FRAME_SIZE, dtype=bool)
+    xmin, xmax, ymin, ymax = box
+    bitmap[ymin:ymax, column] = True
+    return 0, 0, bitmap
+
+
+@pytest.fixture(autouse=True)
+def no_dilate(monkeypatch):
+    monkeypatch.setattr(config, 'DET_GLYPH_MASK_DILATE', 0)
+
+
+def build_store():
+    """
+    字幕A(1-10帧) -> 字幕B(11-20帧) -> 字幕A(21-30帧)，每条字幕只检测第一帧，第三段沿用第一段的检测结果
+    """
+    store = GlyphMaskStore()
+    store.put(1, text_map(BOX_A, 120), [BOX_A])
+    store.put(11, text_map(BOX_B, 250), [BOX_B])
+    for frame_no in range(1, 31):
+        store.assign(frame_no, [BOX_B] if 11 <= frame_no <= 20 else [BOX_A])
+    return store
+
+
+def glyph_columns(mask):
+    return np.flatnonzero(mask.any(axis=0)).tolist()
+
+
+def test_reused_frames_use_glyphs_of_same_boxes():
+    store = build_store()
+    assert store.find(5) == 1
+    assert store.find(15) == 11
+    # 第三段与之前最近检测的字幕B文本框不同，使用字幕A的文字区域图
+    assert store.find(25) == 1
+    assert glyph_columns(store.get_mask(FRAME_SIZE, range(21, 31))) == [120]
+    assert glyph_columns(store.get_mask(FRAME_SIZE, range(11, 21))) == [250]
+
+
+def test_frames_without_matching_boxes_have_no_glyphs():
+    store = GlyphMaskStore()
+    store.put(1, text_map(BOX_A, 120), [BOX_A])
+    store.assign(1, [BOX_A])
+    # 第2帧的文本框没有保存过文字区域图(例如切分检测的图片)，第3帧没有字幕
+    store.assign(2, [BOX_B])
+    store.assign(3, [])
+    assert store.find(2) is None
+    assert store.find(3) is None
+    assert store.get_mask(FRAME_SIZE, [2]) is None
+    # 区间中任一帧没有文字区域图时使用矩形掩码
+    assert store.get_mask(FRAME_SIZE, [1, 2]) is None
+    assert store.get_mask(FRAME_SIZE, [1]) is not None
+
+
+def test_box_order_does_not_matter():
+    box_c = (300, 350, 150, 180)
+    store = GlyphMaskStore()
+    store.put(1, text_map(BOX_A, 120), [BOX_A, box_c])
+    store.assign(1, [BOX_A, box_c])
+    store.assign(2, [box_c, BOX_A])
+    assert store.find(2) == 1
+
+
+def test_arrays_round_trip():
+    store = build_store()
+    loaded = GlyphMaskStore.from_arrays(store.to_arrays())
+    assert len(loaded) == 2
+    for frame_no in range(1, 32):
+        assert loaded.find(frame_no) == store.find(frame_no)
+    np.testing.assert_array_equal(loaded.get_mask(FRAME_SIZE, range(21, 31)),
+                                  store.get_mask(FRAME_SIZE, range(21, 31)))
@@ -0,0 +1,32 @@
+import pytest
+
+from backend.tools.inpaint_tools import sliding_window_batches
+
+
+@pytest.mark.parametrize('frame_count, window_size, overlap, expected', [
+    (0, 4, 1, []),
+    # 不足一个窗口
+    (3, 4, 1, [([0, 1, 2], 0, 3)]),
+    # 区间末尾剩余的帧与前一窗口的overlap帧组成最后一个窗口
+    (4, 4, 1, [([0, 1, 2, 3], 0, 3), ([2, 3], 1, 2)]),
+    (6, 4, 1, [([0, 1, 2, 3], 0, 3), ([2, 3, 4, 5], 1, 3), ([4, 5], 1, 2)]),
+    (10, 4, 1, [([0, 1, 2, 3], 0, 3), ([2, 3, 4, 5], 1, 3), ([4, 5, 6, 7], 1, 3), ([6, 7, 8, 9], 1, 3),
+                ([8, 9], 1, 2)]),
+    # 没有重叠
+    (5, 2, 0, [([0, 1], 0, 2), ([2, 3], 0, 2), ([4], 0, 1)]),
+    # 重叠帧数过大时保证每个窗口至少输出一帧
+    (5, 3, 2, [([0, 1, 2], 0, 2), ([1, 2, 3], 1, 2), ([2, 3, 4], 1, 2), ([3, 4], 1, 2)]),
+])
+def test_sliding_window_batches(frame_count, window_size, overlap, expected):
+    assert list(sliding_window_batches(iter(range(frame_count)), window_size, overlap)) == expected
+
+
+@pytest.mark.parametrize('window_size, overlap', [(1, 0), (2, 1), (4, 1), (10, 3), (10, 20)])
+def test_every_frame_is_output_once(window_size, overlap):
+    for frame_count in range(30):
+        output = []
+        for window, emit_start, emit_end in sliding_window_batches(iter(range(frame_count)), window_size, overlap):
+            assert len(window) <= window_size
+            assert emit_start < emit_end
+            output.extend(window[emit_start:emit_end])
+        assert output == list(range(frame_count))
@@ -0,0 +1,191 @@
+import time
+
+import numpy as np
+import pytest
+
+from backend.tools.interval_algebra import continuous_ranges, expand_and_merge, merge_short, split_by_points, to_list
+
+
+def split_range_by_scene_reference(intervals, points):
+    points = sorted(points)
+    result_intervals = []
+    for start, end in intervals:
+        current_points = [p for p in points if start <= p <= end]
+        for p in current_points:
+            if start < p:
+                result_intervals.append((start, p - 1))
+            start = p
+        result_intervals.append((start, end))
+    return result_intervals
+
+
+def expand_and_merge_reference(intervals, expand_size, max_length):
+    expanded_intervals = []
+    for start, end in intervals:
+        expansion_amount = max(expand_size - (end - start + 1), 0)
+        expand_start = max(start - expansion_amount // 2, 1)
+        expand_end = end + expansion_amount // 2
+        if (expand_end - expand_start + 1) > max_length:
+            expand_end = expand_start + max_length - 1
+        if start == end:
+            if expand_end - expand_start + 1 < expand_size:
+                expand_end = expand_start + expand_size - 1
+        if expanded_intervals and expand_start <= expanded_intervals[-1][1]:
+            previous_start, previous_end = expanded_intervals.pop()
+            expand_start = previous_start
+            expand_end = max(expand_end, previous_end)
+        expanded_intervals.append((expand_start, expand_end))
+    return expanded_intervals
+
+
+def filter_and_merge_reference(intervals, target_length):
+    expanded = []
+    for start, end in intervals:
+        if start == end:
+            prev_end = expanded[-1][1] if expanded else float('-inf')
+            next_start = float('inf')
+            for ns, ne in intervals:
+                if ns > end:
+                    next_start = ns
+                    break
+            new_start = max(start - (target_length - 1) // 2, prev_end + 1)
+            new_end = min(start + (target_length - 1) // 2, next_start - 1)
+            if new_end < new_start:
+                new_start, new_end = start, start
+            expanded.append((new_start, new_end))
+        else:
+            expanded.append((start, end))
+    expanded.sort(key=lambda x: x[0])
+    merged = [expanded[0]]
+    for start, end in expanded[1:]:
+        last_start, last_end = merged[-1]
+        if start <= last_end and (end - last_start + 1 < target_length or last_end - last_start + 1 < target_length):
+            merged[-1] = (last_start, max(last_end, end))
+        elif start == last_end + 1 and (end - last_start + 1 < target_length or last_end - last_start + 1 < target_length):
+            merged[-1] = (last_start, end)
+        else:
+            merged.append((start, end))
+    return [(int(s), int(e)) for s, e in merged]
+
+
+def continuous_ranges_reference(frame_no_ids):
+    numbers = sorted(frame_no_ids.keys())
+    ranges = []
+    start = numbers[0]
+    for i in range(1, len(numbers)):
+        if numbers[i] - numbers[i - 1] != 1 or frame_no_ids[numbers[i]] != frame_no_ids[numbers[i - 1]]:
+            ranges.append((start, numbers[i - 1]))
+            start = numbers[i]
+    ranges.append((start, numbers[-1]))
+    return ranges
+
+
+def random_plan(rng, frame_count, switch_rate=0.01, single_rate=0.001, change_rate=0.01, box_set_count=4):
+    """
+    随机生成有字幕的帧号与逐帧文本框集合编号
+    :param switch_rate: 字幕出现/消失的概率(字幕通常持续多帧)
+    :param single_rate: 孤立单帧字幕(误检)的概率
+    :param change_rate: 字幕持续期间文本框变化的概率
+    """
+    present = np.cumsum(rng.random(frame_count) < switch_rate) % 2 == 1
+    present |= rng.random(frame_count) < single_rate
+    ids = np.cumsum(rng.random(frame_count) < change_rate) % box_set_count
+    frame_nos = np.flatnonzero(present) + 1
+    return frame_nos, ids[frame_nos - 1]
+
+
+def random_plans(rounds=300, seed=0):
+    rng = np.random.default_rng(seed)
+    for _ in range(rounds):
+        frame_count = int(rng.integers(1, 400))
+        frame_nos, ids = random_plan(rng, frame_count, switch_rate=rng.uniform(0.01, 0.5),
+                                     single_rate=rng.uniform(0, 0.2), change_rate=rng.uniform(0, 0.3))
+        if len(frame_nos) > 0:
+            yield rng, frame_count, frame_nos, ids
+
+
+def test_continuous_ranges_matches_loop_implementation():
+    for _, _, frame_nos, ids in random_plans():
+        assert to_list(*continuous_ranges(frame_nos, ids)) == \
+            continuous_ranges_reference(dict(zip(frame_nos.tolist(), ids.tolist())))
+        assert to_list(*continuous_ranges(frame_nos)) == continuous_ranges_reference(dict.fromkeys(frame_nos.tolist(), 0))
+
+
+def test_split_by_points_matches_loop_implementation():
+    for rng, frame_count, frame_nos, ids in random_plans():
+        starts, ends = continuous_ranges(frame_nos, ids)
+        points = rng.integers(1, frame_count + 1, size=int(rng.integers(0, 20))).tolist()
+        assert to_list(*split_by_points(starts, ends, points)) == \
+            split_range_by_scene_reference(to_list(starts, ends), points)
+
+
+def test_expand_and_merge_matches_loop_implementation():
+    for rng, _, frame_nos, ids in random_plans():
+        starts, ends = continuous_ranges(frame_nos, ids)
+        expand_size, max_length = int(rng.integers(1, 60)), int(rng.integers(1, 120))
+        assert to_list(*expand_and_merge(starts, ends, expand_size, max_length)) == \
+            expand_and_merge_reference(to_list(starts, ends), expand_size, max_length)
+
+
+def test_merge_short_matches_loop_implementation():
+    for rng, _, frame_nos, ids in random_plans():
+        starts, ends = continuous_ranges(frame_nos, ids)
+        target_length = int(rng.integers(1, 30))
+        assert to_list(*merge_short(starts, ends, target_length)) == \
+            filter_and_merge_reference(to_list(starts, ends), target_length)
+
+
+def test_merge_short_sorts_input():
+    for rng, _, frame_nos, ids in random_plans(rounds=50):
+        starts, ends = continuous_ranges(frame_nos, ids)
+        order = rng.permutation(len(starts))
+        assert to_list(*merge_short(starts[order], ends[order], 10)) == to_list(*merge_short(starts, ends, 10))
+
+
+def test_merge_short_merges_overlapping_input():
+    assert to_list(*merge_short([30, 1, 5, 8], [30, 10, 6, 12], 5)) == [(1, 12), (28, 32)]
+    with pytest.raises(ValueError):
+        merge_short([5], [4], 5)
+
+
+def test_empty_input():
+    empty = np.zeros(0, dtype=np.int64)
+    assert to_list(*continuous_ranges(empty)) == []
+    assert to_list(*split_by_points(empty, empty, [3])) == []
+    assert to_list(*expand_and_merge(empty, empty, 10, 20)) == []
+    assert to_list(*merge_short(empty, empty, 10)) == []
+
+
+def test_benchmark(frame_count=200000, scene_count=500):
+    """
+    与逐区间循环实现对比结果与耗时，使用pytest -s查看耗时
+    """
+    rng = np.random.default_rng(0)
+    frame_nos, ids = random_plan(rng, frame_count)
+    points = np.sort(rng.integers(1, frame_count + 1, size=scene_count))
+    frame_no_ids = dict(zip(frame_nos.tolist(), ids.tolist()))
+    timings = []
+
+    def run(name, vectorized, reference):
+        start_time = time.time()
+        result = vectorized()
+        vectorized_time = time.time() - start_time
+        start_time = time.time()
+        reference_result = reference()
+        reference_time = time.time() - start_time
+        assert to_list(*result) == reference_result
+        timings.append((name, vectorized_time, reference_time))
+        return result
+
+    starts, ends = run('continuous_ranges', lambda: continuous_ranges(frame_nos, ids),
+                       lambda: continuous_ranges_reference(frame_no_ids))
+    intervals = to_list(starts, ends)
+    run('split_by_points', lambda: split_by_points(starts, ends, points),
+        lambda: split_range_by_scene_reference(intervals, points.tolist()))
+    run('expand_and_merge', lambda: expand_and_merge(starts, ends, 50, 100),
+        lambda: expand_and_merge_reference(intervals, 50, 100))
+    run('merge_short', lambda: merge_short(starts, ends, 10),
+        lambda: filter_and_merge_reference(intervals, 10))
+    print(f'[IntervalAlgebra] {frame_count} frames, {len(intervals)} intervals, {scene_count} scene cuts')
+    for name, vectorized_time, reference_time in timings:
+        print(f'{name}: {round(vectorized_time, 4)}s, loop implementation: {round(reference_time, 4)}s')
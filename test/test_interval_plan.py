@@ -0,0 +1,106 @@
+import random
+
+import pytest
+
+from backend.tools.interval_plan import IntervalPlan
+
+BOX_A = (100, 300, 600, 640)
+BOX_B = (100, 300, 650, 690)
+BOX_C = (500, 700, 600, 640)
+# 第1-3帧字幕A，第4-5帧字幕A与B，第6帧没有字幕，第7-9帧字幕C，第10帧文本框为空
+BOX_DICT = {1: [BOX_A], 2: [BOX_A], 3: [BOX_A], 4: [BOX_A, BOX_B], 5: [BOX_B, BOX_A],
+            7: [BOX_C], 8: [BOX_C], 9: [BOX_C], 10: []}
+INTERVALS = [(1, 5), (7, 9), (12, 12)]
+
+
+def is_start_reference(frame_no, continuous_frame_no_list):
+    """
+    SubtitleRemover中原有的is_current_frame_no_start
+    """
+    for start_no, end_no in continuous_frame_no_list:
+        if start_no == frame_no:
+            return True
+    return False
+
+
+def get_end_reference(frame_no, continuous_frame_no_list):
+    """
+    SubtitleRemover中原有的find_frame_no_end
+    """
+    for start_no, end_no in continuous_frame_no_list:
+        if start_no <= frame_no <= end_no:
+            return end_no
+    return -1
+
+
+def get_range_boxes_reference(start, stop, sub_list):
+    """
+    sttn_mode中原有的逐帧收集文本框
+    """
+    mask_area_coordinates = []
+    for mask_index in range(start, stop):
+        if mask_index in sub_list.keys():
+            for area in sub_list[mask_index]:
+                if area not in mask_area_coordinates:
+                    mask_area_coordinates.append(area)
+    return mask_area_coordinates
+
+
+@pytest.fixture
+def plan():
+    return IntervalPlan.from_frame_box_dict(BOX_DICT).with_intervals(INTERVALS)
+
+
+@pytest.mark.parametrize('frame_no, is_start, end', [
+    (0, False, -1),
+    (1, True, 5),
+    (3, False, 5),
+    (5, False, 5),
+    (6, False, -1),
+    (7, True, 9),
+    (9, False, 9),
+    (12, True, 12),
+    (13, False, -1),
+    (1000, False, -1),
+])
+def test_is_start_and_get_end(plan, frame_no, is_start, end):
+    assert plan.is_start(frame_no) == is_start
+    assert plan.get_end(frame_no) == end
+    assert is_start == is_start_reference(frame_no, INTERVALS)
+    assert end == get_end_reference(frame_no, INTERVALS)
+
+
+@pytest.mark.parametrize('start, stop, boxes', [
+    (1, 4, [BOX_A]),
+    (1, 6, [BOX_A, BOX_B]),
+    # 文本框按首次出现的顺序去重
+    (5, 6, [BOX_B, BOX_A]),
+    (4, 9, [BOX_A, BOX_B, BOX_C]),
+    # 没有字幕、文本框为空或超出范围的帧
+    (6, 7, []),
+    (10, 11, []),
+    (11, 100, []),
+    (-5, 2, [BOX_A]),
+    (5, 5, []),
+])
+def test_get_range_boxes(plan, start, stop, boxes):
+    assert plan.get_range_boxes(start, stop) == boxes
+    assert boxes == get_range_boxes_reference(start, stop, BOX_DICT)
+
+
+def test_matches_dict_implementation():
+    rng = random.Random(0)
+    pool = [(x, x + 200, y, y + 40) for x in (100, 400) for y in (600, 650)]
+    for _ in range(200):
+        box_dict = {}
+        for frame_no in range(1, rng.randint(2, 60)):
+            if rng.random() < 0.7:
+                box_dict[frame_no] = rng.sample(pool, rng.randint(0, 3))
+        edges = sorted(rng.sample(range(1, 70), rng.randrange(0, 12, 2)))
+        intervals = list(zip(edges[::2], edges[1::2]))
+        plan = IntervalPlan.from_frame_box_dict(box_dict).with_intervals(intervals)
+        for frame_no in range(0, 72):
+            assert plan.is_start(frame_no) == is_start_reference(frame_no, intervals)
+            assert plan.get_end(frame_no) == get_end_reference(frame_no, intervals)
+        for start, end in intervals:
+            assert plan.get_range_boxes(start, end + 1) == get_range_boxes_reference(start, end + 1, box_dict)
@@ -0,0 +1,103 @@
+import random
+
+import numpy as np
+import pytest
+
+from backend import config
+from backend.tools.inpaint_tools import create_mask
+from backend.tools.mask_geometry import MaskGeometry
+
+
+def create_mask_reference(size, coords_list):
+    """
+    原来的create_mask：每个文本框向外扩展SUBTITLE_AREA_DEVIATION_PIXEL像素后用cv2.rectangle填充
+    """
+    mask = np.zeros(size, dtype=np.uint8)
+    height, width = size
+    deviation = config.SUBTITLE_AREA_DEVIATION_PIXEL
+    for xmin, xmax, ymin, ymax in coords_list:
+        x1, x2 = sorted((max(xmin - deviation, 0), xmax + deviation))
+        y1, y2 = sorted((max(ymin - deviation, 0), ymax + deviation))
+        mask[max(y1, 0):min(y2, height - 1) + 1, max(x1, 0):min(x2, width - 1) + 1] = 255
+    return mask
+
+
+def get_inpaint_area_reference(H, h, mask):
+    """
+    原来的STTNInpaint.get_inpaint_area_by_mask
+    """
+    inpaint_area = []
+    to_H = from_H = H
+    while from_H != 0:
+        if to_H - h < 0:
+            from_H = 0
+            to_H = h
+        else:
+            from_H = to_H - h
+        if not np.all(mask[from_H:to_H, :] == 0) and np.sum(mask[from_H:to_H, :]) > 10:
+            if to_H != H:
+                move = 0
+                while to_H + move < H and not np.all(mask[to_H + move, :] == 0):
+                    move += 1
+                if to_H + move < H and move < h:
+                    to_H += move
+                    from_H += move
+            if (from_H, to_H) not in inpaint_area:
+                inpaint_area.append((from_H, to_H))
+            else:
+                break
+        to_H -= h
+    return inpaint_area
+
+
+@pytest.fixture(autouse=True)
+def mask_config(monkeypatch):
+    monkeypatch.setattr(config, 'SUBTITLE_AREA_DEVIATION_PIXEL', 20)
+    monkeypatch.setattr(config, 'MASK_CACHE_SIZE', 4)
+    MaskGeometry._cache.clear()
+    yield
+    MaskGeometry._cache.clear()
+
+
+def test_create_mask_returns_cached_read_only_mask():
+    coords_list = [(400, 1500, 900, 950), (420, 1480, 970, 1020)]
+    mask = create_mask((1080, 1920), coords_list)
+    assert create_mask((1080, 1920), list(coords_list)) is mask
+    assert not mask.flags.writeable
+    with pytest.raises(ValueError):
+        mask[0, 0] = 255
+    np.testing.assert_array_equal(mask, create_mask_reference((1080, 1920), coords_list))
+    # 行范围内的掩码是整帧掩码的视图
+    geometry = MaskGeometry.get((1080, 1920), coords_list)
+    assert np.shares_memory(geometry.band, mask)
+
+
+def test_glyph_mask_is_not_cached():
+    coords_list = [(400, 1500, 900, 950)]
+    glyph_mask = np.zeros((1080, 1920), dtype=np.uint8)
+    glyph_mask[910:940, 500:600] = 255
+    mask = create_mask((1080, 1920), coords_list, glyph_mask)
+    assert mask.flags.writeable
+    assert create_mask((1080, 1920), coords_list, glyph_mask) is not mask
+
+
+def test_matches_reference_rasterization():
+    rng = random.Random(0)
+    for _ in range(300):
+        height, width = rng.choice([(720, 1280), (100, 300), (1080, 1920), (50, 400)])
+        coords_list = []
+        for _ in range(rng.randint(0, 4)):
+            x, y = rng.randint(-30, width), rng.randint(-30, height)
+            coords_list.append((x, x + rng.randint(-5, width // 2), y, y + rng.randint(0, height // 4)))
+        geometry = MaskGeometry.from_boxes((height, width), coords_list)
+        reference = create_mask_reference((height, width), coords_list)
+        split_h = int(width * 3 / 16)
+        inpaint_area, band_masks = geometry.get_inpaint_area(split_h)
+        np.testing.assert_array_equal(geometry.to_mask(), reference)
+        binary = (reference > 127).astype(np.uint8)[:, :, None]
+        assert inpaint_area == get_inpaint_area_reference(height, split_h, binary)
+        for (from_H, to_H), band_mask in zip(inpaint_area, band_masks):
+            np.testing.assert_array_equal(band_mask, binary[from_H:to_H].astype(bool))
+        from_mask = MaskGeometry.from_mask(reference)
+        assert from_mask.get_inpaint_area(split_h)[0] == inpaint_area
+        assert from_mask.bbox == geometry.bbox
@@ -0,0 +1,41 @@
+import queue
+import threading
+
+import numpy as np
+import pytest
+
+from backend.tools.shared_frame_buffer import SharedFrameRingBuffer
+
+
+@pytest.fixture
+def frame_buffer():
+    with SharedFrameRingBuffer(2, (4, 4, 3)) as frame_buffer:
+        yield frame_buffer
+
+
+def test_put_and_release_slots(frame_buffer):
+    frame = np.full((4, 4, 3), 7, dtype=np.uint8)
+    slots = [frame_buffer.put(frame), frame_buffer.put(frame)]
+    assert sorted(slots) == [0, 1]
+    np.testing.assert_array_equal(frame_buffer.get(slots[0]), frame)
+    with pytest.raises(queue.Empty):
+        frame_buffer.put(frame, timeout=0.05)
+    frame_buffer.release(slots[0])
+    assert frame_buffer.put(frame, timeout=0.05) == slots[0]
+
+
+def test_stop_wakes_blocked_put(frame_buffer):
+    frame = np.zeros((4, 4, 3), dtype=np.uint8)
+    frame_buffer.put(frame)
+    frame_buffer.put(frame)
+    results = []
+    thread = threading.Thread(target=lambda: results.append(frame_buffer.put(frame)))
+    thread.start()
+    thread.join(0.3)
+    # 没有空闲槽位时一直等待，停止后立即返回
+    assert thread.is_alive()
+    frame_buffer.stop()
+    thread.join(1)
+    assert not thread.is_alive()
+    assert results == [None]
+    assert frame_buffer.put(frame) is None
@@ -0,0 +1,33 @@
+import pytest
+
+from backend.tools.smart_render import plan_segments
+
+KEYFRAMES = [0, 10, 20, 30]
+FRAME_COUNT = 40
+
+
+@pytest.mark.parametrize('dirty_intervals, expected', [
+    # 没有字幕：整个视频直接复制
+    ([], [(0, 39, False, 0)]),
+    # GOP的第一帧与最后一帧(字幕帧号从1开始)
+    ([(1, 1)], [(0, 9, True, 0), (10, 39, False, 1)]),
+    ([(10, 10)], [(0, 9, True, 0), (10, 39, False, 1)]),
+    ([(11, 11)], [(0, 9, False, 0), (10, 19, True, 1), (20, 39, False, 2)]),
+    # 最后一个GOP结束于视频最后一帧
+    ([(40, 40)], [(0, 29, False, 0), (30, 39, True, 3)]),
+    # 跨越GOP边界的区间
+    ([(9, 12)], [(0, 19, True, 0), (20, 39, False, 2)]),
+    # 相邻区间
+    ([(5, 10), (11, 12)], [(0, 19, True, 0), (20, 39, False, 2)]),
+    # 重叠、包含与无序的区间
+    ([(25, 35), (5, 30)], [(0, 39, True, 0)]),
+    ([(1, 30), (5, 6)], [(0, 29, True, 0), (30, 39, False, 3)]),
+    ([(35, 36), (2, 3)], [(0, 9, True, 0), (10, 29, False, 1), (30, 39, True, 3)]),
+])
+def test_plan_segments(dirty_intervals, expected):
+    assert plan_segments(KEYFRAMES, FRAME_COUNT, dirty_intervals) == expected
+
+
+def test_duplicate_keyframes_are_skipped():
+    assert plan_segments([0, 10, 10, 20], 30, [(11, 11)]) == \
+        [(0, 9, False, 0), (10, 19, True, 2), (20, 29, False, 3)]
@@ -0,0 +1,42 @@
+import subprocess
+
+import pytest
+
+from backend.tools import video_writer
+from backend.tools.video_writer import concat_video_segments, merge_audio
+
+
+@pytest.fixture
+def fake_ffmpeg(monkeypatch):
+    """
+    模拟无法复制音频的ffmpeg：命令中包含音频输入时失败，否则把第一个输入复制到输出
+    """
+    commands = []
+
+    def check_output(command, **kwargs):
+        commands.append(command)
+        if '1:a?' in command:
+            raise subprocess.CalledProcessError(1, command)
+        with open(command[command.index('-i') + 1], 'rb') as src, open(command[-1], 'wb') as dst:
+            dst.write(src.read())
+        return b''
+
+    monkeypatch.setattr(video_writer.subprocess, 'check_output', check_output)
+    return commands
+
+
+def test_merge_audio_falls_back_to_video_only(tmp_path, fake_ffmpeg):
+    video_path, output_path = tmp_path / 'out.noaudio.mp4', tmp_path / 'out.mp4'
+    video_path.write_bytes(b'video')
+    assert not merge_audio(str(video_path), str(tmp_path / 'in.avi'), str(output_path))
+    assert output_path.read_bytes() == b'video'
+    assert not video_path.exists()
+
+
+def test_concat_retries_without_audio(tmp_path, fake_ffmpeg):
+    segment_path, output_path = tmp_path / 'segment.ts', tmp_path / 'out.mp4'
+    segment_path.write_bytes(b'segment')
+    assert concat_video_segments([str(segment_path)], str(output_path), audio_source=str(tmp_path / 'in.avi'))
+    assert len(fake_ffmpeg) == 2
+    assert '1:a?' not in fake_ffmpeg[-1]
+    assert output_path.exists()
@@ -1,12 +1,42 @@
+import os
 from fastapi import APIRouter, HTTPException
 from models.task import ProcessConfig, TaskStatus
 from services.task_manager import task_manager
 from services.subtitle_service import SubtitleRemovalService
 from utils.exceptions import TaskNotFoundException
+from backend import config as backend_config
 
 router = APIRouter()
 
 
+def _start_service(config: ProcessConfig, video_path: str, job_dir: str):
+    """Create a processing service, start it and register it for the task"""
+    # Create service
+    service = SubtitleRemovalService(config.task_id)
+
+    # Convert sub_area to tuple if provided
+    sub_area = tuple(config.sub_area) if config.sub_area else None
+
+    # Start processing
+    service.process(
+        video_path=video_path,
+        sub_area=sub_area,
+        mode=config.mode,
+        skip_detection=config.skip_detection,
+        job_dir=job_dir
+    )
+
+    # Register service
+    task_manager.register_service(config.task_id, service)
+
+    # Update task status
+    task_manager.update_task(
+        config.task_id,
+        status=TaskStatus.PROCESSING,
+        job_dir=job_dir
+    )
+
+
 @router.post("/process")
 async def start_processing(config: ProcessConfig):
     """
@@ -22,36 +52,57 @@ async def start_processing(config: ProcessConfig):
                 detail=f"任务状态不正确: {task.status}"
             )
 
-        # Create service
-        service = SubtitleRemovalService(config.task_id)
+        # With RESUMABLE_JOB enabled, completed segments are checkpointed here so an interrupted task can be resumed
+        job_dir = None
+        if backend_config.RESUMABLE_JOB:
+            job_dir = os.path.join(os.path.dirname(task.file_path), f'{config.task_id}_job')
+        _start_service(config, task.file_path, job_dir)
 
-        # Convert sub_area to tuple if provided
-        sub_area = tuple(config.sub_area) if config.sub_area else None
+        return {
+            "task_id": config.task_id,
+            "status": "started",
+            "message": "开始处理"
+        }
 
-        # Start processing
-        service.process(
-            video_path=task.file_path,
-            sub_area=sub_area,
-            mode=config.mode,
-            skip_detection=config.skip_detection
-        )
+    except HTTPException:
+        raise
+    except TaskNotFoundException as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"启动处理失败: {str(e)}")
 
-        # Register service
-        task_manager.register_service(config.task_id, service)
 
-        # Update task status
-        task_manager.update_task(
-            config.task_id,
-            status=TaskStatus.PROCESSING
-        )
+@router.post("/process/resume")
+async def resume_processing(config: ProcessConfig):
+    """
+    Resume an interrupted or failed task from its job manifest
+    Completed segments are reused when the input file and config are unchanged
+    """
+    try:
+        # Get task
+        task = task_manager.get_task(config.task_id)
+
+        service = task_manager.get_service(config.task_id)
+        if service is not None and service.is_running():
+            raise HTTPException(status_code=400, detail="任务正在处理中")
+
+        if task.status not in (TaskStatus.ERROR, TaskStatus.PROCESSING) or not task.job_dir:
+            raise HTTPException(
+                status_code=400,
+                detail=f"任务无法继续处理: {task.status}"
+            )
+
+        _start_service(config, task.file_path, task.job_dir)
 
         return {
             "task_id": config.task_id,
-            "status": "started",
-            "message": "开始处理"
+            "status": "resumed",
+            "message": "继续处理"
         }
 
+    except HTTPException:
+        raise
     except TaskNotFoundException as e:
         raise HTTPException(status_code=404, detail=str(e))
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"启动处理失败: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"继续处理失败: {str(e)}")
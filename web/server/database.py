@@ -60,6 +60,12 @@ class Database:
                 )
             ''')
 
+            # 旧数据库升级：任务目录，保存可续跑任务的manifest与已完成的片段
+            cursor.execute('PRAGMA table_info(tasks)')
+            columns = [row['name'] for row in cursor.fetchall()]
+            if 'job_dir' not in columns:
+                cursor.execute('ALTER TABLE tasks ADD COLUMN job_dir TEXT')
+
             # 创建索引
             cursor.execute('CREATE INDEX IF NOT EXISTS idx_tasks_status ON tasks(status)')
             cursor.execute('CREATE INDEX IF NOT EXISTS idx_tasks_created ON tasks(created_at)')
@@ -136,7 +142,7 @@ class Database:
         set_parts = []
         values = []
         for key, value in kwargs.items():
-            if key in ['status', 'progress', 'message', 'output_path']:
+            if key in ['status', 'progress', 'message', 'output_path', 'job_dir']:
                 set_parts.append(f"{key} = ?")
                 values.append(value)
 
@@ -155,6 +161,23 @@ class Database:
             ''', values)
             print(f"[DB] Task {task_id} updated: {kwargs}")
 
+    def mark_interrupted_tasks(self) -> int:
+        """
+        Mark tasks left in processing state (e.g. after a server restart) as interrupted
+        Tasks with a job_dir can be resumed from their manifest
+        """
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                UPDATE tasks
+                SET status = 'error', message = '处理中断，可以继续处理', updated_at = CURRENT_TIMESTAMP
+                WHERE status = 'processing'
+            ''')
+            interrupted_count = cursor.rowcount
+            if interrupted_count:
+                print(f"[DB] Marked {interrupted_count} interrupted tasks")
+            return interrupted_count
+
     def get_file_path_by_hash(self, file_hash: str) -> Optional[str]:
         """Get file path by hash"""
         with self.get_connection() as conn:
@@ -17,6 +17,9 @@ if project_root not in sys.path:
 
 from api import upload, process, status, download, translate, detect
 from services.task_manager import task_manager
+from database import db
+from backend import config as backend_config
+from backend.tools.detector_pool import set_pool_size
 
 app = FastAPI(
     title="Video Subtitle Remover Web",
@@ -46,6 +49,10 @@ app.include_router(download.router, prefix="/api", tags=["download"])
 async def startup_event():
     """Startup event - runs when server starts"""
     logger = logging.getLogger("uvicorn.error")
+    # 服务重启后，未完成的任务标记为中断，可通过 /api/process/resume 继续处理
+    db.mark_interrupted_tasks()
+    # web服务同时处理多个视频，共享已加载的检测会话并合并各任务的检测批次
+    set_pool_size(backend_config.WEB_DET_POOL_SIZE)
     logger.info("=" * 80)
     logger.info("Video Subtitle Remover Web Server Started")
     logger.info("Server URL: http://0.0.0.0:8000")
@@ -25,6 +25,7 @@ class TaskInfo(BaseModel):
     message: Optional[str] = None
     file_path: Optional[str] = None
     output_path: Optional[str] = None
+    job_dir: Optional[str] = None
 
 
 class ProcessConfig(BaseModel):
@@ -11,6 +11,9 @@ if project_root not in sys.path:
     sys.path.insert(0, project_root)
 
 from backend.main import SubtitleDetect
+from backend.tools.media_probe import MediaProbe
+from backend.tools.analysis_sidecar import AnalysisSidecar
+from backend.tools import text_boxes
 from backend import config
 
 
@@ -32,25 +35,10 @@ class SubtitleDetectService:
         frame_width: int
     ) -> bool:
         """
-        判断是否为字幕区域
+        判断是否为字幕区域：字幕通常比较扁平、位于画面下半部分、占画面宽度的一定比例
+        批量判断使用 text_boxes.is_subtitle_region
         """
-        xmin, xmax, ymin, ymax = box
-        width = xmax - xmin
-        height = ymax - ymin
-
-        # 宽高比：字幕通常比较扁平
-        if width < height * 3:
-            return False
-
-        # 位置：通常在画面下半部分
-        if ymin < frame_height * 0.5:
-            return False
-
-        # 宽度：通常占画面宽度的一定比例
-        if width < frame_width * 0.2:
-            return False
-
-        return True
+        return bool(text_boxes.is_subtitle_region([box], frame_height, frame_width)[0])
 
     def detect_and_recognize(
         self,
@@ -67,12 +55,13 @@ class SubtitleDetectService:
 
             print(f"Starting subtitle detection for task {self.task_id}")
 
-            # 打开视频获取信息
+            # 获取视频信息（带缓存，不解码）
+            probe = MediaProbe.get(video_path)
+            width = probe.width
+            height = probe.height
+            fps = int(probe.fps)
+            frame_count = probe.frame_count
             cap = cv2.VideoCapture(video_path)
-            width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-            height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-            fps = int(cap.get(cv2.CAP_PROP_FPS))
-            frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
             duration_seconds = frame_count / fps
 
             print(f"Video: {width}x{height}, {fps} FPS, {frame_count} frames, {duration_seconds:.1f}s")
@@ -85,6 +74,13 @@ class SubtitleDetectService:
             print("SubtitleDetect initialized")
             sys.stdout.flush()
 
+            # 已有分析结果时直接使用保存的文本框，不再逐帧检测
+            sidecar = None
+            if config.USE_ANALYSIS_SIDECAR:
+                sidecar = AnalysisSidecar.load(video_path, detector.analysis_fingerprint)
+            if sidecar is not None:
+                print("Using saved analysis result, skip text detection")
+
             # 初始化 OCR（使用 GPU）
             print("Initializing OCR engine...")
             sys.stdout.flush()
@@ -129,29 +125,37 @@ class SubtitleDetectService:
             print(f"Processing {total_samples} sampled frames...")
 
             for idx, frame_no in enumerate(sample_frames):
+                if sidecar is not None:
+                    # 分析结果中的帧号从1开始；没有文本框的帧无需解码
+                    coordinates = sidecar.subtitle_frame_no_box_dict.get(frame_no + 1, [])
+                    if len(coordinates) == 0:
+                        self.progress = 100 * (idx + 1) / total_samples
+                        continue
+
                 cap.set(cv2.CAP_PROP_POS_FRAMES, frame_no)
                 ret, frame = cap.read()
                 if not ret:
                     continue
 
-                # 检测文字框（GPU 加速）
-                dt_boxes, _ = detector.detect_subtitle(frame)
-                if dt_boxes is None or len(dt_boxes) == 0:
-                    self.progress = 100 * (idx + 1) / total_samples
-                    continue
+                if sidecar is None:
+                    # 检测文字框（GPU 加速）
+                    dt_boxes, _ = detector.detect_subtitle(frame)
+                    if dt_boxes is None or len(dt_boxes) == 0:
+                        self.progress = 100 * (idx + 1) / total_samples
+                        continue
 
-                # 转换坐标
-                coordinates = detector.get_coordinates(dt_boxes.tolist())
+                    # 转换坐标
+                    coordinates = text_boxes.get_boxes(dt_boxes)
 
-                # 过滤并识别
+                # 过滤非字幕区域
+                boxes = np.asarray(coordinates, dtype=np.int64).reshape(-1, 4)
+                boxes = boxes[text_boxes.is_subtitle_region(boxes, height, width)]
+
+                # 识别
                 frame_subs = []
-                for box in coordinates:
+                for box in text_boxes.to_tuples(boxes):
                     xmin, xmax, ymin, ymax = box
 
-                    # 过滤非字幕区域
-                    if not self.is_subtitle_region(box, height, width):
-                        continue
-
                     # OCR 识别（GPU 加速）
                     try:
                         roi = frame[ymin:ymax, xmin:xmax]
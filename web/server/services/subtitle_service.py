@@ -21,8 +21,11 @@ class SubtitleRemovalService:
         self.error = None
         self.output_path = None
 
-    def process(self, video_path: str, sub_area=None, mode="sttn", skip_detection=True):
-        """Start processing video in a separate thread"""
+    def process(self, video_path: str, sub_area=None, mode="sttn", skip_detection=True, job_dir=None):
+        """
+        Start processing video in a separate thread
+        With job_dir set, completed segments are checkpointed there and a rerun resumes from them
+        """
 
         # Set configuration based on mode
         if mode == "sttn":
@@ -34,7 +37,7 @@ class SubtitleRemovalService:
             config.MODE = config.InpaintMode.PROPAINTER
 
         # Create SubtitleRemover instance
-        self.remover = SubtitleRemover(video_path, sub_area=sub_area, gui_mode=False)
+        self.remover = SubtitleRemover(video_path, sub_area=sub_area, gui_mode=False, job_dir=job_dir)
 
         # Run in separate thread
         self.thread = threading.Thread(target=self._run_remover)
@@ -41,7 +41,8 @@ class TaskManager:
             file_path=task_data['file_path'],
             progress=task_data.get('progress', 0),
             message=task_data.get('message'),
-            output_path=task_data.get('output_path')
+            output_path=task_data.get('output_path'),
+            job_dir=task_data.get('job_dir')
         )
 
     def update_task(self, task_id: str, **kwargs):
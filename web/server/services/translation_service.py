@@ -14,6 +14,7 @@ if project_root not in sys.path:
     sys.path.insert(0, project_root)
 
 from backend.main import SubtitleDetect
+from backend.tools import text_boxes
 
 
 class SubtitleTranslationService:
@@ -39,25 +40,10 @@ class SubtitleTranslationService:
     def is_subtitle_region(self, box: Tuple[int, int, int, int], frame_height: int, frame_width: int) -> bool:
         """
         判断是否为字幕区域
-        字幕通常位于底部，且宽度较长
+        字幕通常位于底部，且宽度较长：宽度 > 高度 * 3，y > height * 0.5，宽度 > 画面宽度的20%
+        批量判断使用 text_boxes.is_subtitle_region
         """
-        xmin, xmax, ymin, ymax = box
-        width = xmax - xmin
-        height = ymax - ymin
-
-        # 宽高比：字幕通常比较扁平 (宽度 > 高度 * 3)
-        if width < height * 3:
-            return False
-
-        # 位置：通常在画面下半部分 (y > height * 0.5)
-        if ymin < frame_height * 0.5:
-            return False
-
-        # 宽度：通常占画面宽度的一定比例 (> 20%)
-        if width < frame_width * 0.2:
-            return False
-
-        return True
+        return bool(text_boxes.is_subtitle_region([box], frame_height, frame_width)[0])
 
     def merge_duplicates(self, subtitle_data: Dict[int, List[Dict]]) -> List[Dict]:
         """
@@ -311,23 +297,13 @@ class SubtitleTranslationService:
                 if dt_boxes is None or len(dt_boxes) == 0:
                     continue
 
-                # 转换坐标
-                coordinates = detector.get_coordinates(dt_boxes.tolist())
+                # 转换坐标，过滤非字幕区域与不在sub_area范围内的文本框
+                boxes = text_boxes.get_boxes(dt_boxes)
+                keep = text_boxes.is_subtitle_region(boxes, height, width) & text_boxes.in_area(boxes, sub_area)
 
-                # 过滤字幕区域并OCR识别
+                # OCR识别
                 frame_subtitles = []
-                for box in coordinates:
-                    if not self.is_subtitle_region(box, height, width):
-                        continue
-
-                    # 如果指定了sub_area，检查是否在范围内
-                    if sub_area:
-                        xmin, xmax, ymin, ymax = box
-                        s_ymin, s_ymax, s_xmin, s_xmax = sub_area
-                        if not (s_xmin <= xmin and xmax <= s_xmax and
-                                s_ymin <= ymin and ymax <= s_ymax):
-                            continue
-
+                for box in text_boxes.to_tuples(boxes[keep]):
                     # OCR识别文字
                     xmin, xmax, ymin, ymax = box
                     roi = frame[ymin:ymax, xmin:xmax]